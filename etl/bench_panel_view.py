@@ -0,0 +1,224 @@
+import argparse
+import json
+import os
+import random
+import re
+import statistics
+import time
+from datetime import date, timedelta
+from typing import Any, Dict, List, Tuple
+import pymysql
+
+from migrate_schema import table_parts
+from panel_latest import PANEL_TABLE, VIEW_NAME, refresh_panel_latest, select_columns
+from sql_script import SCHEMA_DB, object_name, read_schema, run_statements, split_statements, statement_kind
+
+# Đo độ trễ + EXPLAIN của vw_firm_panel_latest trước/sau khi FACT mang snapshot_date + index idx_<bảng>_latest:
+#   python bench_panel_view.py --db-pass 1234                       # 1k, 10k, 50k firm-year
+#   python bench_panel_view.py --sizes 1000,100000 --repeat 5 --analyze
+# - Mỗi kích thước: nạp lại schema_and_seed.sql vào database nháp --db-name (XÓA mọi bảng trong đó),
+#   sinh dữ liệu tổng hợp (--years năm, --versions snapshot/năm, --revision-rate firm-year có bản sửa),
+#   ANALYZE TABLE rồi đo:
+#     before        view cũ: JOIN fact_data_snapshot + ROW_NUMBER trên cả dòng (IGNORE INDEX idx_*_latest)
+#     after         SELECT * FROM vw_firm_panel_latest (ROW_NUMBER chỉ trên index, JOIN ngược theo khóa chính)
+#     panel_latest  đọc bảng vật chất hóa (sau CALL sp_refresh_panel_latest(1), thời gian dựng ghi riêng)
+# - Mỗi truy vấn: --repeat lần execute + fetchall, EXPLAIN FORMAT=TREE (EXPLAIN ANALYZE nếu --analyze).
+# - before và after phải trả về cùng tập dòng; kết quả ghi outputs/bench_panel_view.json.
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+REPORT_PATH = os.path.join(BASE_DIR, "outputs", "bench_panel_view.json")
+BENCH_DB = "vn_firm_panel_bench"
+SOURCE_NAME = "Bench"
+FIRST_YEAR = 2010
+CTE_RE = re.compile(r"(?P<alias>\w+)_latest AS \(\n(?P<select>  SELECT .*?)\n  FROM \(\n.*?FROM `(?P<table>\w+)`\n.*?"
+                    r"WHERE x\.rn = 1\n\)", re.DOTALL)
+# Columns the generator leaves to their defaults
+SKIP_COLUMNS = {"firm_id", "fiscal_year", "snapshot_id", "snapshot_date", "created_at", "unit_scale",
+                "currency_code", "price_reference", "note"}
+
+def legacy_view_sql(view_sql: str) -> str:
+    """The view body with each *_latest CTE in its pre-snapshot_date form (window over full rows joined to the snapshot)."""
+    def legacy(m: re.Match) -> str:
+        a, table = m.group("alias"), m.group("table")
+        return (f"{a}_latest AS (\n{m.group('select')}\n  FROM (\n"
+                f"    SELECT {a}.*, s.snapshot_date AS s_date,\n"
+                f"           ROW_NUMBER() OVER (PARTITION BY {a}.firm_id, {a}.fiscal_year "
+                f"ORDER BY s.snapshot_date DESC, {a}.snapshot_id DESC) AS rn\n"
+                f"    FROM `{table}` {a} IGNORE INDEX (`idx_{table}_latest`)\n"
+                f"    JOIN `fact_data_snapshot` s ON s.snapshot_id = {a}.snapshot_id\n"
+                f"  ) {a}\n  WHERE {a}.rn = 1\n)")
+    body = view_sql.split(" AS\n", 1)[1]
+    legacy_sql, n = CTE_RE.subn(legacy, body)
+    if n == 0:
+        raise SystemExit(f"Không nhận ra CTE *_latest trong {VIEW_NAME}")
+    return legacy_sql
+
+def fact_tables(statements: List[str]) -> Dict[str, List[Tuple[str, str]]]:
+    """fact table -> (column, type) the generator fills, read from the schema."""
+    tables = {}
+    for statement in statements:
+        if statement_kind(statement) == "CREATE TABLE" and "`snapshot_date` DATE NULL" in statement:
+            columns, _ = table_parts(statement)
+            tables[object_name(statement)] = [(c, d.split()[0].upper()) for c, d in columns if c not in SKIP_COLUMNS]
+    return tables
+
+def fake_value(rng: random.Random, column: str, sql_type: str) -> Any:
+    if sql_type.startswith("DECIMAL(10,6)"):
+        return round(rng.random(), 6)
+    if sql_type.startswith("DECIMAL"):
+        return round(rng.uniform(1e6, 1e12), 2)
+    if sql_type == "TINYINT":
+        return rng.randint(0, 1)
+    if sql_type == "SMALLINT":  # evidence_source_id, firm_age
+        return 1 if column.endswith("_id") else rng.randint(1, 60)
+    if sql_type in ("BIGINT", "INT"):
+        return rng.randint(1, 10 ** 9)
+    if sql_type.startswith("VARCHAR"):
+        return f"bench {column}"
+    return None
+
+def connect(args, database: str = None):
+    return pymysql.connect(host=args.db_host, port=args.db_port, user=args.db_user, password=args.db_pass,
+                           database=database, charset="utf8mb4", autocommit=False)
+
+def insert_rows(cur, table: str, columns: List[str], rows: List[tuple], batch_size: int) -> None:
+    sql = f"INSERT INTO `{table}` ({', '.join(columns)}) VALUES ({', '.join(['%s'] * len(columns))})"
+    for i in range(0, len(rows), batch_size):
+        cur.executemany(sql, rows[i:i + batch_size])
+
+def fill_synthetic(conn, tables: Dict[str, List[Tuple[str, str]]], firm_years: int, args) -> int:
+    """Dims, args.versions snapshots per year and every fact table; returns fact rows inserted."""
+    rng = random.Random(args.seed)
+    n_firms, years = max(1, firm_years // args.years), list(range(FIRST_YEAR, FIRST_YEAR + args.years))
+    cur = conn.cursor()
+    try:
+        cur.execute("INSERT INTO dim_exchange (exchange_code, exchange_name) VALUES ('HOSE', 'Bench')")
+        cur.execute("INSERT INTO dim_data_source (source_name, source_type) VALUES (%s, 'financial_statement')",
+                    (SOURCE_NAME,))
+        insert_rows(cur, "dim_firm", ["ticker", "company_name", "exchange_id", "founded_year"],
+                    [(f"B{i:06d}", f"Bench firm {i}", 1, rng.randint(1950, 2005)) for i in range(1, n_firms + 1)],
+                    args.batch_size)
+        snapshots = [(date(y + 1, 3, 31) + timedelta(days=30 * v), y, 1, f"v{v}")
+                     for y in years for v in range(args.versions)]
+        insert_rows(cur, "fact_data_snapshot", ["snapshot_date", "fiscal_year", "source_id", "version_tag"],
+                    snapshots, args.batch_size)
+        cur.execute("SELECT fiscal_year, version_tag, snapshot_id, snapshot_date FROM fact_data_snapshot")
+        snapshot = {(y, tag): (sid, sdate) for y, tag, sid, sdate in cur.fetchall()}
+        # Version 0 covers every firm-year, later versions only a revised fraction
+        keys = [(f, y, 0) for f in range(1, n_firms + 1) for y in years]
+        keys += [(f, y, v) for v in range(1, args.versions) for f in range(1, n_firms + 1) for y in years
+                 if rng.random() < args.revision_rate]
+        n_rows = 0
+        for table, columns in tables.items():
+            rows = [(f, y) + snapshot[(y, f"v{v}")] + tuple(fake_value(rng, c, t) for c, t in columns)
+                    for f, y, v in keys]
+            insert_rows(cur, table, ["firm_id", "fiscal_year", "snapshot_id", "snapshot_date"] + [c for c, _ in columns],
+                        rows, args.batch_size)
+            n_rows += len(rows)
+        conn.commit()
+        cur.execute("ANALYZE TABLE dim_firm, fact_data_snapshot, " + ", ".join(tables))
+        cur.fetchall()
+    finally:
+        cur.close()
+    return n_rows
+
+def explain(conn, sql: str, analyze: bool = False) -> str:
+    cur = conn.cursor()
+    try:
+        cur.execute(("EXPLAIN ANALYZE " if analyze else "EXPLAIN FORMAT=TREE ") + sql)
+        return "\n".join(str(r[0]) for r in cur.fetchall())
+    finally:
+        cur.close()
+
+def time_query(conn, sql: str, repeat: int) -> Tuple[Dict[str, Any], List[tuple]]:
+    """Run sql repeat times (execute + fetchall); timings and the rows of the last run."""
+    seconds, rows = [], []
+    cur = conn.cursor()
+    try:
+        for _ in range(repeat):
+            t0 = time.perf_counter()
+            cur.execute(sql)
+            rows = cur.fetchall()
+            seconds.append(round(time.perf_counter() - t0, 4))
+    finally:
+        cur.close()
+    return {"rows": len(rows), "seconds": seconds, "best": min(seconds), "median": statistics.median(seconds)}, rows
+
+def bench_size(args, statements: List[str], queries: Dict[str, str], firm_years: int) -> Dict[str, Any]:
+    conn = connect(args)
+    try:
+        t0 = time.perf_counter()
+        run_statements(conn, statements)
+        fact_rows = fill_synthetic(conn, fact_tables(statements), firm_years, args)
+        result = {"firm_years": firm_years, "fact_rows": fact_rows, "load_seconds": round(time.perf_counter() - t0, 2)}
+        t0 = time.perf_counter()
+        refresh_panel_latest(conn, full=True)
+        result["refresh_full_seconds"] = round(time.perf_counter() - t0, 4)
+        result["queries"], rows = {}, {}
+        for name, sql in queries.items():
+            stats, rows[name] = time_query(conn, sql, args.repeat)
+            stats["explain"] = explain(conn, sql, analyze=args.analyze)
+            result["queries"][name] = stats
+        result["same_rows"] = sorted(rows["before"]) == sorted(rows["after"])
+    finally:
+        conn.close()
+    return result
+
+def main():
+    ap = argparse.ArgumentParser(description=f"Latency and EXPLAIN of {VIEW_NAME} before/after the latest-snapshot index")
+    ap.add_argument("--db-host", default="localhost")
+    ap.add_argument("--db-port", type=int, default=3306)
+    ap.add_argument("--db-user", default="root")
+    ap.add_argument("--db-pass", default="1234")
+    ap.add_argument("--db-name", default=BENCH_DB, help="scratch database: every table in it is dropped")
+    ap.add_argument("--sizes", default="1000,10000,50000", help="comma-separated firm-year counts")
+    ap.add_argument("--years", type=int, default=10)
+    ap.add_argument("--versions", type=int, default=3, help="snapshots per fiscal year")
+    ap.add_argument("--revision-rate", type=float, default=0.3, help="share of firm-years present in each later version")
+    ap.add_argument("--repeat", type=int, default=3)
+    ap.add_argument("--analyze", action="store_true", help="EXPLAIN ANALYZE instead of EXPLAIN FORMAT=TREE")
+    ap.add_argument("--batch-size", type=int, default=1000)
+    ap.add_argument("--seed", type=int, default=7)
+    ap.add_argument("--out", default=REPORT_PATH)
+    args = ap.parse_args()
+    if args.db_name == SCHEMA_DB:
+        raise SystemExit(f"--db-name {SCHEMA_DB} là database thật: chọn một database nháp khác")
+
+    statements = split_statements(read_schema(db_name=args.db_name))
+    view_sql = next(s for s in statements if statement_kind(s) == "CREATE VIEW")
+    queries = {
+        "before": legacy_view_sql(view_sql),
+        "after": f"SELECT * FROM {VIEW_NAME}",
+        "panel_latest": f"SELECT {select_columns()} FROM {PANEL_TABLE}",
+    }
+    conn = connect(args)
+    try:
+        cur = conn.cursor()
+        cur.execute("SELECT VERSION()")
+        version = cur.fetchone()[0]
+        cur.close()
+    finally:
+        conn.close()
+
+    results = []
+    for size in [int(s) for s in args.sizes.split(",") if s.strip()]:
+        print(f">>> {size} firm-year ...")
+        r = bench_size(args, statements, queries, size)
+        results.append(r)
+        q = r["queries"]
+        print(f"   {r['fact_rows']} dòng FACT (nạp {r['load_seconds']}s), dựng {PANEL_TABLE} {r['refresh_full_seconds']}s")
+        for name, stats in q.items():
+            print(f"   {name:<13} {stats['rows']:>8} dòng  best {stats['best']:.4f}s  median {stats['median']:.4f}s")
+        print(f"   {'✅' if r['same_rows'] else '❌'} before/after cùng tập dòng; "
+              f"nhanh hơn x{q['before']['best'] / max(q['after']['best'], 1e-6):.1f}")
+
+    os.makedirs(os.path.dirname(os.path.abspath(args.out)), exist_ok=True)
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump({"mysql_version": version, "params": {k: v for k, v in vars(args).items() if k != "db_pass"},
+                   "queries": queries, "results": results}, f, ensure_ascii=False, indent=2, default=str)
+    print(f"✅ Đã ghi {args.out}")
+    if not all(r["same_rows"] for r in results):
+        raise SystemExit("❌ before và after trả về khác nhau")
+
+if __name__ == "__main__":
+    main()
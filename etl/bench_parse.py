@@ -0,0 +1,142 @@
+import argparse
+import math
+import os
+import time
+import numpy as np
+import pandas as pd
+
+from import_panel import (NULL_LIKE, norm_colname, parse_innovation_cell, parse_innovation_series,
+    smart_to_number, smart_to_number_series, to_int, to_int_series)
+
+# So sánh đường parse từng ô (Series.apply) với đường vector hóa trong import_panel.
+# Chạy: python bench_parse.py --rows 50000
+#   1) Kiểm tra tương đương trên bộ EDGE_CASES cố định (thoát lỗi nếu lệch)
+#   2) Kiểm tra tương đương + đo thời gian trên sheet master_39 được nhân bản tới --rows dòng
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_EXCEL = os.path.join(BASE_DIR, "data", "Final Gộp 39 trường dữ liệu (FINAL 3).xlsx")
+
+INT_COLS = ["shares_outstanding", "employees_count", "firm_age", "fiscal_year"]
+INNOV_COLS = ["product_innovation", "process_innovation"]
+TEXT_COLS = ["ticker", "company_name"]
+
+EDGE_CASES = [
+    None, float("nan"), pd.NaT, "", " ", "-", "NA", "n/a", "NULL", "None", "thiếu", "Thieu", "nan", "  nan  ",
+    0, 1, -1, 2, 0.0, 1.0, 0.4, 0.7, 1.9, -0.5, 2.5, 3.5, True, False, 10**20, float("inf"), np.int64(7),
+    "0", "1", "2", "1.5", "1,5", "1.234.567", "1,234,567", "1.234.567,89", "1,234,567.89", "1.234,5",
+    "12,345.6", "1 234 567", "  42  ", "+5", "-5", "--5", "1-2", ".", ",", ".5", "5.", "1e5", "abc",
+    "12abc34", "(1,234)", "1.2.3,4", "VND 1.000", "٣", "١٢,٥",
+    "1 (note)", "0 (no evidence)", " 1 ( spaced note ) ", "1 ()", "1(", "1 (a) (b)", "1\n(multi\nline)",
+    "0", "1 note", "yes", "Yes", "TRUE", "có", "Co", "no", "False", "không", "Khong", "maybe",
+    "https://vietstock.vn/x", "2 (note)",
+]
+
+def same(a, b, strict_none: bool = False) -> bool:
+    if strict_none and (a is None or b is None):
+        return a is b  # note columns: NaN would be truthy in merge_notes()
+    a_null = a is None or (isinstance(a, float) and math.isnan(a))
+    b_null = b is None or (isinstance(b, float) and math.isnan(b))
+    if a_null or b_null:
+        return a_null and b_null
+    return a == b
+
+def compare(name: str, expected: pd.Series, got: pd.Series, strict_none: bool = False) -> int:
+    bad = 0
+    for idx, e, g in zip(expected.index, expected.tolist(), got.tolist()):
+        if not same(e, g, strict_none):
+            bad += 1
+            if bad <= 5:
+                print(f"  [MISMATCH] {name} row={idx}: per-cell={e!r} vectorized={g!r}")
+    return bad
+
+def check_column(name: str, s: pd.Series, kind: str) -> int:
+    if kind == "int":
+        return compare(name, s.apply(to_int), to_int_series(s))
+    if kind == "innov":
+        parsed = s.apply(parse_innovation_cell)
+        dummy, note = parse_innovation_series(s)
+        return (compare(name + ".dummy", parsed.apply(lambda x: x[0]), dummy)
+                + compare(name + ".note", parsed.apply(lambda x: x[1]).astype(object), note, strict_none=True))
+    return compare(name, s.apply(smart_to_number), smart_to_number_series(s))
+
+def check_edge_cases() -> int:
+    s = pd.Series(EDGE_CASES, dtype=object)
+    # parse_innovation_cell() raises on inf (int(inf)); the vectorized path just returns NaN
+    innov = s[~s.apply(lambda v: isinstance(v, float) and math.isinf(v))]
+    bad = check_column("edge", s, "num") + check_column("edge", s, "int") + check_column("edge", innov, "innov")
+    print(f">>> edge cases: {len(s)} values, mismatches = {bad}")
+    return bad
+
+def load_sample(excel: str, sheet: str, rows: int, dirty_rate: float, seed: int) -> pd.DataFrame:
+    if os.path.exists(excel):
+        base = pd.read_excel(excel, sheet_name=sheet)
+        base.columns = [norm_colname(c) for c in base.columns]
+    else:
+        print(f">>> {excel} not found, using synthetic base frame")
+        base = pd.DataFrame({"net_sales": [7452592109444, 123.5, None], "product_innovation": [0, "1 (note)", None]})
+
+    reps = max(1, math.ceil(rows / len(base)))
+    df = pd.concat([base] * reps, ignore_index=True).head(rows).astype(object)
+
+    # Bẩn hóa dữ liệu: token NULL, dấu phân cách hỗn hợp, ghi chú innovation
+    rng = np.random.default_rng(seed)
+    tokens = sorted(NULL_LIKE) + ["1.234.567", "1,234,567.89", "1.234,5", "12,5", " 42 ", "1 234", "abc"]
+    innov_tokens = ["1 (báo cáo thường niên)", "0", "1", "có", "không", "-", "1 ()", "x"]
+    for c in df.columns:
+        if c in TEXT_COLS:
+            continue
+        hit = rng.random(len(df)) < dirty_rate
+        pool = innov_tokens if c in INNOV_COLS else tokens
+        df.loc[hit, c] = rng.choice(pool, size=int(hit.sum()))
+    return df
+
+def timed(fn):
+    t0 = time.perf_counter()
+    fn()
+    return time.perf_counter() - t0
+
+def main():
+    ap = argparse.ArgumentParser(description="Equivalence check + benchmark: per-cell vs vectorized parsing.")
+    ap.add_argument("--excel", default=DEFAULT_EXCEL)
+    ap.add_argument("--sheet", default="master_39")
+    ap.add_argument("--rows", type=int, default=20000)
+    ap.add_argument("--dirty-rate", type=float, default=0.1)
+    ap.add_argument("--seed", type=int, default=42)
+    args = ap.parse_args()
+
+    bad = check_edge_cases()
+
+    df = load_sample(args.excel, args.sheet, args.rows, args.dirty_rate, args.seed)
+    cols = [c for c in df.columns if c not in TEXT_COLS]
+    kinds = {c: "int" if c in INT_COLS else "innov" if c in INNOV_COLS else "num" for c in cols}
+    print(f">>> sample: {len(df)} rows x {len(cols)} parsed columns")
+
+    for c in cols:
+        bad += check_column(c, df[c], kinds[c])
+    print(f">>> sample mismatches = {bad}")
+
+    def per_cell():
+        for c in cols:
+            if kinds[c] == "innov":
+                parsed = df[c].apply(parse_innovation_cell)
+                parsed.apply(lambda x: x[0]), parsed.apply(lambda x: x[1])
+            else:
+                df[c].apply(to_int if kinds[c] == "int" else smart_to_number)
+
+    def vectorized():
+        for c in cols:
+            if kinds[c] == "innov":
+                parse_innovation_series(df[c])
+            else:
+                (to_int_series if kinds[c] == "int" else smart_to_number_series)(df[c])
+
+    t_cell = timed(per_cell)
+    t_vec = timed(vectorized)
+    print(f">>> per-cell   : {t_cell:.3f}s")
+    print(f">>> vectorized : {t_vec:.3f}s  (x{t_cell / t_vec:.1f})")
+
+    if bad:
+        raise SystemExit(f"{bad} mismatches between per-cell and vectorized parsing")
+
+if __name__ == "__main__":
+    main()
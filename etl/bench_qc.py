@@ -0,0 +1,588 @@
+import argparse
+import os
+import time
+import numpy as np
+import pandas as pd
+
+from qc_rules import GROWTH_LIMITS, MARKET_CAP_TOLERANCE, evaluate_rules
+from schema_catalog import catalog_from_sql
+
+# Đo thời gian + kiểm tra tương đương cho bộ luật QC theo cột (qc_rules) so với vòng lặp cũ của qc_checks:
+#   python bench_qc.py                      # 100 -> 100k firm-year, bản cũ chạy tới --legacy-max dòng
+#   python bench_qc.py --sizes 100,1000 --legacy-max 1000
+# - legacy_run_qc_checks bên dưới là bản sao nguyên văn run_qc_checks trước khi chuyển sang qc_rules
+#   (find_table dùng schema_catalog.catalog_from_sql thay vì INFORMATION_SCHEMA, để chạy không cần DB).
+# - Parity 1: outputs/panel_latest.csv + doanh nghiệp TEST dựng lại từ outputs/qc_report.csv; mọi dòng của
+#   qc_report.csv (ticker, fiscal_year, error_type, message) phải xuất hiện trong kết quả mới.
+# - Parity 2: trên mọi panel tổng hợp có lỗi cài sẵn, kết quả mới == kết quả cũ từng ô, trừ các dòng
+#   AGE_LOGIC_ERROR / PROGRESSION_ERROR do bản cũ so sánh với NaN (xem ghi chú trong qc_rules.py).
+# Thoát lỗi nếu có sai khác.
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+PANEL_PATH = os.path.join(BASE_DIR, "outputs", "panel_latest.csv")
+REPORT_PATH = os.path.join(BASE_DIR, "outputs", "qc_report.csv")
+
+CATALOG = catalog_from_sql()
+engine = None  # the frozen copy below passes it through to find_table
+
+def find_table(engine, column_name):
+    return CATALOG.table_for(column_name)
+
+def find_tables_for_columns(engine, columns):
+    return CATALOG.tables_for(columns)
+
+def table_for(columns):
+    if len(columns) == 1:
+        return find_table(engine, columns[0])
+    return find_tables_for_columns(engine, columns)
+
+def new_run_qc_checks(df):
+    """Same wrapper as qc_checks.run_qc_checks, with the offline catalog."""
+    issues = evaluate_rules(df, table_for)
+    if issues.empty:
+        return pd.DataFrame([{'new_value': None}])
+    return pd.concat([issues, pd.DataFrame([{'new_value': None}])], ignore_index=True).infer_objects()
+
+#====================================================================
+# Bản cũ (nguyên văn)
+def legacy_run_qc_checks(df):
+    """Thực hiện các quy định QC"""
+    qc_results = []
+    df = df.sort_values(by=['ticker', 'fiscal_year']) 
+
+    for ticker, group in df.groupby('ticker'):
+        # Chuyển nhóm về list để duyệt theo chỉ mục (index)
+        rows = group.to_dict('records')
+        
+        for i in range(len(rows)):
+            row = rows[i]
+            year = row['fiscal_year']
+            age = row.get('firm_age')
+            founded = row.get('founded_year')
+
+            # 1. Kiểm tra logic tuổi doanh nghiệp (firm_age) dựa trên năm thành lập (founded_year)
+            if founded is not None and age is not None:
+                expected_age = year - founded if year >= founded else None 
+                if age != expected_age:
+                    qc_results.append({
+                        'ticker': ticker, 
+                        'fiscal_year': year, 
+                        'table_name': find_table(engine, 'firm_age'),
+                        'column_name': 'firm_age',
+                        'error_type': 'AGE_LOGIC_ERROR', 
+                        'message': f"Không khớp năm thành lập. Có: {age}, Tính toán: {expected_age}",       
+                        'old_value': age,
+                    })
+
+            # 2. Kiểm tra tính tiến triển của tuổi doanh nghiệp qua các năm (firm_age phải tăng dần theo năm)
+            if i > 0:
+                prev_row = rows[i-1]
+                # Check nếu năm tăng 1 thì tuổi phải tăng 1
+                if year == prev_row['fiscal_year'] + 1:
+                    if age is not None and prev_row['firm_age'] is not None:
+                        if age != prev_row['firm_age'] + 1:
+                            qc_results.append({
+                                'ticker': ticker, 
+                                'fiscal_year': year, 
+                                'table_name': find_table(engine, 'firm_age'), 
+                                'column_name': 'firm_age',
+                                'error_type': 'PROGRESSION_ERROR', 
+                                'message': f"Tuổi không tăng tiến đều (Năm trước: {prev_row['firm_age']}, Năm nay: {age})",
+                                'old_value': age,
+                            })
+                # Check nếu bị mất năm (Time Gap)
+                elif year > prev_row['fiscal_year'] + 1:
+                    qc_results.append({
+                        'ticker': ticker, 
+                        'fiscal_year': f"{prev_row['fiscal_year']}-{year}",
+                        'table_name': None, 
+                        'column_name': 'fiscal_year', 
+                        'error_type': 'TIME_GAP', 
+                        'message': "Dữ liệu bị đứt quãng thời gian",
+                        'old_value': None
+                    })
+
+    for index, row in df.iterrows():
+        ticker = row['ticker']
+        year = row['fiscal_year']
+
+        # Các điều kiện kiểm tra tối thiểu
+        # 1. Kiểm tra Ownership ratios trong khoảng [0, 1]
+        own_fields = ['managerial_inside_own', 'state_own', 'institutional_own', 'foreign_own']
+        for field in own_fields:
+            val = row.get(field)
+            if val is not None and (val < 0 or val > 1):
+                qc_results.append({
+                    'ticker': ticker, 
+                    'fiscal_year': year, 
+                    'table_name': find_table(engine, field),
+                    'column_name': field,
+                    'error_type': 'RANGE_ERROR', 
+                    'message': f'Giá trị {val} nằm ngoài khoảng [0,1]',
+                    'old_value': val
+                })
+
+        # 2. Kiểm tra Shares outstanding > 0
+        shares = row.get('shares_outstanding')
+        if shares is not None and shares <= 0:
+            qc_results.append({
+                'ticker': ticker, 
+                'fiscal_year': year, 
+                'table_name': find_table(engine, 'shares_outstanding'),
+                'column_name': 'shares_outstanding',
+                'error_type': 'INVALID_VALUE', 
+                'message': 'Số lượng cổ phiếu phải lớn hơn 0',
+                'old_value': shares
+            })
+
+        # 3. Kiểm tra các trường không âm
+        non_negative_fields = [            
+            'net_sales',              
+            'total_assets',                       
+            'intangible_assets_net',                       
+            'total_liabilities',            
+            'cash_and_equivalents',       
+            'long_term_debt',                 
+            'current_assets',                  
+            'current_liabilities',           
+            'inventory',                               
+            'net_ppe',
+            'wip_goods_purchase',
+            'merchandise_purchase_year',
+            'firm_age',
+            'employees_count'
+        ]
+        for field in non_negative_fields:
+            val = row.get(field)
+            if val is not None and val < 0:
+                qc_results.append({
+                    'ticker': ticker, 
+                    'fiscal_year': year, 
+                    'table_name': find_table(engine, field),
+                    'column_name': field,
+                    'error_type': 'NEGATIVE_VALUE', 
+                    'message': f'Giá trị {field} không được âm',
+                    'old_value': val
+                })
+
+        # 4. Kiểm tra các trường không dương (chi phí)
+        non_positive_fields = [
+            'selling_expenses',             
+            'general_admin_expenses',
+            'manufacturing_overhead',         
+            'raw_material_consumption',                            
+            'outside_manufacturing_expenses', 
+            'production_cost',                
+            'rnd_expenses', 
+            'capex',  
+            'dividend_cash_paid'
+        ]
+        for field in non_positive_fields:
+            val = row.get(field)
+            if val is not None and val > 0:
+                qc_results.append({
+                    'ticker': ticker, 
+                    'fiscal_year': year, 
+                    'table_name': find_table(engine, field),
+                    'column_name': field,
+                    'error_type': 'POSITIVE_VALUE', 
+                    'message': f'Giá trị {field} không được dương',
+                    'old_value': val
+                })
+
+        # 5. Kiểm tra Growth ratio 
+        growth = row.get('growth_ratio')
+        if growth is not None:
+            if growth < GROWTH_LIMITS[0] or growth > GROWTH_LIMITS[1]:
+                qc_results.append({
+                    'ticker': ticker, 
+                    'fiscal_year': year, 
+                    'table_name': find_table(engine, 'growth_ratio'), 
+                    'column_name': 'growth_ratio',
+                    'error_type': 'OUTLIER', 
+                    'message': f'Tỷ lệ tăng trưởng {growth} bất thường',
+                    'old_value': growth
+                })
+
+        # 6. Kiểm tra tính nhất quán Market Cap
+        price = row.get('share_price')
+        mkt_cap = row.get('market_value_equity')
+        if all(v is not None for v in [shares, price, mkt_cap]):
+            calculated_cap = shares * price
+            diff = abs(calculated_cap - mkt_cap) / mkt_cap if mkt_cap != 0 else 0
+            if diff > MARKET_CAP_TOLERANCE:
+                qc_results.append({
+                    'ticker': ticker, 
+                    'fiscal_year': year, 
+                    'table_name': find_tables_for_columns(engine, ['market_value_equity', 'shares_outstanding', 'share_price']),
+                    'column_name': 'market_value_equity/shares_outstanding/share_price',
+                    'error_type': 'INCONSISTENT', 
+                    'message': f'Sai lệch vốn hóa ({diff:.2%}) so với tính toán',
+                    'old_value': (mkt_cap, shares, price)
+                })
+        
+        # Các điều kiện thêm ngoài 6 mục tối thiểu
+        # 7. Kiểm tra tính cân đối của bảng cân đối kế toán
+        assets = row.get('total_assets')
+        liabilities = row.get('total_liabilities')
+        equity = row.get('total_equity')
+
+        # Kiểm tra nếu cả 3 biến đều có dữ liệu
+        if all(v is not None for v in [assets, liabilities, equity]):
+            # Công thức: Tài sản = Nợ phải trả + Vốn chủ sở hữu
+            total_source = liabilities + equity
+            absolute_diff = abs(assets - total_source)
+            
+            # Tính tỷ lệ sai lệch tương đối
+            relative_diff = absolute_diff / assets if assets != 0 else 0
+
+            if relative_diff > MARKET_CAP_TOLERANCE:
+                qc_results.append({
+                    'ticker': ticker,
+                    'fiscal_year': year,
+                    'table_name': find_tables_for_columns(engine, ['total_assets', 'total_liabilities', 'total_equity']),
+                    'column_name': 'total_assets/total_liabilities/total_equity',
+                    'error_type': 'ACCOUNTING_IMBALANCE',
+                    'message': f'Bảng cân đối không khớp. Chênh lệch: {absolute_diff:,.0f} ({relative_diff:.2%})',
+                    'old_value': (assets, liabilities, equity)
+                })
+
+       # 8. Kiểm tra tính hợp lý thành phần tài sản
+        curr_assets = row.get('current_assets')
+        if assets is not None and curr_assets is not None and curr_assets > assets:
+            qc_results.append({
+                'ticker': ticker, 
+                'fiscal_year': year, 
+                'table_name': find_tables_for_columns(engine, ['current_assets', 'total_assets']),
+                'column_name': 'current_assets/total_assets',
+                'error_type': 'COMPONENT_ERROR', 
+                'message': 'Tài sản ngắn hạn vượt quá tổng tài sản',
+                'old_value': (curr_assets, assets)
+            })
+
+        cash = row.get('cash_and_equivalents')
+        inv = row.get('inventory')
+        if curr_assets is not None and cash is not None and inv is not None and (cash + inv) > curr_assets:
+            qc_results.append({
+                'ticker': ticker, 
+                'fiscal_year': year, 
+                'table_name': find_tables_for_columns(engine, ['cash_and_equivalents', 'inventory', 'current_assets']),
+                'column_name': 'cash_and_equivalents/inventory/current_assets',
+                'error_type': 'COMPONENT_ERROR', 
+                'message': 'Tổng tiền mặt và hàng tồn kho vượt quá tài sản ngắn hạn',
+                'old_value': (cash, inv, curr_assets)
+            })
+
+        ppe = row.get('net_ppe')
+        intang = row.get('intangible_assets_net')
+        if assets is not None and ppe is not None and intang is not None and (ppe + intang) > assets:
+            qc_results.append({
+                'ticker': ticker, 
+                'fiscal_year': year, 
+                'table_name': find_tables_for_columns(engine, ['net_ppe', 'intangible_assets_net', 'total_assets']),
+                'column_name': 'net_ppe/intangible_assets_net/total_assets',
+                'error_type': 'COMPONENT_ERROR', 
+                'message': 'Tổng PPE và tài sản vô hình vượt quá tổng tài sản',
+                'old_value': (ppe, intang, assets)
+            })
+
+        # 9. Kiểm tra tính hợp lý thành phần nợ
+        lt_debt = row.get('long_term_debt')
+        curr_liab = row.get('current_liabilities')
+        if liabilities is not None and lt_debt is not None and curr_liab is not None and (lt_debt + curr_liab) > liabilities:
+                qc_results.append({
+                    'ticker': ticker, 
+                    'fiscal_year': year, 
+                    'table_name': find_tables_for_columns(engine, ['long_term_debt', 'current_liabilities', 'total_liabilities']),
+                    'column_name': 'long_term_debt/current_liabilities/total_liabilities',
+                    'error_type': 'COMPONENT_ERROR', 
+                    'message': 'Nợ dài hạn và nợ ngắn hạn vượt quá tổng nợ',
+                    'old_value': (lt_debt, curr_liab, liabilities)
+                })
+
+        # 10. Kiểm tra các biến về doanh thu và lợi nhuận:
+        revenue = row.get('net_sales')
+        net_income = row.get('net_income')
+        if revenue is not None and net_income is not None and net_income > revenue:
+            qc_results.append({
+                'ticker': ticker, 
+                'fiscal_year': year, 
+                'table_name': find_tables_for_columns(engine, ['net_income', 'net_sales']),
+                'column_name': 'net_income/net_sales',
+                'error_type': 'COMPONENT_ERROR', 
+                'message': 'Lợi nhuận ròng vượt quá doanh thu',
+                'old_value': (net_income, revenue)
+            })
+
+        # 11. Kiểm tra các trường dummy (0/1)
+        prod = row['product_innovation']
+        proc = row['process_innovation']
+        note = str(row['evidence_note']).strip() if row['evidence_note'] else ""
+
+        for field in ['product_innovation', 'process_innovation']:
+            val = row.get(field)
+            if pd.isna(val) or val is None:
+                qc_results.append({
+                    'ticker': ticker, 
+                    'fiscal_year': year,
+                    'table_name': find_table(engine, field),
+                    'column_name': field,
+                    'error_type': 'MISSING_VALUE', 
+                    'message': f'Biến {field} đang bị để trống (NULL). Chỉ chấp nhận 0 hoặc 1.',
+                    'old_value': None
+                    })
+                continue 
+            
+            if val not in [0, 1]:
+                qc_results.append({
+                    'ticker': ticker, 
+                    'fiscal_year': year,
+                    'table_name': find_table(engine, field),
+                    'column_name': field,
+                    'error_type': 'INVALID_DUMMY', 
+                    'message': f'Giá trị {field} không hợp lệ (hiện tại là {val}). Chỉ chấp nhận 0 hoặc 1.',
+                    'old_value': val
+                })
+
+        note_lower = note.lower()
+        parts = note_lower.split('|')
+        
+        prod_content = ""
+        proc_content = ""
+
+        for p in parts:
+            if 'product:' in p:
+                prod_content = p.replace('product:', '').replace('nan', '').replace('none', '').strip()
+            if 'process:' in p:
+                proc_content = p.replace('process:', '').replace('nan', '').replace('none', '').strip()
+
+        is_prod_note_empty = not prod_content
+        is_proc_note_empty = not proc_content
+
+        if prod == 1 and is_prod_note_empty:
+            qc_results.append({
+                'ticker': ticker, 'fiscal_year': year, 
+                'table_name': find_table(engine, 'evidence_note'),
+                'column_name': 'evidence_note', 
+                'error_type': 'MISSING_PRODUCT_NOTE',
+                'message': f'Đổi mới SP (1) nhưng ghi chú "product:" trống hoặc nan. (Gốc: "{note}")',
+                'old_value': note
+            })
+
+        if prod == 0 and not is_prod_note_empty:
+            qc_results.append({
+                'ticker': ticker, 'fiscal_year': year, 
+                'table_name': find_table(engine, 'evidence_note'),
+                'column_name': 'evidence_note', 'error_type': 'UNEXPECTED_PRODUCT_NOTE',
+                'message': f'Không đổi mới SP (0) nhưng "product:" lại có thuyết minh. (Gốc: "{note}")',
+                'old_value': note
+            })
+
+        if proc == 1 and is_proc_note_empty:
+            qc_results.append({
+                'ticker': ticker, 'fiscal_year': year, 
+                'table_name': find_table(engine, 'evidence_note'),
+                'column_name': 'evidence_note', 'error_type': 'MISSING_PROCESS_NOTE',
+                'message': f'Đổi mới QT (1) nhưng ghi chú "process:" trống hoặc nan. (Gốc: "{note}")',
+                'old_value': note
+            })
+        if proc == 0 and not is_proc_note_empty:
+            qc_results.append({
+                'ticker': ticker, 'fiscal_year': year, 
+                'table_name': find_table(engine, 'evidence_note'),
+                'column_name': 'evidence_note', 'error_type': 'UNEXPECTED_PROCESS_NOTE',
+                'message': f'Không đổi mới QT (0) nhưng "process:" lại có thuyết minh. (Gốc: "{note}")',
+                'old_value': note
+            })
+
+    qc_results.append({
+        'new_value': None
+    })  
+    return pd.DataFrame(qc_results)
+#====================================================================
+# Dữ liệu kiểm thử
+def legacy_quirk_keys(df):
+    """(ticker, fiscal_year) whose age / progression checks compare against NULL in the old loop."""
+    d = df.sort_values(by=['ticker', 'fiscal_year'])
+    age = pd.to_numeric(d.get('firm_age'), errors="coerce")
+    founded = pd.to_numeric(d.get('founded_year'), errors="coerce")
+    same = d['ticker'].eq(d['ticker'].shift(1))
+    consecutive = same & d['fiscal_year'].eq(d['fiscal_year'].shift(1) + 1)
+    keys = lambda m: set(zip(d.loc[m, 'ticker'], d.loc[m, 'fiscal_year']))
+    age_null = age.isna() | founded.isna()
+    prog_null = consecutive & (age.isna() | age.shift(1).isna())
+    return keys(age_null), keys(prog_null)
+
+def drop_legacy_quirks(df, legacy):
+    age_keys, prog_keys = legacy_quirk_keys(df)
+    key = list(zip(legacy['ticker'], legacy['fiscal_year']))
+    quirk = [(t == 'AGE_LOGIC_ERROR' and k in age_keys) or (t == 'PROGRESSION_ERROR' and k in prog_keys)
+             for t, k in zip(legacy['error_type'], key)]
+    return legacy[~np.array(quirk, dtype=bool)].reset_index(drop=True), int(sum(quirk))
+
+def make_panel(n_rows, seed=0, dirty=0.02, years=5):
+    """Synthetic firm-year panel (consistent accounting values) with every QC rule violated on ~dirty of the rows."""
+    rng = np.random.default_rng(seed)
+    n_firms = max(1, n_rows // years)
+    firm = np.repeat(np.arange(n_firms), years)
+    year = np.tile(np.arange(2020, 2020 + years), n_firms)
+    n = len(firm)
+    u = lambda lo, hi: rng.uniform(lo, hi, n)
+    assets = np.round(np.exp(rng.normal(27, 1.5, n)), 0)
+    liab = np.round(assets * u(0.2, 0.7), 0)
+    ca = np.round(assets * u(0.3, 0.6), 0)
+    shares = np.round(rng.uniform(1e7, 1e9, n), 0)
+    price = np.round(rng.uniform(5e3, 1e5, n), 0)
+    founded = np.repeat(rng.integers(1950, 2015, n_firms), years).astype(float)
+    prod, proc = rng.integers(0, 2, n).astype(float), rng.integers(0, 2, n).astype(float)
+    df = pd.DataFrame({
+        'firm_id': firm + 1, 'ticker': [f"F{i:05d}" for i in firm], 'fiscal_year': year,
+        'managerial_inside_own': u(0, 0.3), 'state_own': u(0, 0.5), 'institutional_own': u(0, 0.5),
+        'foreign_own': u(0, 0.49), 'shares_outstanding': shares, 'net_sales': np.round(assets * u(0.3, 1.2), 0),
+        'total_assets': assets, 'total_liabilities': liab, 'total_equity': assets - liab,
+        'current_assets': ca, 'cash_and_equivalents': np.round(ca * u(0.05, 0.4), 0),
+        'inventory': np.round(ca * u(0.05, 0.4), 0), 'net_ppe': np.round(assets * u(0.1, 0.4), 0),
+        'intangible_assets_net': np.round(assets * u(0, 0.1), 0), 'long_term_debt': np.round(liab * u(0, 0.4), 0),
+        'current_liabilities': np.round(liab * u(0.2, 0.6), 0),
+        'wip_goods_purchase': np.round(assets * u(0, 0.05), 0), 'merchandise_purchase_year': np.round(assets * u(0, 0.05), 0),
+        'employees_count': rng.integers(10, 5000, n).astype(float),
+        'selling_expenses': -np.round(assets * u(0, 0.1), 0), 'general_admin_expenses': -np.round(assets * u(0, 0.1), 0),
+        'manufacturing_overhead': -np.round(assets * u(0, 0.1), 0),
+        'raw_material_consumption': -np.round(assets * u(0, 0.1), 0),
+        'outside_manufacturing_expenses': -np.round(assets * u(0, 0.1), 0),
+        'production_cost': -np.round(assets * u(0, 0.3), 0), 'rnd_expenses': -np.round(assets * u(0, 0.02), 0),
+        'capex': -np.round(assets * u(0, 0.1), 0), 'dividend_cash_paid': -np.round(assets * u(0, 0.05), 0),
+        'growth_ratio': np.round(u(-0.5, 1.0), 2), 'market_value_equity': shares * price, 'share_price': price,
+        'founded_year': founded, 'firm_age': year - founded,
+        'product_innovation': prod, 'process_innovation': proc,
+    })
+    df['net_income'] = np.round(df['net_sales'] * u(-0.2, 0.3), 0)
+    url = "https://example.vn/bctc.pdf"
+    df['evidence_note'] = [f"Product: {url if p else 'nan'} | Process: {url if q else 'nan'}" for p, q in zip(prod, proc)]
+
+    # --- Lỗi cài sẵn: mỗi loại trên một tập dòng ngẫu nhiên ---
+    def pick():
+        return rng.random(n) < dirty
+    cols = df.columns
+    df.loc[pick(), 'foreign_own'] = -0.02
+    df.loc[pick(), 'state_own'] = 1.5
+    df.loc[pick(), 'shares_outstanding'] = 0.0
+    df.loc[pick(), 'total_liabilities'] *= -1
+    df.loc[pick(), 'capex'] *= -1
+    df.loc[pick(), 'growth_ratio'] = 9.0
+    df.loc[pick(), 'market_value_equity'] *= 1.5
+    df.loc[pick(), 'total_equity'] *= 3
+    df.loc[pick(), 'current_assets'] = df['total_assets'] * 2
+    df.loc[pick(), 'cash_and_equivalents'] = df['current_assets'] * 2
+    df.loc[pick(), 'net_ppe'] = df['total_assets']
+    df.loc[pick(), 'long_term_debt'] = df['total_liabilities']
+    df.loc[pick(), 'net_income'] = df['net_sales'] * 2
+    df.loc[pick(), 'product_innovation'] = 2.0
+    df.loc[pick(), 'process_innovation'] = np.nan
+    df.loc[pick(), 'evidence_note'] = f"Product: {url} | Process: none"
+    df.loc[pick(), 'evidence_note'] = np.nan
+    df.loc[pick(), 'evidence_note'] = None
+    df.loc[pick(), 'firm_age'] += 1
+    df.loc[pick(), 'founded_year'] = np.nan
+    df.loc[pick(), 'firm_age'] = np.nan
+    for c in rng.choice([c for c in cols if c not in ('firm_id', 'ticker', 'fiscal_year')], 8):
+        df.loc[pick(), c] = np.nan
+    df['evidence_note'] = df['evidence_note'].astype(object)
+    # Năm bị thiếu (TIME_GAP) + trộn thứ tự dòng
+    df = df[~(pick() & (df['fiscal_year'] == 2021))]
+    return df.sample(frac=1.0, random_state=seed).reset_index(drop=True)
+
+def fixture_panel():
+    """outputs/panel_latest.csv + the TEST firm behind outputs/qc_report.csv."""
+    df = pd.read_csv(PANEL_PATH, encoding="utf-8-sig")
+    df['founded_year'] = df['fiscal_year'] - df['firm_age']
+    df['share_price'] = (df['market_value_equity'] / df['shares_outstanding']).round(4)
+    url = "https://example.vn/bao-cao-thuong-nien.pdf"
+    df['evidence_note'] = [f"Product: {url if p else 'nan'} | Process: {url if q else 'nan'}"
+                           for p, q in zip(df['product_innovation'], df['process_innovation'])]
+    base = df[df['ticker'] == df['ticker'].iloc[0]].set_index('fiscal_year')
+    test = []
+    overrides = {
+        2020: {'total_assets': 2458144481968.0, 'total_liabilities': 1000000000000.0, 'total_equity': 2170698212734.0},
+        2022: {'market_value_equity': 1635870000000.0, 'shares_outstanding': 121269397.0, 'share_price': 17070.0,
+               'total_assets': 123433000000.0, 'total_liabilities': 1165609976787.0, 'total_equity': 3201200347306.0,
+               'current_assets': 1.31e16, 'net_ppe': 2007397494749.0, 'intangible_assets_net': 5880029246.0,
+               'cash_and_equivalents': 1.0, 'inventory': 1.0, 'long_term_debt': 1.0, 'current_liabilities': 1.0,
+               'net_income': 1.0},
+        2023: {'shares_outstanding': 0.0, 'market_value_equity': 1890730000000.0, 'share_price': 14160.0,
+               'product_innovation': 1, 'process_innovation': 0,
+               'evidence_note': "Product: https://www.kbsec.com.vn/pic/Service/VSC%202Q2022%2030_9%20%281%29.pdf"
+                                " | Process: https://www.kbsec.com.vn/pic/Service/VSC%202Q2022%2030_9%20%281%29.pdf"},
+        2024: {'foreign_own': -0.02, 'cash_and_equivalents': 1111546631380000.0, 'inventory': 47470252892.0,
+               'current_assets': 1811557308602.0, 'product_innovation': 1, 'process_innovation': 1,
+               'evidence_note': "Product: https://viconship.com/bao-cao-thuong-nien-nam-2023-cong-ty-cp-container-viet-nam?"
+                                " | Process: nan"},
+    }
+    for y, o in overrides.items():
+        row = base.loc[y].to_dict()
+        row.update(fiscal_year=y, ticker='TEST', firm_id=0, founded_year=y - row['firm_age'])
+        row.update(o)
+        test.append(row)
+    return pd.concat([df, pd.DataFrame(test)], ignore_index=True)
+
+#====================================================================
+def same_report(expected, got, label):
+    """Same qc_report.csv text (what qc_checks writes), cell by cell."""
+    if expected.to_csv(index=False) == got.to_csv(index=False):
+        return True
+    try:
+        pd.testing.assert_frame_equal(expected.astype(str), got.astype(str), check_dtype=False)
+        print(f"  [MISMATCH] {label}: same cells, different CSV text (dtypes)")
+    except AssertionError as e:
+        print(f"  [MISMATCH] {label}: {e}")
+    return False
+
+def report_keys(df):
+    d = df.dropna(subset=['error_type'])
+    return set(zip(d['ticker'].astype(str), d['fiscal_year'].astype(str), d['error_type'], d['message']))
+
+def timed(fn):
+    t0 = time.perf_counter()
+    out = fn()
+    return time.perf_counter() - t0, out
+
+def main():
+    ap = argparse.ArgumentParser(description="Benchmark + parity check of the vectorized QC rules.")
+    ap.add_argument("--sizes", default="100,1000,10000,100000", help="firm-year rows of the synthetic panels")
+    ap.add_argument("--legacy-max", type=int, default=10000, help="largest panel the old row loop is run on")
+    ap.add_argument("--seed", type=int, default=0)
+    args = ap.parse_args()
+    bad = 0
+
+    # Parity 1: the committed qc_report.csv
+    if os.path.exists(PANEL_PATH) and os.path.exists(REPORT_PATH):
+        fixture = fixture_panel()
+        got = new_run_qc_checks(fixture)
+        legacy, _ = drop_legacy_quirks(fixture, legacy_run_qc_checks(fixture))
+        bad += not same_report(legacy, got, "fixture vs legacy")
+        missing = report_keys(pd.read_csv(REPORT_PATH, encoding="utf-8-sig")) - report_keys(got)
+        for k in sorted(missing):
+            print(f"  [MISSING] qc_report.csv row not produced: {k}")
+        bad += len(missing)
+        print(f">>> qc_report.csv parity: {len(got) - 1} issues on the fixture, {len(missing)} report rows missing")
+
+    # Parity 2 + timing on synthetic panels
+    print(f"{'rows':>8} {'issues':>7} {'vectorized':>11} {'legacy':>9} {'speedup':>8}  parity")
+    for size in [int(s) for s in args.sizes.split(",")]:
+        df = make_panel(size, seed=args.seed)
+        t_new, got = timed(lambda: new_run_qc_checks(df))
+        if len(df) <= args.legacy_max:
+            t_old, legacy = timed(lambda: legacy_run_qc_checks(df))
+            legacy, quirks = drop_legacy_quirks(df, legacy)
+            ok = same_report(legacy, got, f"{len(df)} rows")
+            bad += not ok
+            print(f"{len(df):>8} {len(got) - 1:>7} {t_new:>10.3f}s {t_old:>8.3f}s {t_old / t_new:>7.1f}x  "
+                  f"{'ok' if ok else 'MISMATCH'} ({quirks} NULL-age rows only in legacy)")
+        else:
+            print(f"{len(df):>8} {len(got) - 1:>7} {t_new:>10.3f}s {'-':>9} {'-':>8}  -")
+
+    if bad:
+        raise SystemExit(f"{bad} parity failures")
+
+if __name__ == "__main__":
+    main()
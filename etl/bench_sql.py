@@ -0,0 +1,201 @@
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import subprocess
+import tempfile
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Any, Dict, Iterator, List
+import pymysql
+from sqlalchemy import text
+from sqlalchemy.dialects import mysql
+
+from bench_panel_view import BENCH_DB, FIRST_YEAR, connect, explain, fact_tables, fill_synthetic, time_query
+from panel_as_of import MAX_SNAPSHOT_ID, as_of_query
+from panel_latest import EXPORT_SQL, QC_PANEL_SQL, VIEW_NAME, refresh_panel_latest
+from qc_pushdown import violations_sql
+from sql_script import SCHEMA_DB, SCHEMA_PATH, read_schema, run_statements, split_statements
+
+# Benchmark tầng SQL trên dữ liệu tổng hợp: view, truy vấn QC (get_data / --pushdown) và truy vấn export:
+#   python bench_sql.py --db-pass 1234                      # MySQL có sẵn, database nháp vn_firm_panel_bench
+#   python bench_sql.py --docker                            # container mysql:8.0 tạm, xóa khi xong
+#   python bench_sql.py --mysqld /usr/sbin/mysqld           # mysqld tạm với datadir trong thư mục tạm
+#   python bench_sql.py --sizes 1000,10000,100000 --versions 4 --baseline outputs/bench_sql_old.json
+# - Mỗi kích thước: nạp lại schema_and_seed.sql, sinh firm × năm × snapshot (bench_panel_view.fill_synthetic),
+#   dựng panel_latest, rồi đo mỗi truy vấn --repeat lần (execute + fetchall) và lấy EXPLAIN FORMAT=TREE
+#   (EXPLAIN ANALYZE nếu --analyze) cùng dung lượng dữ liệu / index của từng bảng.
+# - Báo cáo JSON (--out, mặc định outputs/bench_sql.json) ghi kèm phiên bản MySQL và SHA-256 của schema,
+#   --baseline so best time từng (kích thước, truy vấn) với một báo cáo cũ.
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+REPORT_PATH = os.path.join(BASE_DIR, "outputs", "bench_sql.json")
+DOCKER_IMAGE = "mysql:8.0"
+
+def literal_sql(sql: str, params: Dict[str, Any]) -> str:
+    """A :named-bind query with its values inlined (so it can be timed and EXPLAINed on a plain cursor)."""
+    return str(text(sql).bindparams(**params).compile(dialect=mysql.dialect(), compile_kwargs={"literal_binds": True}))
+
+def bench_queries(args) -> Dict[str, str]:
+    as_of_year = FIRST_YEAR + args.years // 2
+    sql, params = as_of_query()
+    return {
+        "view": f"SELECT * FROM {VIEW_NAME}",
+        "qc_get_data": QC_PANEL_SQL,
+        "qc_pushdown": violations_sql(QC_PANEL_SQL),
+        "export": EXPORT_SQL,
+        # Panel as of mid-range: the fiscal years up to as_of_year (about half), each with its versions dated by
+        # 30 June of the next year (fill_synthetic spaces them 30 days from 31 March: all of them unless --versions > 4)
+        "export_as_of": literal_sql(sql, dict(params, cutoff_date=f"{as_of_year + 1}-06-30", cutoff_id=MAX_SNAPSHOT_ID)),
+    }
+
+def wait_for_server(args, timeout: float) -> str:
+    """Poll until the server accepts connections; returns its version."""
+    deadline = time.time() + timeout
+    while True:
+        try:
+            conn = connect(args)
+            try:
+                cur = conn.cursor()
+                cur.execute("SELECT VERSION()")
+                return cur.fetchone()[0]
+            finally:
+                conn.close()
+        except pymysql.err.OperationalError:
+            if time.time() > deadline:
+                raise SystemExit(f"❌ MySQL không sẵn sàng sau {timeout:.0f}s ({args.db_host}:{args.db_port})")
+            time.sleep(1)
+
+@contextmanager
+def mysql_server(args) -> Iterator[str]:
+    """Start a throwaway server (--docker / --mysqld) or use the configured one; yields the server version."""
+    if args.docker:
+        name = f"vn-firm-panel-bench-{os.getpid()}"
+        subprocess.run(["docker", "run", "-d", "--rm", "--name", name, "-e", f"MYSQL_ROOT_PASSWORD={args.db_pass}",
+                        "-p", f"{args.db_port}:3306", args.docker], check=True, stdout=subprocess.DEVNULL)
+        print(f"🐳 Container {name} ({args.docker}) trên cổng {args.db_port}")
+        try:
+            yield wait_for_server(args, args.start_timeout)
+        finally:
+            subprocess.run(["docker", "stop", name], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    elif args.mysqld:
+        datadir = tempfile.mkdtemp(prefix="vn_firm_panel_bench_")
+        user = ["--user=root"] if hasattr(os, "geteuid") and os.geteuid() == 0 else []
+        subprocess.run([args.mysqld, "--no-defaults", "--initialize-insecure", f"--datadir={datadir}/data"] + user,
+                       check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        proc = subprocess.Popen([args.mysqld, "--no-defaults", f"--datadir={datadir}/data", f"--port={args.db_port}",
+                                 f"--socket={datadir}/mysqld.sock", "--mysqlx=OFF", "--skip-log-bin",
+                                 f"--log-error={datadir}/error.log"] + user)
+        args.db_host, args.db_user, args.db_pass = "127.0.0.1", "root", ""
+        print(f"🛠️ mysqld tạm (pid {proc.pid}) trên cổng {args.db_port}, datadir {datadir}")
+        try:
+            yield wait_for_server(args, args.start_timeout)
+        finally:
+            proc.terminate()
+            proc.wait(timeout=120)
+            shutil.rmtree(datadir, ignore_errors=True)
+    else:
+        yield wait_for_server(args, 5)
+
+def table_sizes(conn) -> Dict[str, Dict[str, int]]:
+    cur = conn.cursor()
+    try:
+        cur.execute("SELECT TABLE_NAME, TABLE_ROWS, DATA_LENGTH, INDEX_LENGTH FROM INFORMATION_SCHEMA.TABLES "
+                    "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_TYPE = 'BASE TABLE' ORDER BY TABLE_NAME")
+        return {t: {"rows_estimate": int(r or 0), "data_bytes": int(d or 0), "index_bytes": int(i or 0)}
+                for t, r, d, i in cur.fetchall()}
+    finally:
+        cur.close()
+
+def run_size(args, statements: List[str], queries: Dict[str, str], firm_years: int) -> Dict[str, Any]:
+    conn = connect(args)
+    try:
+        t0 = time.perf_counter()
+        run_statements(conn, statements)
+        fact_rows = fill_synthetic(conn, fact_tables(statements), firm_years, args)
+        result = {"firm_years": firm_years, "fact_rows": fact_rows, "load_seconds": round(time.perf_counter() - t0, 2)}
+        t0 = time.perf_counter()
+        _, result["panel_rows"] = refresh_panel_latest(conn, full=True)
+        result["refresh_full_seconds"] = round(time.perf_counter() - t0, 4)
+        result["tables"] = table_sizes(conn)
+        result["queries"] = {}
+        for name, sql in queries.items():
+            stats, _ = time_query(conn, sql, args.repeat)
+            stats["explain"] = explain(conn, sql, analyze=args.analyze)
+            result["queries"][name] = stats
+    finally:
+        conn.close()
+    return result
+
+def compare(results: List[Dict[str, Any]], baseline_path: str) -> None:
+    with open(baseline_path, encoding="utf-8") as f:
+        baseline = {r["firm_years"]: r["queries"] for r in json.load(f)["results"]}
+    print(f">>> So với {baseline_path} (best time, <1 là nhanh hơn):")
+    for r in results:
+        old = baseline.get(r["firm_years"])
+        if old is None:
+            continue
+        ratios = [f"{name} x{stats['best'] / max(old[name]['best'], 1e-6):.2f}"
+                  for name, stats in r["queries"].items() if name in old]
+        print(f"   {r['firm_years']:>8} firm-year: " + ", ".join(ratios))
+
+def main():
+    ap = argparse.ArgumentParser(description="Time the panel view, QC and export queries on synthetic data at scale")
+    ap.add_argument("--db-host", default="localhost")
+    ap.add_argument("--db-port", type=int, default=3306)
+    ap.add_argument("--db-user", default="root")
+    ap.add_argument("--db-pass", default="1234")
+    ap.add_argument("--db-name", default=BENCH_DB, help="scratch database: every table in it is dropped")
+    server = ap.add_mutually_exclusive_group()
+    server.add_argument("--docker", nargs="?", const=DOCKER_IMAGE, metavar="IMAGE",
+                        help=f"run a throwaway container (default image {DOCKER_IMAGE}) on --db-port")
+    server.add_argument("--mysqld", metavar="PATH", help="start a throwaway mysqld binary on --db-port")
+    ap.add_argument("--start-timeout", type=float, default=180)
+    ap.add_argument("--sizes", default="100,1000,10000", help="comma-separated firm-year counts")
+    ap.add_argument("--years", type=int, default=10)
+    ap.add_argument("--versions", type=int, default=3, help="snapshots per fiscal year")
+    ap.add_argument("--revision-rate", type=float, default=0.3, help="share of firm-years present in each later version")
+    ap.add_argument("--repeat", type=int, default=3)
+    ap.add_argument("--analyze", action="store_true", help="EXPLAIN ANALYZE instead of EXPLAIN FORMAT=TREE")
+    ap.add_argument("--batch-size", type=int, default=1000)
+    ap.add_argument("--seed", type=int, default=7)
+    ap.add_argument("--out", default=REPORT_PATH)
+    ap.add_argument("--baseline", help="earlier report to compare best times against")
+    args = ap.parse_args()
+    if args.db_name == SCHEMA_DB:
+        raise SystemExit(f"--db-name {SCHEMA_DB} là database thật: chọn một database nháp khác")
+
+    statements = split_statements(read_schema(db_name=args.db_name))
+    queries = bench_queries(args)
+    with open(SCHEMA_PATH, "rb") as f:
+        schema_sha256 = hashlib.sha256(f.read()).hexdigest()
+    started = datetime.now()
+    results = []
+    with mysql_server(args) as version:
+        print(f"✅ MySQL {version}")
+        for size in [int(s) for s in args.sizes.split(",") if s.strip()]:
+            print(f">>> {size} firm-year ...")
+            r = run_size(args, statements, queries, size)
+            results.append(r)
+            print(f"   {r['fact_rows']} dòng FACT (nạp {r['load_seconds']}s), "
+                  f"panel_latest {r['panel_rows']} dòng ({r['refresh_full_seconds']}s)")
+            for name, stats in r["queries"].items():
+                print(f"   {name:<13} {stats['rows']:>8} dòng  best {stats['best']:.4f}s  median {stats['median']:.4f}s")
+
+    os.makedirs(os.path.dirname(os.path.abspath(args.out)), exist_ok=True)
+    report = {
+        "started_at": started.isoformat(timespec="seconds"), "mysql_version": version,
+        "schema_sha256": schema_sha256,
+        "params": {k: v for k, v in vars(args).items() if k not in ("db_pass", "baseline")},
+        "queries": queries, "results": results,
+    }
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2, default=str)
+    print(f"✅ Đã ghi {args.out}")
+    if args.baseline:
+        compare(results, args.baseline)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+import argparse
+import os
+import tempfile
+import time
+import pandas as pd
+
+# Đo thời gian đọc workbook: pd.read_excel trực tiếp vs workbook_cache (cold = chưa có cache, warm = đã có).
+# Chạy: python bench_workbook_cache.py --repeat 5
+#   Thoát lỗi nếu frame đọc từ cache khác frame đọc trực tiếp từ Excel.
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_WORKBOOKS = [
+    (os.path.join(BASE_DIR, "data", "Final Gộp 39 trường dữ liệu (FINAL 3).xlsx"), "master_39"),
+    (os.path.join(BASE_DIR, "data", "ttin cty.xlsx"), None),
+]
+
+def timed(fn):
+    t0 = time.perf_counter()
+    out = fn()
+    return time.perf_counter() - t0, out
+
+def same_frames(expected, got) -> bool:
+    if isinstance(expected, dict):
+        return list(expected) == list(got) and all(same_frames(expected[k], got[k]) for k in expected)
+    try:
+        pd.testing.assert_frame_equal(expected, got, check_exact=True)
+    except AssertionError as e:
+        print(f"  [MISMATCH] {e}")
+        return False
+    # assert_frame_equal treats 1 == 1.0 == True in object columns; compare the Python types too
+    for c in range(expected.shape[1]):
+        if [type(v) for v in expected.iloc[:, c]] != [type(v) for v in got.iloc[:, c]]:
+            print(f"  [MISMATCH] cell types differ in column {expected.columns[c]!r}")
+            return False
+    return True
+
+def main():
+    ap = argparse.ArgumentParser(description="Cold vs warm read benchmark for workbook_cache.")
+    ap.add_argument("--excel", default=None, help="workbook to test (default: the two data/ workbooks)")
+    ap.add_argument("--sheet", default=None, help="sheet of --excel (default: every sheet)")
+    ap.add_argument("--repeat", type=int, default=3)
+    args = ap.parse_args()
+
+    # Fresh cache directory so the first read is really cold
+    os.environ["ETL_CACHE_DIR"] = tempfile.mkdtemp(prefix="wb_cache_bench_")
+    import workbook_cache as wc
+
+    workbooks = [(args.excel, args.sheet)] if args.excel else DEFAULT_WORKBOOKS
+    print(f">>> engine = {wc.excel_engine()} (reference {wc.DEFAULT_ENGINE}), cache dir = {wc.CACHE_DIR}")
+
+    bad = 0
+    for path, sheet in workbooks:
+        if not os.path.exists(path):
+            print(f">>> skip (not found): {path}")
+            continue
+        label = f"{os.path.basename(path)} [{sheet or 'all sheets'}]"
+
+        direct, cold, warm = [], [], []
+        for _ in range(args.repeat):
+            # Reference is always openpyxl, so an opt-in engine is checked against today's values too
+            t, expected = timed(lambda: pd.read_excel(path, sheet_name=sheet, engine=wc.DEFAULT_ENGINE))
+            direct.append(t)
+            wc.clear_cache(path)
+            t, got = timed(lambda: wc.read_excel(path, sheet_name=sheet))
+            cold.append(t)
+            bad += not same_frames(expected, got)
+            t, got = timed(lambda: wc.read_excel(path, sheet_name=sheet))
+            warm.append(t)
+            bad += not same_frames(expected, got)
+
+        t_direct, t_cold, t_warm = min(direct), min(cold), min(warm)
+        print(f">>> {label}")
+        print(f"    pd.read_excel ({wc.DEFAULT_ENGINE}) : {t_direct:.3f}s")
+        print(f"    cold (parse + write cache) : {t_cold:.3f}s")
+        print(f"    warm (parquet)             : {t_warm:.3f}s  (x{t_cold / t_warm:.1f} vs cold)")
+
+    wc.clear_cache()
+    if bad:
+        raise SystemExit(f"{bad} cached reads differ from pd.read_excel(engine={wc.DEFAULT_ENGINE!r})")
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,13 @@
+import os
+import sys
 import pandas as pd
 import pymysql
 from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+from dim_keys import KEYS, query
+from run_ledger import RunLedger
+from sql_batch import insert_many, update_clause
+from workbook_cache import read_excel
 
 # 1. Cấu hình kết nối MySQL
 db_config = {
@@ -16,6 +23,73 @@ def clean_date(x):
         return None
     return pd.to_datetime(x).date().isoformat()
 
+def clean_tag(tag: Any) -> Optional[str]:
+    """version_tag as written to the DB: stripped, empty -> NULL."""
+    if tag is None:
+        return None
+    return str(tag).strip() or None
+
+def tag_key(tag: Any) -> Optional[str]:
+    """version_tag as the unique key compares it (utf8mb4_unicode_ci: case-insensitive, trailing spaces ignored)."""
+    tag = clean_tag(tag)
+    return None if tag is None else tag.casefold()
+
+def fetch_snapshots(conn, snapshot_date: str, source_ids: List[int]) -> Dict[Tuple[int, int, Optional[str]], int]:
+    """(source_id, fiscal_year, tag_key(version_tag)) -> snapshot_id của một ngày (tag NULL: id lớn nhất thắng)."""
+    ids = sorted(set(source_ids))
+    rows = query(conn,
+        "SELECT snapshot_id, source_id, fiscal_year, version_tag FROM fact_data_snapshot "
+        f"WHERE snapshot_date = %s AND source_id IN ({','.join(['%s'] * len(ids))}) ORDER BY snapshot_id",
+        [snapshot_date] + ids)
+    return {(int(src), int(y), tag_key(tag)): int(sid) for sid, src, y, tag in rows}
+
+SnapshotKey = Tuple[str, int, Optional[str]]  # (source_name, fiscal_year, version_tag)
+SNAPSHOT_COLUMNS = ["snapshot_date", "fiscal_year", "period_from", "period_to", "source_id", "version_tag", "created_by"]
+
+def create_snapshot_map(conn, specs: List[Dict[str, Any]], snapshot_date: Optional[str] = None,
+                        created_by: str = "Group_Member", batch_size: int = 1000) -> Tuple[Dict[SnapshotKey, int], int]:
+    """
+    Tạo snapshot hàng loạt, chạy lại bao nhiêu lần cũng được (idempotent):
+    specs là list dict có source_name, fiscal_year, version_tag (period_from/period_to tùy chọn).
+    Một câu tra nguồn, một INSERT nhiều dòng ON DUPLICATE KEY UPDATE (trùng khóa
+    source/năm/ngày/tag thì chỉ cập nhật period + created_by), một SELECT lấy lại toàn bộ id
+    (thêm một SELECT trước khi ghi để đếm snapshot mới).
+    Trả về ({(source_name, fiscal_year, version_tag): snapshot_id}, số snapshot mới tạo). Không commit.
+    """
+    if not specs:
+        return {}, 0
+    snapshot_date = snapshot_date or datetime.now().strftime('%Y-%m-%d')
+    source_ids = KEYS.source_ids(conn, [s['source_name'] for s in specs])
+    unknown = sorted({s['source_name'] for s in specs} - set(source_ids))
+    if unknown:
+        raise SystemExit(f"source_name not found in dim_data_source: {unknown}")
+
+    before = fetch_snapshots(conn, snapshot_date, list(source_ids.values()))
+    rows, wanted = [], {}
+    seen = set()
+    for s in specs:
+        key = (s['source_name'], int(s['fiscal_year']), s['version_tag'])
+        # So khóa như MySQL so: 'v1', 'V1', 'v1 ' là cùng một snapshot
+        db_key = (source_ids[key[0]], key[1], tag_key(key[2]))
+        wanted[key] = db_key
+        if db_key in seen:  # cùng khóa xuất hiện nhiều lần: giữ dòng đầu
+            continue
+        seen.add(db_key)
+        if db_key[2] is None and db_key in before:
+            continue  # NULL không bao giờ trùng khóa UNIQUE: tự bỏ qua để không sinh bản sao
+        rows.append((snapshot_date, key[1], s.get('period_from'), s.get('period_to'),
+                     source_ids[key[0]], clean_tag(key[2]), created_by))
+
+    insert_many(conn, "fact_data_snapshot", SNAPSHOT_COLUMNS, rows, batch_size,
+                on_duplicate=update_clause(["period_from", "period_to", "created_by"], []))
+
+    after = fetch_snapshots(conn, snapshot_date, list(source_ids.values()))
+    snapshot_map = {key: after[db_key] for key, db_key in wanted.items()}
+    old_ids = set(before.values())
+    created = len(set(snapshot_map.values()) - old_ids)
+    KEYS.invalidate("snapshot")
+    return snapshot_map, created
+
 def create_snapshots_from_excel(excel_path):
     """
     Đọc cấu hình từ sheet version_info và tạo NHIỀU snapshot trong SQL.
@@ -23,10 +97,13 @@ def create_snapshots_from_excel(excel_path):
     """
     created_ids = []
     conn = None
+    run = RunLedger("create_snapshot", lambda: pymysql.connect(**db_config), {"excel_path": excel_path})
     
     try:
         # Đọc sheet version_info
-        df_ver = pd.read_excel(excel_path, sheet_name='version_info')
+        with run.stage("read_workbook") as st:
+            df_ver = read_excel(excel_path, sheet_name='version_info')
+            st.rows_read, st.bytes_read = len(df_ver), os.path.getsize(excel_path)
         
         # Xử lý giá trị trống (NaN)
         df_ver = df_ver.where(pd.notnull(df_ver), None)
@@ -37,67 +114,61 @@ def create_snapshots_from_excel(excel_path):
 
         # Kết nối Database
         conn = pymysql.connect(**db_config)
-        cursor = conn.cursor()
 
         snapshot_date = datetime.now().strftime('%Y-%m-%d')  # lấy 1 lần cho cả batch
 
         print(f"--- Bắt đầu tạo snapshots (Tìm thấy {len(df_ver)} dòng) ---")
 
-        # Bước 1: Vòng lặp qua từng dòng trong file Excel
-        for index, config in df_ver.iterrows():
-            source_name = config['source_name']
-            fiscal_year = int(config['fiscal_year'])
-            p_from = clean_date(config.get('period_from'))
-            p_to   = clean_date(config.get('period_to'))
-            version_tag = config['version_tag']
-            created_by  = "Group_Member"
-
-            # 1.1 Tra cứu source_id cho từng dòng
-            cursor.execute("SELECT source_id FROM dim_data_source WHERE source_name = %s", (source_name,))
-            result = cursor.fetchone()
-            
-            if not result:
-                print(f"Bỏ qua dòng {index+1}: Nguồn '{source_name}' chưa có trong dim_data_source!")
-                continue
-            
-            source_id = result[0]
-
-            # 1.2 Chèn vào fact_data_snapshot
-            query = """
-                INSERT INTO fact_data_snapshot 
-                (snapshot_date, fiscal_year, period_from, period_to, source_id, version_tag, created_by)
-                VALUES (%s, %s, %s, %s, %s, %s, %s)
-            """
-            values = (snapshot_date, fiscal_year, p_from, p_to, source_id, version_tag, created_by)
-            
-            cursor.execute(query, values)
-            new_id = cursor.lastrowid
-            created_ids.append(new_id)
-            
-            print(f"Dòng {index+1}: Đã tạo Snapshot ID {new_id} ({source_name} - {fiscal_year})")
-
-        conn.commit()
-        print(f"--- HOÀN THÀNH: Đã tạo tổng cộng {len(created_ids)} snapshots ---")
+        with run.stage("insert_snapshots") as st:
+            st.rows_read = len(df_ver)
+            source_ids = KEYS.source_ids(conn, df_ver['source_name'].dropna().unique().tolist())
+
+            # Bước 1: Gom các dòng hợp lệ (nguồn chưa có trong dim_data_source thì bỏ qua như trước)
+            specs = []
+            for index, config in zip(df_ver.index, df_ver.to_dict('records')):
+                if config['source_name'] not in source_ids:
+                    print(f"Bỏ qua dòng {index+1}: Nguồn '{config['source_name']}' chưa có trong dim_data_source!")
+                    continue
+                specs.append({
+                    "row": index + 1,
+                    "source_name": config['source_name'],
+                    "fiscal_year": int(config['fiscal_year']),
+                    "period_from": clean_date(config.get('period_from')),
+                    "period_to": clean_date(config.get('period_to')),
+                    "version_tag": config['version_tag'],
+                })
+
+            # Bước 2: Một lần INSERT ... ON DUPLICATE KEY UPDATE cho cả sheet, chạy lại trong ngày không lỗi
+            snapshot_map, created = create_snapshot_map(conn, specs, snapshot_date, created_by="Group_Member")
+            for spec in specs:
+                new_id = snapshot_map[(spec['source_name'], spec['fiscal_year'], spec['version_tag'])]
+                created_ids.append(new_id)
+                print(f"Dòng {spec['row']}: Snapshot ID {new_id} ({spec['source_name']} - {spec['fiscal_year']})")
+
+            st.rows_written = created
+            st.rows_skipped = len(df_ver) - created
+
+        with run.stage("commit"):
+            conn.commit()
+        print(f"--- HOÀN THÀNH: {created} snapshot mới, {len(set(created_ids)) - created} đã có sẵn ---")
         return created_ids
 
     except Exception as e:
         print(f"Lỗi khi thực hiện Script B: {e}")
+        run.fail(e)
         if conn:
             conn.rollback()
         return []
     finally:
+        run.finish()
         if conn:
-            try:
-                cursor.close()
-            except:
-                pass
             try:
                 conn.close()
             except:
                 pass
 
 if __name__ == "__main__":
-    excel_file = "data/ttin cty.xlsx"
+    excel_file = sys.argv[1] if len(sys.argv) > 1 else "data/ttin cty.xlsx"  # [workbook] như import_firms.py
     
     snapshot_ids = create_snapshots_from_excel(excel_file)
     
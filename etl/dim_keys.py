@@ -0,0 +1,173 @@
+import json
+import os
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+# Tra khóa DIM dùng chung cho mọi script ETL (ticker -> firm_id, source_name -> source_id,
+# (source_id, fiscal_year, version_tag) -> snapshot_id mới nhất):
+#   firm_ids = KEYS.firm_ids(conn, tickers)          # một câu IN (...) cho mọi khóa chưa có trong cache
+#   source_id = KEYS.source_id(conn, "Vietstock")
+#   snaps = KEYS.snapshot_ids(conn, source_id, years, version_tag)
+# - conn: kết nối pymysql (tuple hoặc DictCursor) hoặc Connection của SQLAlchemy.
+# - Cache trong tiến trình chỉ giữ khóa đã thấy; khóa thiếu luôn được hỏi lại DB (theo lô).
+# - Cache trên đĩa (etl/.cache/dim_keys/<db>.json) được kiểm tra bằng một câu "tem" mỗi lần chạy:
+#   MAX(updated_at)+COUNT(*) của dim_firm, MAX(source_id)+COUNT(*) của dim_data_source,
+#   MAX(snapshot_id)+COUNT(*) của fact_data_snapshot; tem lệch -> bỏ nhóm khóa tương ứng.
+# - Biến môi trường: ETL_KEY_CACHE=0 (tắt cache trên đĩa), ETL_KEY_CACHE_DIR (thư mục cache).
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+CACHE_DIR = os.environ.get("ETL_KEY_CACHE_DIR", os.path.join(BASE_DIR, ".cache", "dim_keys"))
+CACHE_FORMAT = 1  # bump when the on-disk layout changes
+IN_BATCH = 1000  # keys per IN (...) list
+
+STAMP_SQL = """
+    SELECT DATABASE(),
+           (SELECT MAX(updated_at) FROM dim_firm), (SELECT COUNT(*) FROM dim_firm),
+           (SELECT MAX(source_id) FROM dim_data_source), (SELECT COUNT(*) FROM dim_data_source),
+           (SELECT MAX(snapshot_id) FROM fact_data_snapshot), (SELECT COUNT(*) FROM fact_data_snapshot)
+"""
+GROUPS = ("firm", "source", "snapshot")
+
+def disk_cache_enabled() -> bool:
+    return os.environ.get("ETL_KEY_CACHE", "1").strip().lower() not in ("0", "false", "no", "off")
+
+def query(conn, sql: str, params: Sequence[Any] = ()) -> List[Tuple[Any, ...]]:
+    """Rows as tuples from a pymysql connection or a SQLAlchemy Connection (both use %s placeholders)."""
+    if hasattr(conn, "exec_driver_sql"):
+        return [tuple(r) for r in conn.exec_driver_sql(sql, tuple(params)).fetchall()]
+    cur = conn.cursor()
+    try:
+        cur.execute(sql, tuple(params))
+        rows = cur.fetchall()
+    finally:
+        cur.close()
+    return [tuple(r.values()) if isinstance(r, dict) else tuple(r) for r in rows]
+
+def ticker_key(t: Any) -> str:
+    return str(t).strip().upper()
+
+def name_key(s: Any) -> str:
+    # utf8mb4_unicode_ci ignores case and trailing spaces when comparing source_name
+    return str(s).casefold().rstrip(" ")
+
+def snapshot_key(source_id: int, fiscal_year: int, version_tag: str) -> str:
+    return f"{int(source_id)}|{int(fiscal_year)}|{version_tag}"
+
+def chunks(keys: List[Any]) -> Iterable[List[Any]]:
+    for i in range(0, len(keys), IN_BATCH):
+        yield keys[i:i + IN_BATCH]
+
+class KeyResolver:
+    def __init__(self):
+        self.maps: Dict[str, Dict[str, int]] = {g: {} for g in GROUPS}
+        self.db: Optional[str] = None
+        self.stamps: Optional[Dict[str, Any]] = None
+
+    # --- cache lifecycle ---
+    def cache_path(self) -> str:
+        return os.path.join(CACHE_DIR, f"{self.db}.json")
+
+    def validate(self, conn) -> None:
+        """Once per process: read the stamps and keep only the cached groups whose tables did not change."""
+        if self.stamps is not None:
+            return
+        row = query(conn, STAMP_SQL)[0]
+        self.db = row[0] or "default"
+        self.stamps = {"firm": [str(row[1]), int(row[2])], "source": [row[3], int(row[4])],
+                       "snapshot": [row[5], int(row[6])]}
+        if not disk_cache_enabled():
+            return
+        try:
+            with open(self.cache_path(), encoding="utf-8") as f:
+                saved = json.load(f)
+        except (OSError, ValueError):
+            return
+        if saved.get("format") != CACHE_FORMAT:
+            return
+        for g in GROUPS:
+            if saved.get("stamps", {}).get(g) == self.stamps[g]:
+                self.maps[g] = {**saved.get(g, {}), **self.maps[g]}
+
+    def save(self) -> None:
+        if self.stamps is None or not disk_cache_enabled():
+            return
+        try:
+            os.makedirs(CACHE_DIR, exist_ok=True)
+            tmp = f"{self.cache_path()}.{os.getpid()}.tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump({"format": CACHE_FORMAT, "stamps": self.stamps, **self.maps}, f, ensure_ascii=False)
+            os.replace(tmp, self.cache_path())
+        except OSError as e:
+            print(f"!!! dim key cache not saved: {e}")
+
+    def invalidate(self, group: Optional[str] = None) -> None:
+        """Call after writing to a DIM table in this process (None = every group)."""
+        for g in ([group] if group else GROUPS):
+            self.maps[g] = {}
+        self.stamps = None
+
+    # --- batch lookups ---
+    def firm_ids(self, conn, tickers: Iterable[Any]) -> Dict[str, int]:
+        """Upper-cased ticker -> firm_id for the tickers found in dim_firm."""
+        self.validate(conn)
+        cache = self.maps["firm"]
+        wanted = sorted({ticker_key(t) for t in tickers})
+        missing = [t for t in wanted if t not in cache]
+        for part in chunks(missing):
+            ph = ",".join(["%s"] * len(part))
+            for firm_id, ticker in query(conn, f"SELECT firm_id, ticker FROM dim_firm WHERE ticker IN ({ph})", part):
+                cache[ticker_key(ticker)] = int(firm_id)
+        if missing:
+            self.save()
+        return {t: cache[t] for t in wanted if t in cache}
+
+    def source_ids(self, conn, names: Iterable[Any]) -> Dict[Any, int]:
+        """source_name (as given) -> source_id for the names found in dim_data_source."""
+        self.validate(conn)
+        cache = self.maps["source"]
+        names = list(dict.fromkeys(names))
+        missing = sorted({name_key(n) for n in names} - set(cache))
+        if missing:
+            for source_id, name in query(conn, "SELECT source_id, source_name FROM dim_data_source"):
+                cache[name_key(name)] = int(source_id)  # the table is tiny: read it whole
+            self.save()
+        return {n: cache[name_key(n)] for n in names if name_key(n) in cache}
+
+    def snapshot_ids(self, conn, source_id: int, fiscal_years: Iterable[Any], version_tag: str) -> Dict[int, int]:
+        """fiscal_year -> latest snapshot_id (snapshot_date DESC, snapshot_id DESC) for one source and tag."""
+        self.validate(conn)
+        cache = self.maps["snapshot"]
+        years = sorted({int(y) for y in fiscal_years})
+        missing = [y for y in years if snapshot_key(source_id, y, version_tag) not in cache]
+        for part in chunks(missing):
+            ph = ",".join(["%s"] * len(part))
+            rows = query(conn, f"""
+                SELECT fiscal_year, snapshot_id
+                FROM (
+                    SELECT fiscal_year, snapshot_id,
+                           ROW_NUMBER() OVER (PARTITION BY fiscal_year ORDER BY snapshot_date DESC, snapshot_id DESC) AS rn
+                    FROM fact_data_snapshot
+                    WHERE source_id = %s AND version_tag = %s AND fiscal_year IN ({ph})
+                ) x
+                WHERE rn = 1""", [source_id, version_tag] + part)
+            for y, snapshot_id in rows:
+                cache[snapshot_key(source_id, y, version_tag)] = int(snapshot_id)
+        if missing:
+            self.save()
+        return {y: cache[snapshot_key(source_id, y, version_tag)] for y in years
+                if snapshot_key(source_id, y, version_tag) in cache}
+
+    # --- single-key helpers with the scripts' usual error messages ---
+    def firm_id(self, conn, ticker: Any) -> Optional[int]:
+        return self.firm_ids(conn, [ticker]).get(ticker_key(ticker))
+
+    def source_id(self, conn, source_name: str) -> int:
+        found = self.source_ids(conn, [source_name])
+        if source_name not in found:
+            raise SystemExit(
+                f"source_name '{source_name}' not found in dim_data_source. "
+                f"Please choose an existing source_name (e.g., BCTC_Audited)."
+            )
+        return found[source_name]
+
+# One resolver per process, shared by every script that imports this module
+KEYS = KeyResolver()
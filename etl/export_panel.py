@@ -1,23 +1,63 @@
+import argparse
+import re
+from datetime import date
 import pandas as pd
 import os
 from database_setup import engine
+from run_ledger import run_ledger
+import panel_latest
+from panel_as_of import read_panel_as_of
 
-def export_to_csv():
-    query = "SELECT * FROM vw_firm_panel_latest where ticker <> 'TEST'"
-    
-    print("Đang trích xuất dữ liệu từ hệ thống...")
-    df = pd.read_sql(query, engine)
-    df = df.sort_values(by=['ticker', 'fiscal_year'])
-    
-    output_dir = "outputs"
-    os.makedirs(output_dir, exist_ok=True)
-    
-    output_path = os.path.join(output_dir, "panel_latest.csv")
-    
-    df.to_csv(output_path, index=False, encoding='utf-8-sig')
+def export_to_csv(as_of: date = None, version_tag: str = None):
+    # Cùng cột với vw_firm_panel_latest, đọc từ bảng vật chất hóa panel_latest
+    query = panel_latest.EXPORT_SQL
+    point_in_time = as_of is not None or version_tag is not None
+
+    with run_ledger("export_panel", engine.raw_connection,
+                    args={"as_of": as_of and as_of.isoformat(), "version_tag": version_tag}) as run:
+        print("Đang trích xuất dữ liệu từ hệ thống...")
+        if point_in_time:
+            # Panel as it was at the cutoff (newest snapshot on or before it), straight from the fact tables
+            with run.stage("read_panel_as_of") as st:
+                df, (cutoff_date, cutoff_id) = read_panel_as_of(engine, cutoff_date=as_of, version_tag=version_tag)
+                df = df[df['ticker'] != 'TEST']
+                st.rows_read = len(df)
+                st.bytes_read = int(df.memory_usage(deep=True).sum())
+            print(f"Mốc as-of: snapshot_date <= {cutoff_date}" + (f", snapshot_id <= {cutoff_id}" if version_tag else ""))
+        else:
+            panel_latest.refresh_stage(run, engine.raw_connection)  # firm-years loaded/fixed since the last refresh
+            with run.stage("read_panel") as st:
+                df = pd.read_sql(query, engine)
+                st.rows_read = len(df)
+                st.bytes_read = int(df.memory_usage(deep=True).sum())  # in-memory size of the result set
+        df = df.sort_values(by=['ticker', 'fiscal_year'])
+
+        output_dir = "outputs"
+        os.makedirs(output_dir, exist_ok=True)
+
+        if version_tag is not None:
+            file_name = "panel_" + re.sub(r"[^\w.-]", "_", version_tag) + ".csv"
+        elif as_of is not None:
+            file_name = f"panel_as_of_{as_of.isoformat()}.csv"
+        else:
+            file_name = "panel_latest.csv"
+        output_path = os.path.join(output_dir, file_name)
+
+        with run.stage("write_csv") as st:
+            df.to_csv(output_path, index=False, encoding='utf-8-sig')
+            st.rows_written = len(df)
     engine.dispose()
 
     print(f"Xuất dữ liệu thành công! File lưu tại: {output_path}")
 
 if __name__ == "__main__":
-    export_to_csv()
+    ap = argparse.ArgumentParser(description="Export the firm-year panel to outputs/")
+    group = ap.add_mutually_exclusive_group()
+    group.add_argument("--as-of", type=date.fromisoformat, metavar="YYYY-MM-DD",
+                       help="panel as of this date -> outputs/panel_as_of_<date>.csv")
+    group.add_argument("--version-tag", help="panel as of the newest snapshot with this tag -> outputs/panel_<tag>.csv")
+    args = ap.parse_args()
+    try:
+        export_to_csv(as_of=args.as_of, version_tag=args.version_tag)
+    except (ValueError, LookupError) as e:  # mốc as-of không hợp lệ (panel_as_of.resolve_cutoff)
+        raise SystemExit(f"❌ {e}")
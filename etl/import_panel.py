@@ -1,10 +1,22 @@
 import argparse
+import hashlib
+import json
+import os
 import re
+import tempfile
 from datetime import date
 from typing import Any, Dict, List, Optional, Tuple
+import numpy as np
 import pandas as pd
+from pandas.api.types import is_numeric_dtype
 import pymysql
-import math
+import time
+
+from dim_keys import KEYS
+from panel_latest import DIRTY_TABLE, mark_dirty, refresh_or_warn
+from run_ledger import run_ledger
+from sql_batch import column_values, insert_many, update_clause
+from workbook_cache import file_sha256, read_excel
 
 print(">>> import_panel.py loaded")
 
@@ -99,99 +111,464 @@ def parse_innovation_cell(val: Any) -> Tuple[Optional[int], Optional[str]]:
 
     return None, s
 
+# VECTORIZED PARSING (column-at-a-time, same rules as the per-cell helpers above)
+NUM_STRIP_RE = r"[^\d\-\+\.,]"
+NUM_VALID_RE = r"[+-]?(?:\d+\.?\d*|\.\d+)"
+
+def split_cells(s: pd.Series) -> Tuple[np.ndarray, np.ndarray, np.ndarray, pd.Series]:
+    """
+    Classify a raw Excel column like to_null() + the isinstance() check of the per-cell helpers.
+    Returns (values, numeric mask, text codes, distinct stripped texts). codes[i] points into the
+    distinct texts and is -1 for NaN/None, NULL_LIKE tokens and numeric cells, so text parsing
+    only runs once per distinct value.
+    """
+    obj = s.to_numpy(dtype=object)
+    na = pd.isna(obj)
+    kinds = pd.Series(obj, dtype=object).map(type)
+    num_types = [t for t in kinds[~na].unique() if issubclass(t, (int, float))]
+    is_num = ~na & kinds.isin(num_types).to_numpy()
+
+    is_txt = ~na & ~is_num
+    txt_codes, uniques = pd.factorize(obj[is_txt])
+    texts = pd.Series(uniques, dtype=object).astype(str).str.strip()
+    null_like = texts.str.lower().isin(NULL_LIKE).to_numpy()
+
+    codes = np.full(len(obj), -1, dtype=np.intp)
+    codes[is_txt] = np.where(null_like[txt_codes], -1, txt_codes)
+    return obj, is_num, codes, texts
+
+def parse_number_text(t: pd.Series) -> np.ndarray:
+    """smart_to_number() string branch over a Series of stripped text -> float64 array (NaN = None)."""
+    t = t.str.replace(" ", "", regex=False).str.replace(NUM_STRIP_RE, "", regex=True)
+    n_comma = t.str.count(",").to_numpy()
+    n_dot = t.str.count(r"\.").to_numpy()
+    dot_last = (t.str.rfind(".") > t.str.rfind(",")).to_numpy()
+    both = (n_comma > 0) & (n_dot > 0)
+
+    # Same cases as smart_to_number; a single comma is the "many commas" case with nothing to drop
+    t = np.select(
+        [both & dot_last, both, n_dot > 1, n_comma > 0],
+        [t.str.replace(",", "", regex=False).to_numpy(dtype=object),
+         t.str.replace(".", "", regex=False).str.replace(",", ".", regex=False).to_numpy(dtype=object),
+         t.str.replace(r"\.(?=.*\.)", "", regex=True).to_numpy(dtype=object),
+         t.str.replace(r",(?=.*,)", "", regex=True).str.replace(",", ".", regex=False).to_numpy(dtype=object)],
+        default=t.to_numpy(dtype=object))
+
+    # float() on object arrays keeps Python's exact parsing (pd.to_numeric is not bit-identical)
+    out = np.full(len(t), np.nan)
+    valid = pd.Series(t, dtype=object).str.fullmatch(NUM_VALID_RE).to_numpy(dtype=bool)
+    out[valid] = t[valid].astype("float64")
+    return out
+
+def smart_to_number_series(s: pd.Series) -> pd.Series:
+    """Vectorized smart_to_number(): returns float64 with NaN where the cell is empty/unparseable."""
+    if is_numeric_dtype(s.dtype):
+        return s.astype("float64")
+
+    obj, is_num, codes, texts = split_cells(s)
+    out = np.full(len(obj), np.nan)
+    out[is_num] = obj[is_num].astype("float64")
+    has_txt = codes >= 0
+    if has_txt.any():
+        out[has_txt] = parse_number_text(texts)[codes[has_txt]]
+    return pd.Series(out, index=s.index, name=s.name)
+
+def to_int_series(s: pd.Series) -> pd.Series:
+    """Vectorized to_int(): half-to-even rounding like round(); float64 so NaN can mark missing."""
+    n = np.round(smart_to_number_series(s))
+    return n.where(np.isfinite(n))
+
+def parse_innovation_text(t: pd.Series) -> Tuple[np.ndarray, np.ndarray]:
+    """parse_innovation_cell() string branch over a Series of stripped text -> (dummy, note) arrays."""
+    dummy = np.full(len(t), np.nan)
+    note = np.full(len(t), None, dtype=object)
+
+    parts = t.str.extract(INNOV_RE.pattern, flags=re.DOTALL)
+    matched = parts[0].notna().to_numpy()
+    dummy[matched] = parts[0].to_numpy(dtype=object)[matched].astype("float64")
+    notes = parts[1].str.strip()
+    has_note = matched & notes.notna().to_numpy() & (notes != "").to_numpy()
+    note[has_note] = notes.to_numpy(dtype=object)[has_note]
+
+    low = t.str.lower()
+    yes = ~matched & low.isin({"yes", "true", "có", "co"}).to_numpy()
+    no = ~matched & low.isin({"no", "false", "không", "khong"}).to_numpy()
+    dummy[yes] = 1.0
+    dummy[no] = 0.0
+    other = ~matched & ~yes & ~no
+    note[other] = t.to_numpy(dtype=object)[other]
+    return dummy, note
+
+def parse_innovation_series(s: pd.Series) -> Tuple[pd.Series, pd.Series]:
+    """
+    Vectorized parse_innovation_cell(): returns (dummy, note).
+    dummy is float64 (NaN = missing), note is object with None for missing so `if note:` still works.
+    """
+    obj, is_num, codes, texts = split_cells(s)
+    dummy = np.full(len(obj), np.nan)
+    note = np.full(len(obj), None, dtype=object)
+
+    d = np.trunc(obj[is_num].astype("float64"))
+    ok = (d == 0) | (d == 1)
+    dummy[np.flatnonzero(is_num)[ok]] = d[ok]
+
+    has_txt = codes >= 0
+    if has_txt.any():
+        u_dummy, u_note = parse_innovation_text(texts)
+        dummy[has_txt] = u_dummy[codes[has_txt]]
+        note[has_txt] = u_note[codes[has_txt]]
+    return pd.Series(dummy, index=s.index), pd.Series(note, index=s.index, dtype=object)
+
+def merge_notes_series(prod_note: pd.Series, proc_note: pd.Series) -> pd.Series:
+    """"Product: ... | Process: ..." evidence note, None when both notes are empty."""
+    def labelled(label: str, notes: pd.Series) -> pd.Series:
+        notes = notes[notes.notna() & (notes != "")]
+        return (label + notes.astype(str).str.strip()).reindex(prod_note.index)
+
+    prod = labelled("Product: ", prod_note)
+    proc = labelled("Process: ", proc_note)
+    merged = prod.where(proc.isna(), prod + " | " + proc)
+    merged = merged.where(merged.notna(), proc)
+    return merged.astype(object).where(merged.notna(), None)
+
+# FACT TABLE LAYOUT (schema column names)
+KEY_COLS = ["firm_id", "fiscal_year", "snapshot_id"]
+# snapshot_date: copy of fact_data_snapshot.snapshot_date written with every FACT row (idx_<table>_latest)
+ROW_COLS = KEY_COLS + ["snapshot_date"]
+OWNERSHIP_FIELDS = ["managerial_inside_own", "state_own", "institutional_own", "foreign_own"]
+MARKET_FIELDS = ["shares_outstanding", "share_price", "market_value_equity", "dividend_cash_paid", "eps_basic"]
+CASHFLOW_FIELDS = ["net_cfo", "capex", "net_cfi"]
+FINANCIAL_FIELDS = ["net_sales", "total_assets", "selling_expenses", "general_admin_expenses",
+    "intangible_assets_net", "manufacturing_overhead", "net_operating_income",
+    "raw_material_consumption", "merchandise_purchase_year", "wip_goods_purchase",
+    "outside_manufacturing_expenses", "production_cost", "rnd_expenses", "net_income",
+    "total_equity", "total_liabilities", "cash_and_equivalents", "long_term_debt",
+    "current_assets", "current_liabilities", "growth_ratio", "inventory", "net_ppe"]
+META_FIELDS = ["employees_count", "firm_age"]
+
+FACT_TABLE_COLS = {
+    "fact_ownership_year": ROW_COLS + OWNERSHIP_FIELDS,
+    "fact_market_year": ROW_COLS + ["shares_outstanding", "price_reference", "share_price", "market_value_equity",
+        "dividend_cash_paid", "eps_basic", "currency_code"],
+    "fact_cashflow_year": ROW_COLS + ["unit_scale", "currency_code"] + CASHFLOW_FIELDS,
+    "fact_financial_year": ROW_COLS + ["unit_scale", "currency_code"] + FINANCIAL_FIELDS,
+    "fact_innovation_year": ROW_COLS + ["product_innovation", "process_innovation", "evidence_source_id", "evidence_note"],
+    "fact_firm_year_meta": ROW_COLS + META_FIELDS,
+}
+
+def ensure_cols(df: pd.DataFrame, cols: List[str], default=None) -> None:
+    for c in cols:
+        if c not in df.columns:
+            df[c] = default
+
 # MySQL HELPERS
-def mysql_connect(host: str, port: int, user: str, password: str, db: str):
+def mysql_connect(host: str, port: int, user: str, password: str, db: str, local_infile: bool = False):
     return pymysql.connect(host=host, port=port, user=user, password=password,
-        database=db, charset="utf8mb4", autocommit=False, cursorclass=pymysql.cursors.DictCursor,)
+        database=db, charset="utf8mb4", autocommit=False, cursorclass=pymysql.cursors.DictCursor,
+        local_infile=local_infile,)
 
 def fetch_firm_id_map(conn, tickers: List[str]) -> Dict[str, int]:
-    if not tickers:
-        return {}
-    placeholders = ",".join(["%s"] * len(tickers))
-    sql = f"SELECT firm_id, ticker FROM dim_firm WHERE ticker IN ({placeholders})"
-    with conn.cursor() as cur:
-        cur.execute(sql, tickers)
-        rows = cur.fetchall()
-    return {r["ticker"].upper(): int(r["firm_id"]) for r in rows}
-
-def upsert_many(conn, table: str, cols: List[str], rows: List[Tuple[Any, ...]]) -> int:
-    if not rows:
-        return 0
-
-    col_list = ", ".join(cols)
-    ph = ", ".join(["%s"] * len(cols))
+    return KEYS.firm_ids(conn, tickers)
+
+def frame_rows(df: pd.DataFrame, cols: List[str]) -> List[Tuple[Any, ...]]:
+    """Row tuples built straight from column arrays (no iterrows)."""
+    return list(zip(*[column_values(df, c) for c in cols]))
+
+def upsert_many(conn, table: str, cols: List[str], rows: List[Tuple[Any, ...]], batch_size: int = 1000,
+                on_duplicate: bool = True) -> int:
+    """
+    Multi-row INSERT ... ON DUPLICATE KEY UPDATE, batch_size rows per statement.
+    Rows must already be None-clean (see frame_rows). on_duplicate=False sends a plain INSERT.
+    """
+    update_expr = update_clause(cols, KEY_COLS) if on_duplicate else ""
+    return insert_many(conn, table, cols, rows, batch_size=batch_size, on_duplicate=update_expr)
+
+def upsert_fact(conn, table: str, cols: List[str], rows: List[Tuple[Any, ...]], batch_size: int = 1000) -> int:
+    """upsert_many into a FACT table + its (firm_id, fiscal_year) keys into panel_latest_dirty, once per batch."""
+    n = upsert_many(conn, table, cols, rows, batch_size=batch_size)
+    f, y = cols.index("firm_id"), cols.index("fiscal_year")
+    mark_dirty(conn, table, ((r[f], r[y]) for r in rows), batch_size)
+    return n
 
-    pk = {"firm_id", "fiscal_year", "snapshot_id"}
-    update_cols = [c for c in cols if c not in pk]
-    update_expr = ", ".join([f"{c}=VALUES({c})" for c in update_cols]) if update_cols else ""
-
-    sql = f"INSERT INTO {table} ({col_list}) VALUES ({ph})"
-    if update_expr:
-        sql += f" ON DUPLICATE KEY UPDATE {update_expr}"
-
-    def _fix_nan(v): # pandas/numpy NaN => None
-        if v is None:
-            return None
-        if isinstance(v, float) and math.isnan(v):
-            return None
-        return v
+def get_data_source_id(conn, source_name: str) -> int:
+    return KEYS.source_id(conn, source_name)
 
+def get_snapshot_dates(conn, snapshot_ids: List[int]) -> Dict[int, Any]:
+    """snapshot_id -> snapshot_date, written on the FACT rows (not cached: a snapshot's date can be edited)."""
+    ids = sorted({int(s) for s in snapshot_ids})
+    if not ids:
+        return {}
     with conn.cursor() as cur:
-        safe_rows = [tuple(_fix_nan(x) for x in row) for row in rows]
-        cur.executemany(sql, safe_rows)
-        return cur.rowcount
-    
-def get_data_source_id(conn, source_name: str) -> int:
+        cur.execute(f"SELECT snapshot_id, snapshot_date FROM fact_data_snapshot "
+                    f"WHERE snapshot_id IN ({','.join(['%s'] * len(ids))})", ids)
+        return {int(r["snapshot_id"]): r["snapshot_date"] for r in cur.fetchall()}
+
+def get_snapshot_ids(conn, source_id: int, fiscal_years: List[int], version_tag: str) -> Dict[int, int]:
+    """Latest snapshot per year in one query; every year must have one."""
+    found = KEYS.snapshot_ids(conn, source_id, fiscal_years, version_tag)
+    missing = [int(y) for y in sorted(set(fiscal_years)) if int(y) not in found]
+    if missing:
+        raise SystemExit(
+            f"Missing snapshot for years={missing}, source_id={source_id}, version_tag={version_tag}. "
+            f"Please run Script B first."
+        )
+    return found
+
+# STAGING LOAD (one bulk transfer, server-side distribution into the six FACT tables)
+STAGING_TABLE = "stg_firm_panel"
+LOCAL_INFILE_ERRORS = {1148, 2068, 3948}  # LOCAL INFILE disabled on client or server
+
+# Staging columns mirror the FACT column types so LOAD DATA rounds exactly like a direct insert
+STAGING_COLUMNS = {
+    "ticker": "VARCHAR(20) NOT NULL",
+    "fiscal_year": "SMALLINT NOT NULL",
+    **{c: "DECIMAL(10,6) NULL" for c in OWNERSHIP_FIELDS},
+    "shares_outstanding": "BIGINT NULL",
+    "price_reference": "VARCHAR(32) NULL",
+    "share_price": "DECIMAL(20,4) NULL",
+    "market_value_equity": "DECIMAL(20,2) NULL",
+    "dividend_cash_paid": "DECIMAL(20,2) NULL",
+    "eps_basic": "DECIMAL(20,6) NULL",
+    "currency_code": "CHAR(3) NULL",
+    "unit_scale": "BIGINT NULL",
+    **{c: "DECIMAL(20,2) NULL" for c in CASHFLOW_FIELDS + FINANCIAL_FIELDS},
+    "growth_ratio": "DECIMAL(10,6) NULL",
+    "product_innovation": "TINYINT NULL",
+    "process_innovation": "TINYINT NULL",
+    "evidence_source_id": "SMALLINT NULL",
+    "evidence_note": "VARCHAR(500) NULL",
+    "employees_count": "INT NULL",
+    "firm_age": "SMALLINT NULL",
+}
+STAGING_INT_COLS = [c for c, t in STAGING_COLUMNS.items() if "INT" in t]
+
+def infile_text(df: pd.DataFrame, cols: List[str]) -> str:
+    """Frame -> LOAD DATA default format (tab separated, backslash escaped, \\N = NULL)."""
+    fields = []
+    for c in cols:
+        s = df[c]
+        if c in STAGING_INT_COLS and s.notna().any():
+            txt = s.astype("float64").astype("Int64").astype(str)
+        elif is_numeric_dtype(s.dtype):
+            txt = s.astype(str)
+        else:
+            txt = (s.astype(str).str.replace("\\", "\\\\", regex=False).str.replace("\t", "\\t", regex=False)
+                   .str.replace("\n", "\\n", regex=False).str.replace("\r", "\\r", regex=False))
+        fields.append(txt.where(s.notna(), "\\N"))
+    if not fields:
+        return ""
+    lines = fields[0].str.cat(fields[1:], sep="\t") if len(fields) > 1 else fields[0]
+    return "\n".join(lines.tolist()) + "\n"
+
+def create_staging_table(conn) -> None:
+    cols = ",\n  ".join(f"`{c}` {t}" for c, t in STAGING_COLUMNS.items())
     with conn.cursor() as cur:
-        cur.execute("SELECT source_id FROM dim_data_source WHERE source_name=%s", (source_name,))
-        row = cur.fetchone()
-        if not row:
-            raise SystemExit(
-                f"source_name '{source_name}' not found in dim_data_source. "
-                f"Please choose an existing source_name (e.g., BCTC_Audited)."
+        cur.execute(f"DROP TEMPORARY TABLE IF EXISTS {STAGING_TABLE}")
+        cur.execute(f"CREATE TEMPORARY TABLE {STAGING_TABLE} (\n  {cols},\n  KEY (ticker, fiscal_year)\n)"
+                    f" ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci")
+
+def load_staging_table(conn, df: pd.DataFrame, batch_size: int) -> str:
+    """Bulk-load the cleaned wide frame once. LOAD DATA LOCAL INFILE, batched INSERT as fallback."""
+    cols = list(STAGING_COLUMNS)
+    fd, path = tempfile.mkstemp(prefix="stg_firm_panel_", suffix=".tsv")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8", newline="") as f:
+            f.write(infile_text(df, cols))
+        with conn.cursor() as cur:
+            cur.execute(
+                f"LOAD DATA LOCAL INFILE %s INTO TABLE {STAGING_TABLE} CHARACTER SET utf8mb4 "
+                f"FIELDS TERMINATED BY '\\t' ESCAPED BY '\\\\' LINES TERMINATED BY '\\n' "
+                f"({', '.join(cols)})",
+                (path,),
             )
-        return int(row["source_id"])
+        return "load_data_local_infile"
+    except pymysql.err.MySQLError as e:
+        if not e.args or e.args[0] not in LOCAL_INFILE_ERRORS:
+            raise
+        print(f">>> LOCAL INFILE not available ({e.args[0]}), falling back to batched INSERT")
+        upsert_many(conn, STAGING_TABLE, cols, frame_rows(df, cols), batch_size=batch_size, on_duplicate=False)
+        return "batched_insert"
+    finally:
+        os.remove(path)
 
-def get_snapshot_id(conn, source_id: int, fiscal_year: int, version_tag: str) -> int:
+def pick_staging_snapshots(conn, source_name: str, version_tag: str) -> None:
+    """Latest snapshot per staged fiscal_year for (source, tag), same ordering as get_snapshot_ids."""
     with conn.cursor() as cur:
+        cur.execute("DROP TEMPORARY TABLE IF EXISTS stg_snapshot_pick")
         cur.execute(
             """
-            SELECT snapshot_id, snapshot_date
-            FROM fact_data_snapshot
-            WHERE source_id=%s AND fiscal_year=%s AND version_tag=%s
-            ORDER BY snapshot_date DESC, snapshot_id DESC
-            LIMIT 1
+            CREATE TEMPORARY TABLE stg_snapshot_pick (PRIMARY KEY (fiscal_year)) AS
+            SELECT fiscal_year, snapshot_id, snapshot_date
+            FROM (
+                SELECT s.fiscal_year, s.snapshot_id, s.snapshot_date,
+                       ROW_NUMBER() OVER (PARTITION BY s.fiscal_year ORDER BY s.snapshot_date DESC, s.snapshot_id DESC) AS rn
+                FROM fact_data_snapshot s
+                JOIN dim_data_source d ON d.source_id = s.source_id
+                WHERE d.source_name = %s AND s.version_tag = %s
+            ) x
+            WHERE rn = 1
             """,
-            (source_id, fiscal_year, version_tag),
+            (source_name, version_tag),
         )
-        row = cur.fetchone()
-        if not row:
+
+def check_staging_keys(conn, args) -> None:
+    """Same guarantees as the direct path: every ticker and every fiscal_year must resolve."""
+    with conn.cursor() as cur:
+        cur.execute(f"""
+            SELECT DISTINCT st.ticker FROM {STAGING_TABLE} st
+            LEFT JOIN dim_firm f ON f.ticker = st.ticker
+            WHERE f.firm_id IS NULL ORDER BY st.ticker""")
+        missing = [r["ticker"] for r in cur.fetchall()]
+        if missing:
+            raise SystemExit(f"Tickers not found in dim_firm (run import_firms first): {missing}")
+
+        cur.execute(f"""
+            SELECT DISTINCT st.fiscal_year FROM {STAGING_TABLE} st
+            LEFT JOIN stg_snapshot_pick p ON p.fiscal_year = st.fiscal_year
+            WHERE p.snapshot_id IS NULL ORDER BY st.fiscal_year""")
+        years = [int(r["fiscal_year"]) for r in cur.fetchall()]
+        if years:
             raise SystemExit(
-                f"Missing snapshot for year={fiscal_year}, source_id={source_id}, version_tag={version_tag}. "
+                f"Missing snapshot for years={years}, source_name={args.source_name}, version_tag={args.version_tag}. "
                 f"Please run Script B first."
             )
-        return int(row["snapshot_id"])
 
-# MAIN LOAD
-def main():
-    ap = argparse.ArgumentParser(description="Load FINAL Excel (39 vars) into vn_firm_panel FACT tables.")
-    ap.add_argument("--excel", default="data/Final Gộp 39 trường dữ liệu (FINAL).xlsx")
-    ap.add_argument("--sheet", default="master_39")
-    ap.add_argument("--db-host", default="localhost")
-    ap.add_argument("--db-port", type=int, default=3306)
-    ap.add_argument("--db-user", default="root")
-    ap.add_argument("--db-pass", default="1234")
-    ap.add_argument("--db-name", default="vn_firm_panel_test")
-    ap.add_argument("--source-name", default="Vietstock")
-    ap.add_argument("--version-tag", default="v2.0_initial")
-    ap.add_argument("--created-by", default="Group_Member")
-    ap.add_argument("--currency-code", default="VND")
-    ap.add_argument("--unit-scale", type=int, default=1)
-    ap.add_argument("--price-reference", default="close_year_end")
-    args = ap.parse_args()
-    print(">>> args =", args)
+def distribute_staging(conn, table: str, cols: List[str]) -> int:
+    """INSERT ... SELECT from staging into one FACT table; keys and snapshot_date are resolved by the server."""
+    value_cols = [c for c in cols if c not in ROW_COLS]
+    select_list = ", ".join(["f.firm_id", "st.fiscal_year", "p.snapshot_id", "p.snapshot_date"]
+                            + [f"st.{c}" for c in value_cols])
+    # qualified: st has the same names
+    update_expr = ", ".join([f"{table}.{c}=VALUES({c})" for c in ["snapshot_date"] + value_cols])
+    sql = f"""
+        INSERT INTO {table} ({", ".join(cols)})
+        SELECT {select_list}
+        FROM {STAGING_TABLE} st
+        JOIN dim_firm f ON f.ticker = st.ticker
+        JOIN stg_snapshot_pick p ON p.fiscal_year = st.fiscal_year
+        ON DUPLICATE KEY UPDATE {update_expr}
+    """
+    with conn.cursor() as cur:
+        cur.execute(sql)
+        n = cur.rowcount
+        # Firm-years for the panel_latest refresh: one set-based statement per table instead of a trigger per row
+        cur.execute(f"""
+            INSERT INTO {DIRTY_TABLE} (table_name, firm_id, fiscal_year)
+            SELECT DISTINCT %s, f.firm_id, st.fiscal_year
+            FROM {STAGING_TABLE} st
+            JOIN dim_firm f ON f.ticker = st.ticker
+            ON DUPLICATE KEY UPDATE marked_at = CURRENT_TIMESTAMP(6)""", (table,))
+        return n
+
+# INCREMENTAL LOAD (content fingerprint per fact row; unchanged rows are not re-sent)
+ROW_HASH_TABLE = "etl_row_hash"
+
+def create_row_hash_table(conn) -> None:
+    """Same DDL as schema_and_seed.sql, so --incremental also works on databases created before the table existed."""
+    with conn.cursor() as cur:
+        cur.execute(f"""
+            CREATE TABLE IF NOT EXISTS {ROW_HASH_TABLE} (
+              table_name VARCHAR(64) NOT NULL,
+              firm_id BIGINT NOT NULL,
+              fiscal_year SMALLINT NOT NULL,
+              snapshot_id BIGINT NOT NULL,
+              row_hash CHAR(32) NOT NULL,
+              loaded_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+              PRIMARY KEY (table_name, snapshot_id, fiscal_year, firm_id)
+            ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci""")
+
+def row_hashes(df: pd.DataFrame, cols: List[str]) -> List[str]:
+    """md5 of the value columns of one FACT table (keys and snapshot_date excluded); None and NaN hash the same."""
+    value_cols = [c for c in cols if c not in ROW_COLS]
+    texts = zip(*[["\\N" if v is None else str(v) for v in column_values(df, c)] for c in value_cols])
+    return [hashlib.md5("\x1f".join(t).encode("utf-8")).hexdigest() for t in texts]
+
+def fetch_row_hashes(conn, table: str, fiscal_year: int, snapshot_id: int) -> Dict[int, Optional[str]]:
+    """firm_id -> stored hash for rows that exist in the FACT table (None = row exists, no hash yet)."""
+    with conn.cursor() as cur:
+        cur.execute(
+            f"""
+            SELECT t.firm_id, h.row_hash
+            FROM {table} t
+            LEFT JOIN {ROW_HASH_TABLE} h
+              ON h.table_name=%s AND h.snapshot_id=t.snapshot_id AND h.fiscal_year=t.fiscal_year AND h.firm_id=t.firm_id
+            WHERE t.fiscal_year=%s AND t.snapshot_id=%s
+            """,
+            (table, fiscal_year, snapshot_id),
+        )
+        return {int(r["firm_id"]): r["row_hash"] for r in cur.fetchall()}
+
+def changed_rows(conn, dyy: pd.DataFrame, table: str, cols: List[str], fiscal_year: int,
+                 snapshot_id: int) -> Tuple[List[Tuple[Any, ...]], List[Tuple[Any, ...]], Dict[str, int]]:
+    """
+    Rows of one (table, year) that are new or whose fingerprint changed, plus the matching
+    etl_row_hash rows and inserted/updated/skipped counts.
+    """
+    stored = fetch_row_hashes(conn, table, fiscal_year, snapshot_id)
+    hashes = row_hashes(dyy, cols)
+    rows, hash_rows = [], []
+    counts = {"inserted": 0, "updated": 0, "skipped": 0}
+    for row, firm_id, h in zip(frame_rows(dyy, cols), dyy["firm_id"].tolist(), hashes):
+        firm_id = int(firm_id)
+        if firm_id not in stored:
+            counts["inserted"] += 1
+        elif stored[firm_id] == h:
+            counts["skipped"] += 1
+            continue
+        else:
+            counts["updated"] += 1
+        rows.append(row)
+        hash_rows.append((table, firm_id, fiscal_year, snapshot_id, h))
+    return rows, hash_rows, counts
+
+def save_row_hashes(conn, hash_rows: List[Tuple[Any, ...]], batch_size: int) -> int:
+    cols = ["table_name", "firm_id", "fiscal_year", "snapshot_id", "row_hash"]
+    return upsert_many(conn, ROW_HASH_TABLE, cols, hash_rows, batch_size=batch_size)
+
+# CHECKPOINTED LOAD (--chunked / --resume: commit every (year, table, batch) unit with its checkpoint row)
+CHECKPOINT_TABLE = "etl_import_checkpoint"
+
+def create_checkpoint_table(conn) -> None:
+    with conn.cursor() as cur:
+        cur.execute(f"""
+            CREATE TABLE IF NOT EXISTS {CHECKPOINT_TABLE} (
+              run_key CHAR(40) NOT NULL,
+              fiscal_year SMALLINT NOT NULL,
+              table_name VARCHAR(64) NOT NULL,
+              batch_no INT NOT NULL,
+              rows_loaded INT NOT NULL,
+              done_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+              PRIMARY KEY (run_key, fiscal_year, table_name, batch_no)
+            ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci""")
+
+def checkpoint_key(args) -> str:
+    """Same workbook content + same load settings = same run, so --resume never mixes two different inputs."""
+    parts = {
+        "excel_sha256": file_sha256(args.excel), "sheet": args.sheet,
+        "source_name": args.source_name, "version_tag": args.version_tag, "batch_size": args.batch_size,
+        "currency_code": args.currency_code, "unit_scale": args.unit_scale, "price_reference": args.price_reference,
+    }
+    return hashlib.sha1(json.dumps(parts, sort_keys=True).encode("utf-8")).hexdigest()
+
+def done_units(conn, key: str) -> Dict[Tuple[int, str, int], int]:
+    with conn.cursor() as cur:
+        cur.execute(f"SELECT fiscal_year, table_name, batch_no, rows_loaded FROM {CHECKPOINT_TABLE} WHERE run_key=%s",
+                    (key,))
+        return {(int(r["fiscal_year"]), r["table_name"], int(r["batch_no"])): int(r["rows_loaded"])
+                for r in cur.fetchall()}
 
-    df = pd.read_excel(args.excel, sheet_name=args.sheet)
+def mark_unit_done(conn, key: str, fiscal_year: int, table: str, batch_no: int, rows_loaded: int) -> None:
+    with conn.cursor() as cur:
+        cur.execute(f"INSERT INTO {CHECKPOINT_TABLE} (run_key, fiscal_year, table_name, batch_no, rows_loaded) "
+                    f"VALUES (%s, %s, %s, %s, %s)", (key, fiscal_year, table, batch_no, rows_loaded))
+
+def clear_checkpoint(conn, key: str) -> None:
+    with conn.cursor() as cur:
+        cur.execute(f"DELETE FROM {CHECKPOINT_TABLE} WHERE run_key=%s", (key,))
+
+# MAIN LOAD
+def prepare_panel(df: pd.DataFrame, args) -> pd.DataFrame:
+    """Raw master sheet -> cleaned wide frame with every FACT column (DB ids are resolved by the loaders)."""
     df.columns = [norm_colname(c) for c in df.columns]  # strip weird spaces in headers
     print(">>> df rows =", len(df))
     print(">>> df cols =", list(df.columns))
@@ -200,9 +577,10 @@ def main():
         raise SystemExit("Excel must contain columns: ticker, fiscal_year")
 
     df["ticker"] = df["ticker"].apply(norm_ticker)
-    df["fiscal_year"] = df["fiscal_year"].apply(to_int)
+    df["fiscal_year"] = to_int_series(df["fiscal_year"])
 
     df = df.dropna(subset=["ticker", "fiscal_year"]).copy()
+    df["fiscal_year"] = df["fiscal_year"].astype(int)
     print(">>> df rows after drop blank =", len(df))
     print(">>> years found =", sorted(df["fiscal_year"].dropna().unique().tolist()))
     print(">>> tickers found =", sorted(df["ticker"].dropna().unique().tolist())[:10], "...")
@@ -214,171 +592,290 @@ def main():
     df.rename(columns={k: v for k, v in rename_map.items() if k in df.columns}, inplace=True)
 
     if "product_innovation" in df.columns:
-        parsed = df["product_innovation"].apply(parse_innovation_cell)
-        df["_prod_dummy"] = parsed.apply(lambda x: x[0])
-        df["_prod_note"] = parsed.apply(lambda x: x[1])
+        df["_prod_dummy"], df["_prod_note"] = parse_innovation_series(df["product_innovation"])
     else:
         df["_prod_dummy"], df["_prod_note"] = None, None
 
     if "process_innovation" in df.columns:
-        parsed = df["process_innovation"].apply(parse_innovation_cell)
-        df["_proc_dummy"] = parsed.apply(lambda x: x[0])
-        df["_proc_note"] = parsed.apply(lambda x: x[1])
+        df["_proc_dummy"], df["_proc_note"] = parse_innovation_series(df["process_innovation"])
     else:
         df["_proc_dummy"], df["_proc_note"] = None, None
 
-    # CONNECT DATABASE
-    conn = mysql_connect(args.db_host, args.db_port, args.db_user, args.db_pass, args.db_name)
-    with conn.cursor() as cur:
-        cur.execute("SELECT DATABASE() AS db")
-        print(">>> Connected DB =", cur.fetchone()["db"])
-        cur.execute("SELECT COUNT(*) AS n FROM dim_firm")
-        print(">>> dim_firm rows =", cur.fetchone()["n"])
-        cur.execute("SHOW TABLES LIKE 'fact_financial_year'")
-        print(">>> has fact_financial_year =", cur.fetchone() is not None)
-  
+    ensure_cols(df, OWNERSHIP_FIELDS + MARKET_FIELDS + CASHFLOW_FIELDS + FINANCIAL_FIELDS + META_FIELDS)
 
-    try:
-        # Firm mapping
-        tickers = sorted(df["ticker"].unique().tolist())
-        firm_map = fetch_firm_id_map(conn, tickers)
-        missing = [t for t in tickers if t not in firm_map]
-        if missing:
-            raise SystemExit(f"Tickers not found in dim_firm (run import_firms first): {missing}")
-        df["firm_id"] = df["ticker"].map(firm_map).astype(int)
-
-        # Data source + snapshots per year
-        source_id = get_data_source_id(conn, args.source_name)
-        years = sorted(df["fiscal_year"].dropna().unique().tolist())
-        snapshots: Dict[int, int] = {}
-        for y in years:
-            y = int(y)
-            tag = args.version_tag
-            snap_id = get_snapshot_id(conn, source_id=source_id, fiscal_year=y, version_tag=tag,)
-            snapshots[y] = snap_id
-            print(f">>> picked snapshot: year={y}, source_id={source_id}, version_tag={tag} -> snapshot_id={snap_id}")
-           
-        # Fill common metadata defaults
-        df["_currency_code"] = args.currency_code
-        df["_unit_scale"] = int(args.unit_scale)
-        df["_price_reference"] = args.price_reference
-
-        # Columns per FACT table (schema column names)
-        key_cols = ["firm_id", "fiscal_year", "snapshot_id"]
-        ownership_fields = ["managerial_inside_own", "state_own", "institutional_own", "foreign_own"]
-        market_fields = ["shares_outstanding", "share_price", "market_value_equity", "dividend_cash_paid", "eps_basic"]
-        cashflow_fields = ["net_cfo", "capex", "net_cfi"]
-        financial_fields = ["net_sales", "total_assets", "selling_expenses", "general_admin_expenses",
-            "intangible_assets_net", "manufacturing_overhead", "net_operating_income",
-            "raw_material_consumption", "merchandise_purchase_year", "wip_goods_purchase",
-            "outside_manufacturing_expenses", "production_cost", "rnd_expenses", "net_income",
-            "total_equity", "total_liabilities", "cash_and_equivalents", "long_term_debt",
-            "current_assets", "current_liabilities", "growth_ratio", "inventory", "net_ppe"]
-        meta_fields = ["employees_count", "firm_age"]
-
-        # Convert numeric columns safely (only if exist)
-        def ensure_cols(cols: List[str], default=None):
-            for c in cols:
-                if c not in df.columns:
-                    df[c] = default
-        ensure_cols(ownership_fields)
-        ensure_cols(market_fields)
-        ensure_cols(cashflow_fields)
-        ensure_cols(financial_fields)
-        ensure_cols(meta_fields)
-
-        # Numeric conversions
-        for c in ownership_fields + ["share_price", "market_value_equity", "dividend_cash_paid", "eps_basic"] + cashflow_fields + financial_fields:
-            if c in df.columns:
-                df[c] = df[c].apply(smart_to_number)
-
-        for c in ["shares_outstanding", "employees_count", "firm_age"]:
-            if c in df.columns:
-                df[c] = df[c].apply(to_int)
-
-        # If share_price missing but have market cap + shares, auto compute
-        if "share_price" in df.columns:
-            mask = df["share_price"].isna() & df["market_value_equity"].notna() & df["shares_outstanding"].notna() & (df["shares_outstanding"] != 0)
-            df.loc[mask, "share_price"] = df.loc[mask, "market_value_equity"] / df.loc[mask, "shares_outstanding"]
-
-        # Insert per year so snapshot_id matches year snapshot
-        stats = {t: 0 for t in [
-            "fact_ownership_year", "fact_market_year", "fact_cashflow_year",
-            "fact_financial_year", "fact_innovation_year", "fact_firm_year_meta"
-        ]}
-
-        for y in years:
-            y = int(y)
-            snap_id = snapshots[y]
-            dyy = df[df["fiscal_year"] == y].copy()
-            dyy["snapshot_id"] = snap_id
-
-            # 1) ownership
-            ownership_cols = key_cols + ownership_fields
-            ownership_rows = [tuple(r.get(c) for c in ownership_cols) for _, r in dyy.iterrows()]
-            stats["fact_ownership_year"] += upsert_many(conn, "fact_ownership_year", ownership_cols, ownership_rows)
-
-            # 2) market
-            market_cols = key_cols + [
-                "shares_outstanding", "price_reference", "share_price", "market_value_equity",
-                "dividend_cash_paid", "eps_basic", "currency_code"
-            ]
-            dyy["price_reference"] = dyy["_price_reference"]
-            dyy["currency_code"] = dyy["_currency_code"]
-            market_rows = [tuple(r.get(c) for c in market_cols) for _, r in dyy.iterrows()]
-            stats["fact_market_year"] += upsert_many(conn, "fact_market_year", market_cols, market_rows)
-
-            # 3) cashflow
-            cashflow_cols = key_cols + ["unit_scale", "currency_code"] + cashflow_fields
-            dyy["unit_scale"] = dyy["_unit_scale"]
-            dyy["currency_code"] = dyy["_currency_code"]
-            cashflow_rows = [tuple(r.get(c) for c in cashflow_cols) for _, r in dyy.iterrows()]
-            stats["fact_cashflow_year"] += upsert_many(conn, "fact_cashflow_year", cashflow_cols, cashflow_rows)
-
-            # 4) financial
-            financial_cols = key_cols + ["unit_scale", "currency_code"] + financial_fields
-            dyy["unit_scale"] = dyy["_unit_scale"]
-            dyy["currency_code"] = dyy["_currency_code"]
-            financial_rows = [tuple(r.get(c) for c in financial_cols) for _, r in dyy.iterrows()]
-            stats["fact_financial_year"] += upsert_many(conn, "fact_financial_year", financial_cols, financial_rows)
-
-            # 5) innovation
-            innov_cols = key_cols + ["product_innovation", "process_innovation", "evidence_source_id", "evidence_note"]
-            dyy["product_innovation"] = dyy["_prod_dummy"]
-            dyy["process_innovation"] = dyy["_proc_dummy"]
-            dyy["evidence_source_id"] = 6
-
-            def merge_notes(r):
-                notes = []
-                if r.get("_prod_note"):
-                    notes.append("Product: " + str(r["_prod_note"]).strip())
-                if r.get("_proc_note"):
-                    notes.append("Process: " + str(r["_proc_note"]).strip())
-                return " | ".join(notes) if notes else None
-
-            dyy["evidence_note"] = dyy.apply(merge_notes, axis=1)
-            innov_rows = [tuple(r.get(c) for c in innov_cols) for _, r in dyy.iterrows()]
-            stats["fact_innovation_year"] += upsert_many(conn, "fact_innovation_year", innov_cols, innov_rows)
-
-            # 6) meta
-            meta_cols = key_cols + meta_fields
-            meta_rows = [tuple(r.get(c) for c in meta_cols) for _, r in dyy.iterrows()]
-            stats["fact_firm_year_meta"] += upsert_many(conn, "fact_firm_year_meta", meta_cols, meta_rows)
-
-        print(">>> stats so far =", stats)
+    # Numeric conversions
+    for c in OWNERSHIP_FIELDS + ["share_price", "market_value_equity", "dividend_cash_paid", "eps_basic"] + CASHFLOW_FIELDS + FINANCIAL_FIELDS:
+        df[c] = smart_to_number_series(df[c])
+
+    for c in ["shares_outstanding", "employees_count", "firm_age"]:
+        df[c] = to_int_series(df[c])
+
+    # If share_price missing but have market cap + shares, auto compute
+    mask = df["share_price"].isna() & df["market_value_equity"].notna() & df["shares_outstanding"].notna() & (df["shares_outstanding"] != 0)
+    df.loc[mask, "share_price"] = df.loc[mask, "market_value_equity"] / df.loc[mask, "shares_outstanding"]
+
+    # Common metadata defaults + innovation columns
+    df["price_reference"] = args.price_reference
+    df["currency_code"] = args.currency_code
+    df["unit_scale"] = int(args.unit_scale)
+    df["product_innovation"] = df["_prod_dummy"]
+    df["process_innovation"] = df["_proc_dummy"]
+    df["evidence_source_id"] = 6
+    df["evidence_note"] = merge_notes_series(df["_prod_note"], df["_proc_note"])
+    return df
+
+def new_stats() -> Dict[str, Dict[str, float]]:
+    return {t: {"rows": 0, "rowcount": 0, "seconds": 0.0, "inserted": 0, "updated": 0, "skipped": 0, "resumed": 0}
+            for t in FACT_TABLE_COLS}
+
+def add_counts(stat: Dict[str, float], counts: Dict[str, int]) -> None:
+    for k, v in counts.items():
+        stat[k] += v
+
+def ensure_snapshots(conn, years: List[int], args) -> Optional[Dict[int, int]]:
+    """--create-snapshots: create today's snapshot of every year (idempotent); returns year -> snapshot_id."""
+    if not getattr(args, "create_snapshots", False):
+        return None
+    from create_snapshot import create_snapshot_map
+    specs = [{"source_name": args.source_name, "fiscal_year": y, "version_tag": args.version_tag} for y in years]
+    snapshot_map, created = create_snapshot_map(conn, specs, created_by=args.created_by, batch_size=args.batch_size)
+    if args.workers > 1:
+        conn.commit()  # the worker connections must see the new snapshot rows (FK)
+    print(f">>> --create-snapshots: {created} created, {len(specs) - created} already there")
+    return {y: snapshot_map[(args.source_name, y, args.version_tag)] for y in years}
+
+def resolve_direct_ids(conn, df: pd.DataFrame, args) -> Dict[int, int]:
+    """Map ticker -> firm_id and fiscal_year -> snapshot_id/snapshot_date on the frame; returns the snapshot map."""
+    # Firm mapping
+    tickers = sorted(df["ticker"].unique().tolist())
+    firm_map = fetch_firm_id_map(conn, tickers)
+    missing = [t for t in tickers if t not in firm_map]
+    if missing:
+        raise SystemExit(f"Tickers not found in dim_firm (run import_firms first): {missing}")
+    df["firm_id"] = df["ticker"].map(firm_map).astype(int)
+
+    # Data source + snapshots per year
+    source_id = get_data_source_id(conn, args.source_name)
+    years = [int(y) for y in sorted(df["fiscal_year"].dropna().unique().tolist())]
+    snapshots = ensure_snapshots(conn, years, args)
+    if snapshots is None:
+        snapshots = get_snapshot_ids(conn, source_id, years, args.version_tag)
+    for y, snap_id in snapshots.items():
+        print(f">>> picked snapshot: year={y}, source_id={source_id}, version_tag={args.version_tag} -> snapshot_id={snap_id}")
+    df["snapshot_id"] = df["fiscal_year"].map(snapshots)
+    df["snapshot_date"] = df["snapshot_id"].map(get_snapshot_dates(conn, list(snapshots.values())))
+    return snapshots
+
+def load_direct(conn, df: pd.DataFrame, args) -> Dict[str, Dict[str, float]]:
+    """Client-side path: resolve firm_id/snapshot_id here, then batched upserts per year and table."""
+    snapshots = resolve_direct_ids(conn, df, args)
+
+    chunked = args.chunked or args.resume
+    if chunked:
+        key = checkpoint_key(args)
+        if args.resume:
+            done = done_units(conn, key)
+            print(f">>> resume: run_key={key}, {len(done)} units already committed")
+        else:
+            clear_checkpoint(conn, key)
+            done = {}
         conn.commit()
 
-        print("DONE. Rowcount (includes updates):")
-        for k, v in stats.items():
-            print(f"  - {k}: {v}")
+    # Insert per year so snapshot_id matches year snapshot
+    stats = new_stats()
+    for y in sorted(snapshots):
+        dyy = df[df["fiscal_year"] == y]
+        for table, cols in FACT_TABLE_COLS.items():
+            # Chunked: one transaction per batch_size rows instead of one for the whole run
+            parts = [dyy.iloc[i:i + args.batch_size] for i in range(0, len(dyy), args.batch_size)] if chunked else [dyy]
+            for batch_no, part in enumerate(parts):
+                if chunked and (y, table, batch_no) in done:
+                    stats[table]["resumed"] += len(part)
+                    continue
+                t0 = time.perf_counter()
+                if args.incremental:
+                    rows, hash_rows, counts = changed_rows(conn, part, table, cols, y, snapshots[y])
+                    add_counts(stats[table], counts)
+                else:
+                    rows, hash_rows = frame_rows(part, cols), []
+                stats[table]["rowcount"] += upsert_fact(conn, table, cols, rows, batch_size=args.batch_size)
+                save_row_hashes(conn, hash_rows, args.batch_size)
+                if chunked:
+                    mark_unit_done(conn, key, y, table, batch_no, len(rows))
+                    conn.commit()
+                stats[table]["rows"] += len(part)
+                stats[table]["seconds"] += time.perf_counter() - t0
+
+    if chunked:
+        clear_checkpoint(conn, key)  # run finished: the next run of the same workbook starts from scratch
+    print("Snapshots used:", snapshots)
+    return stats
+
+def load_staging(conn, df: pd.DataFrame, args) -> Dict[str, Dict[str, float]]:
+    """Server-side path: one bulk load into a staging table, then INSERT ... SELECT per FACT table."""
+    get_data_source_id(conn, args.source_name)  # same early error as the direct path
+    ensure_snapshots(conn, [int(y) for y in sorted(df["fiscal_year"].dropna().unique().tolist())], args)
+    create_staging_table(conn)
+
+    t0 = time.perf_counter()
+    how = load_staging_table(conn, df, args.batch_size)
+    print(f">>> staged {len(df)} rows into {STAGING_TABLE} via {how} in {time.perf_counter() - t0:.2f}s")
+
+    pick_staging_snapshots(conn, args.source_name, args.version_tag)
+    check_staging_keys(conn, args)
+
+    stats = new_stats()
+    for table, cols in FACT_TABLE_COLS.items():
+        t0 = time.perf_counter()
+        stats[table]["rowcount"] += distribute_staging(conn, table, cols)
+        stats[table]["rows"] += len(df)
+        stats[table]["seconds"] += time.perf_counter() - t0
 
-        print("Snapshots created:", snapshots)
+    with conn.cursor() as cur:
+        cur.execute("SELECT fiscal_year, snapshot_id FROM stg_snapshot_pick ORDER BY fiscal_year")
+        print("Snapshots used:", {int(r["fiscal_year"]): int(r["snapshot_id"]) for r in cur.fetchall()})
+        cur.execute(f"DROP TEMPORARY TABLE IF EXISTS {STAGING_TABLE}")
+        cur.execute("DROP TEMPORARY TABLE IF EXISTS stg_snapshot_pick")
+    return stats
 
-    except Exception:
-        conn.rollback()
-        raise
-    finally:
-        conn.close()
+def main():
+    ap = argparse.ArgumentParser(description="Load FINAL Excel (39 vars) into vn_firm_panel FACT tables.")
+    ap.add_argument("--excel", default="data/Final Gộp 39 trường dữ liệu (FINAL).xlsx",
+                    help="one workbook, or a directory / glob pattern to load several workbooks in one run")
+    ap.add_argument("--sheet", default="master_39")
+    ap.add_argument("--db-host", default="localhost")
+    ap.add_argument("--db-port", type=int, default=3306)
+    ap.add_argument("--db-user", default="root")
+    ap.add_argument("--db-pass", default="1234")
+    ap.add_argument("--db-name", default="vn_firm_panel_test")
+    ap.add_argument("--source-name", default="Vietstock")
+    ap.add_argument("--version-tag", default="v2.0_initial")
+    ap.add_argument("--created-by", default="Group_Member")
+    ap.add_argument("--currency-code", default="VND")
+    ap.add_argument("--unit-scale", type=int, default=1)
+    ap.add_argument("--price-reference", default="close_year_end")
+    ap.add_argument("--batch-size", type=int, default=1000,
+                    help="rows per multi-row INSERT; keep rows x row size under max_allowed_packet")
+    ap.add_argument("--mode", choices=["direct", "staging"], default="direct",
+                    help="direct: client-side upserts per table; staging: one bulk load + server-side INSERT ... SELECT")
+    ap.add_argument("--workers", type=int, default=1,
+                    help="direct mode: >1 spreads (table, fiscal_year) units over a pool of connections")
+    ap.add_argument("--commit-policy", choices=["atomic", "per-unit"], default="atomic",
+                    help="parallel load: atomic = XA two-phase commit of all units; per-unit = commit each unit "
+                         "and record it in a rollback manifest")
+    ap.add_argument("--manifest", default=None, help="rollback manifest path for --commit-policy per-unit")
+    ap.add_argument("--create-snapshots", action="store_true",
+                    help="create today's fact_data_snapshot row for each year (source, version tag) if missing "
+                         "instead of requiring create_snapshot.py first")
+    ap.add_argument("--incremental", action="store_true",
+                    help="direct mode: fingerprint each fact row (etl_row_hash) and send only new or changed rows")
+    ap.add_argument("--chunked", action="store_true",
+                    help="direct mode: commit every --batch-size rows per (year, table) and checkpoint it in "
+                         "etl_import_checkpoint")
+    ap.add_argument("--resume", action="store_true",
+                    help="continue a failed --chunked run of the same workbook/settings, skipping committed units")
+    ap.add_argument("--source-map", default=None,
+                    help="directory/glob --excel: CSV with columns workbook,source_name,version_tag[,sheet] "
+                         "(workbook = file name or pattern); unmatched files use --source-name/--version-tag/--sheet")
+    ap.add_argument("--parse-workers", type=int, default=None,
+                    help="directory/glob --excel: processes that parse workbooks in parallel (default: CPU count)")
+    ap.add_argument("--no-ledger", action="store_true", help="do not record this run in etl_run / etl_run_stage")
+    ap.add_argument("--rollback-manifest", default=None, help="undo the committed units recorded in this manifest and exit")
+    args = ap.parse_args()
+    print(">>> args =", args)
+
+    if args.rollback_manifest:
+        from panel_parallel import rollback_manifest
+        conn = mysql_connect(args.db_host, args.db_port, args.db_user, args.db_pass, args.db_name)
+        try:
+            rollback_manifest(conn, args.rollback_manifest, batch_size=args.batch_size)
+            refresh_or_warn(conn)
+        finally:
+            conn.close()
+        return
+
+    if args.incremental and args.mode != "direct":
+        raise SystemExit("--incremental needs --mode direct (row fingerprints are compared client-side)")
+    from panel_batch import is_workbook_batch  # imports this module, so loaded lazily
+    batch = is_workbook_batch(args.excel)
+    if (args.chunked or args.resume) and batch:
+        raise SystemExit("--chunked/--resume take a single --excel workbook")
+    if (args.chunked or args.resume) and (args.mode != "direct" or args.workers > 1):
+        raise SystemExit("--chunked/--resume need --mode direct --workers 1 "
+                         "(use --commit-policy per-unit for a restartable parallel load)")
+
+    def ledger_connect():
+        return mysql_connect(args.db_host, args.db_port, args.db_user, args.db_pass, args.db_name)
+
+    with run_ledger("import_panel", None if args.no_ledger else ledger_connect, vars(args)) as run:
+        if batch:
+            from panel_batch import parse_workbooks
+            with run.stage("parse_workbooks") as st:
+                df, st.rows_read, st.bytes_read = parse_workbooks(args)
+                st.rows_written = len(df)
+                st.rows_skipped = st.rows_read - len(df)
+        else:
+            with run.stage("read_workbook") as st:
+                raw = read_excel(args.excel, sheet_name=args.sheet)
+                st.rows_read, st.bytes_read = len(raw), os.path.getsize(args.excel)
+            with run.stage("prepare_panel") as st:
+                df = prepare_panel(raw, args)
+                st.rows_read, st.rows_written, st.rows_skipped = len(raw), len(df), len(raw) - len(df)
+
+        # CONNECT DATABASE
+        conn = mysql_connect(args.db_host, args.db_port, args.db_user, args.db_pass, args.db_name,
+                             local_infile=args.mode == "staging")
+        with conn.cursor() as cur:
+            cur.execute("SELECT DATABASE() AS db")
+            print(">>> Connected DB =", cur.fetchone()["db"])
+            cur.execute("SELECT COUNT(*) AS n FROM dim_firm")
+            print(">>> dim_firm rows =", cur.fetchone()["n"])
+            cur.execute("SHOW TABLES LIKE 'fact_financial_year'")
+            print(">>> has fact_financial_year =", cur.fetchone() is not None)
+
+        try:
+            with run.stage(f"load_{args.mode}" + ("_parallel" if args.workers > 1 else "")) as st:
+                if args.incremental:
+                    create_row_hash_table(conn)
+                if args.chunked or args.resume:
+                    create_checkpoint_table(conn)
+                if args.mode == "staging":
+                    loader = load_staging
+                elif args.workers > 1:
+                    from panel_parallel import load_parallel as loader  # imports this module, so loaded lazily
+                else:
+                    loader = load_direct
+                if batch:
+                    from panel_batch import load_batch
+                    stats = load_batch(conn, df, args, loader)
+                else:
+                    stats = loader(conn, df, args)
+                st.rows_read = len(df)
+                st.rows_skipped = sum(v["skipped"] + v["resumed"] for v in stats.values())
+                st.rows_written = sum(v["rows"] for v in stats.values()) - sum(v["skipped"] for v in stats.values())
+
+            print(">>> stats so far =", stats)
+            with run.stage("commit"):
+                conn.commit()
+            with run.stage("refresh_panel_latest") as st:
+                refresh_or_warn(conn, st)
+
+            print(f"DONE ({args.mode}). Rowcount (includes updates), batch_size={args.batch_size}:")
+            for k, v in stats.items():
+                rate = v["rows"] / v["seconds"] if v["seconds"] else 0.0
+                print(f"  - {k}: rows={v['rows']}, rowcount={v['rowcount']}, {v['seconds']:.2f}s, {rate:,.0f} rows/s")
+                if args.incremental:
+                    print(f"      inserted={v['inserted']}, updated={v['updated']}, skipped={v['skipped']} (unchanged)")
+                if v["resumed"]:
+                    print(f"      resumed: {v['resumed']} rows were already committed by the interrupted run")
+
+        except Exception:
+            conn.rollback()
+            if args.chunked or args.resume:
+                print(">>> committed units are checkpointed: rerun with --resume to continue")
+            raise
+        finally:
+            conn.close()
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,275 @@
+import argparse
+import os
+import re
+from typing import Dict, List, Tuple
+import numpy as np
+import pandas as pd
+
+from bench_qc import make_panel
+from schema_catalog import catalog_from_sql
+
+# Sinh bộ dữ liệu tổng hợp cùng định dạng với data/*.xlsx để thử tải / mở rộng quy mô các script ETL:
+#   python make_synthetic.py                                    # 200 firm x 5 năm x 2 version -> data/synthetic/
+#   python make_synthetic.py --firms 20000 --years 10 --versions 3 --formats xlsx,parquet
+# Kết quả trong --out-dir:
+#   company_info.xlsx        sheet company_info, source_info, version_info (import_firms.py, create_snapshot.py)
+#   panel/master_39_<tag>.xlsx  sheet master_39 mỗi version (version đầu đủ mọi firm-year, các version sau chỉ
+#                            --revision-rate firm-year được sửa lại), cùng panel/source_map.csv cho
+#                            import_panel.py --excel <out>/panel --source-map <out>/panel/source_map.csv
+#   qc_report.csv            file sửa cho quick_fix.py --csv ... --excel ... (ô lỗi cài sẵn -> giá trị đúng, chỉ firm-year không bị
+#                            version sau ghi đè)
+#   expected/panel_<tag>.*   giá trị import_panel phải đọc được từ từng master_39 (sau khi làm sạch, share_price
+#                            thiếu tính lại = market_value_equity / shares_outstanding, bỏ cột không nạp như total_sales_revenue)
+# - Giá trị gốc và lỗi QC cài sẵn (--error-rate) lấy từ bench_qc.make_panel: cùng seed, bản có lỗi và bản sạch
+#   khác nhau đúng ở các ô lỗi.
+# - --sparsity: tỉ lệ ô số để trống; --dirty-rate: tỉ lệ ô số viết "bẩn" nhưng vẫn đọc được (1.234.567,00,
+#   1,234,567.00, 1 234 567, "... VND") hoặc là token rỗng tiếng Việt (thiếu, -, N/A, ...);
+#   --note-rate: tỉ lệ ô đổi mới dạng "1 (https://...)" kèm ghi chú, đôi khi "Có"/"Không".
+# - --formats: xlsx, csv, parquet (mỗi sheet một file <tên>.<sheet>.csv / .parquet cạnh file xlsx).
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+OUT_DIR = os.path.join(BASE_DIR, "data", "synthetic")
+SHEET_NAME = "master_39"
+START_YEAR = 2020  # first year of bench_qc.make_panel
+EXCHANGES = [("HOSE", "Ho Chi Minh City Stock Exchange"), ("HNX", "Hanoi Stock Exchange"),
+             ("UPCOM", "Unlisted Public Company Market")]
+INDUSTRIES = ["Food & Beverage", "Oil & Gas", "Construction & Materials", "Real Estate", "Banks", "Retail",
+              "Industrial Goods & Services", "Chemicals", "Technology", "Utilities"]
+# Column order of the real master_39 sheet
+MASTER_COLUMNS = [
+    "ticker", "fiscal_year", "capex", "cash_and_equivalents", "company_name", "current_assets",
+    "current_liabilities", "dividend_cash_paid", "employees_count", "eps_basic", "firm_age", "foreign_own",
+    "general_admin_expenses", "growth_ratio", "institutional_own", "intangible_assets_net", "inventory",
+    "long_term_debt", "managerial_inside_own", "manufacturing_overhead", "market_value_equity",
+    "merchandise_purchase_year", "net_cfi", "net_cfo", "net_income", "net_operating_income", "net_ppe", "net_sales",
+    "outside_manufacturing_expenses", "process_innovation", "product_innovation", "production_cost",
+    "raw_material_consumption", "rnd_expenses", "selling_expenses", "shares_outstanding", "share_price", "state_own",
+    "total_assets", "total_equity", "total_liabilities", "total_sales_revenue", "wip_goods_purchase",
+]
+INNOVATION_COLUMNS = ["product_innovation", "process_innovation"]
+INT_COLUMNS = ["shares_outstanding", "employees_count", "firm_age"]
+NUMBER_COLUMNS = [c for c in MASTER_COLUMNS
+                  if c not in ("ticker", "fiscal_year", "company_name") and c not in INNOVATION_COLUMNS]
+# Tokens import_panel.NULL_LIKE reads as empty
+NULL_TOKENS = ["thiếu", "Thiếu", "thieu", "-", "N/A", "na", "null", "None", " "]
+NOTE_URL = "https://static.vietstock.vn/bao-cao-thuong-nien/{ticker}_{year}.pdf"
+
+def extra_columns(clean: pd.DataFrame, rng: np.random.Generator) -> pd.DataFrame:
+    """master_39 columns make_panel does not have, derived from the clean values (same on every version)."""
+    n = len(clean)
+    return pd.DataFrame({
+        "ticker": clean["ticker"], "fiscal_year": clean["fiscal_year"],
+        "company_name": "Công ty Cổ phần Tổng hợp " + clean["ticker"],
+        "total_sales_revenue": np.round(clean["net_sales"] * rng.uniform(1.0, 1.05, n), 0),
+        "net_operating_income": np.round(clean["net_sales"] * rng.uniform(-0.1, 0.25, n), 0),
+        "net_cfo": np.round(clean["net_income"] * rng.uniform(0.5, 1.5, n), 0),
+        "net_cfi": np.round(clean["capex"] * rng.uniform(0.8, 1.5, n), 0),
+        "eps_basic": np.round(clean["net_income"] / clean["shares_outstanding"], 0),
+    })
+
+def base_panels(args, rng: np.random.Generator) -> Tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame]:
+    """(clean panel, panel with the injected QC errors, company_info) on the fiscal years of args."""
+    n_rows = args.firms * args.years
+    clean = make_panel(n_rows, seed=args.seed, dirty=0.0, years=args.years)
+    dirty = make_panel(n_rows, seed=args.seed, dirty=args.error_rate, years=args.years)
+    extra = extra_columns(clean, rng)
+    shift = args.start_year - START_YEAR
+    frames = []
+    for df in (clean, dirty):
+        df = df.merge(extra, on=["ticker", "fiscal_year"], how="left")
+        df["fiscal_year"] += shift
+        df["founded_year"] += shift  # firm_age stays fiscal_year - founded_year
+        frames.append(df.sort_values(["ticker", "fiscal_year"]).reset_index(drop=True))
+    clean, dirty = frames
+
+    firms = clean.drop_duplicates("ticker")[["ticker", "company_name", "founded_year"]].reset_index(drop=True)
+    exchange = rng.integers(0, len(EXCHANGES), len(firms))
+    founded = firms["founded_year"].astype(int)
+    company_info = pd.DataFrame({
+        "ticker": firms["ticker"], "company_name": firms["company_name"],
+        "exchange_code": [EXCHANGES[i][0] for i in exchange], "exchange_name": [EXCHANGES[i][1] for i in exchange],
+        "industry_l2_name": rng.choice(INDUSTRIES, len(firms)),
+        "founded_year": founded, "listed_year": np.minimum(founded + rng.integers(5, 30, len(firms)), args.start_year),
+        "status": "active",
+    })
+    return clean, dirty, company_info
+
+def revise(clean: pd.DataFrame, rate: float, rng: np.random.Generator) -> pd.DataFrame:
+    """A restatement: rate of the firm-years with money values moved by ~2%."""
+    rows = clean[rng.random(len(clean)) < rate].copy()
+    money = [c for c in NUMBER_COLUMNS if c not in INT_COLUMNS and c not in ("growth_ratio", "share_price")
+             and not c.endswith("_own")]
+    rows[money] = np.round(rows[money] * rng.normal(1.0, 0.02, (len(rows), len(money))), 0)
+    return rows.reset_index(drop=True)
+
+def messy_number(v: float, style: int) -> str:
+    """v written the way analysts type it; import_panel.smart_to_number reads it back as v (to 2 decimals)."""
+    if abs(v) < 1000:
+        text = f"{v:.4f}".rstrip("0").rstrip(".")
+        return text.replace(".", ",") if style % 2 == 0 else text
+    if style == 0:
+        return f"{v:,.2f}".replace(",", " ").replace(".", ",").replace(" ", ".")  # 1.234.567,00
+    if style == 1:
+        return f"{v:,.2f}"                                                     # 1,234,567.00
+    if style == 2:
+        return f"{v:,.0f}".replace(",", " ")                                   # 1 234 567
+    return f"{v:.0f} VND"
+
+def sheet_cells(panel: pd.DataFrame, args, rng: np.random.Generator) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """(master_39 cells as written to the workbook, values import_panel should read from them)."""
+    cells = panel[MASTER_COLUMNS].copy()
+    expected = panel[["ticker", "fiscal_year"] + NUMBER_COLUMNS].copy()
+    n = len(panel)
+    for c in NUMBER_COLUMNS:
+        values = expected[c].to_numpy(dtype="float64")
+        blank = rng.random(n) < args.sparsity
+        values[blank] = np.nan
+        if c in INT_COLUMNS:
+            values = np.round(values)
+        col = np.where(np.isnan(values), None, values.astype(object))
+        messy = np.flatnonzero(~np.isnan(values) & (rng.random(n) < args.dirty_rate))
+        styles = rng.integers(0, 5, len(messy))  # 4 = null token
+        for i, style in zip(messy, styles):
+            if style == 4:
+                col[i] = NULL_TOKENS[rng.integers(0, len(NULL_TOKENS))]
+                values[i] = np.nan
+            else:
+                col[i] = messy_number(values[i], style)
+                values[i] = round(values[i], 4) if abs(values[i]) < 1000 else round(values[i], 2 if style < 2 else 0)
+        cells[c] = col
+        expected[c] = values
+    # import_panel.prepare_panel: share_price missing but market cap and shares read -> market cap / shares
+    derive = (expected["share_price"].isna() & expected["market_value_equity"].notna()
+              & expected["shares_outstanding"].notna() & (expected["shares_outstanding"] != 0))
+    expected.loc[derive, "share_price"] = (expected.loc[derive, "market_value_equity"]
+                                           / expected.loc[derive, "shares_outstanding"])
+    catalog = catalog_from_sql()
+    expected = expected.drop(columns=[c for c in NUMBER_COLUMNS if catalog.table_for(c) is None])  # not loaded
+
+    notes = {}
+    tickers, years = panel["ticker"].str.lower().to_numpy(), panel["fiscal_year"].to_numpy()
+    for c in INNOVATION_COLUMNS:
+        d = panel[c].to_numpy(dtype="float64")
+        cell = np.where(np.isnan(d), None, d.astype(object))
+        dummy = np.where(np.isin(d, [0, 1]), d, np.nan)
+        note = np.full(n, None, dtype=object)
+        pick = rng.random(n)
+        noted = np.flatnonzero(~np.isnan(dummy) & (pick < args.note_rate))
+        note[noted] = [NOTE_URL.format(ticker=tickers[i], year=years[i]) for i in noted]
+        cell[noted] = [f"{int(dummy[i])} ({note[i]})" for i in noted]
+        worded = ~np.isnan(dummy) & (pick >= args.note_rate) & (pick < args.note_rate + args.dirty_rate)
+        cell[worded] = np.where(dummy[worded] == 1, "Có", "Không")
+        cells[c], expected[c], notes[c] = cell, dummy, note
+    prod = pd.Series(notes["product_innovation"]).map(lambda u: f"Product: {u}" if u else None)
+    proc = pd.Series(notes["process_innovation"]).map(lambda u: f"Process: {u}" if u else None)
+    expected["evidence_note"] = [" | ".join(p for p in pair if p) or None for pair in zip(prod, proc)]
+    return cells, expected
+
+def fix_rows(clean: pd.DataFrame, dirty: pd.DataFrame, final_keys: set, tag: str) -> pd.DataFrame:
+    """qc_report.csv rows putting back the clean value of every injected error still in the latest version."""
+    catalog = catalog_from_sql()
+    both = dirty.merge(clean, on=["ticker", "fiscal_year"], suffixes=("", "_clean"))
+    rows = []
+    for c in NUMBER_COLUMNS + INNOVATION_COLUMNS:
+        table = catalog.table_for(c)
+        if table is None:  # total_sales_revenue: not loaded
+            continue
+        old, new = both[c], both[c + "_clean"]
+        wrong = ~((old == new) | (old.isna() & new.isna())) & new.notna()
+        for i in np.flatnonzero(wrong.to_numpy()):
+            key = (both["ticker"].iat[i], int(both["fiscal_year"].iat[i]))
+            if key not in final_keys:
+                continue
+            value = new.iat[i]
+            rows.append({"ticker": key[0], "fiscal_year": key[1], "table_name": table, "column_name": c,
+                         "error_type": "SYNTHETIC_ERROR", "message": f"Lỗi cài sẵn (make_synthetic, {tag})",
+                         "old_value": old.iat[i],
+                         "new_value": int(value) if c in INT_COLUMNS + INNOVATION_COLUMNS else value})
+    return pd.DataFrame(rows, columns=["ticker", "fiscal_year", "table_name", "column_name", "error_type", "message",
+                                       "old_value", "new_value"])
+
+def flat(df: pd.DataFrame) -> pd.DataFrame:
+    """Object columns mixing numbers and text -> text (Parquet needs one type per column)."""
+    out = df.copy()
+    for c in out.columns:
+        if out[c].dtype == object:
+            if pd.api.types.infer_dtype(out[c], skipna=True) not in ("mixed", "mixed-integer", "mixed-integer-float"):
+                continue
+            out[c] = [v if v is None or v != v or isinstance(v, str) else str(v) for v in out[c].tolist()]  # v != v: NaN
+    return out
+
+def write_book(path: str, sheets: Dict[str, pd.DataFrame], formats: List[str]) -> None:
+    stem = os.path.splitext(path)[0]
+    if "xlsx" in formats:
+        with pd.ExcelWriter(path, engine="openpyxl") as xw:
+            for name, df in sheets.items():
+                df.to_excel(xw, sheet_name=name, index=False)
+    for name, df in sheets.items():
+        if "csv" in formats:
+            df.to_csv(f"{stem}.{name}.csv", index=False, encoding="utf-8-sig")
+        if "parquet" in formats:
+            flat(df).to_parquet(f"{stem}.{name}.parquet", index=False)
+
+def main():
+    ap = argparse.ArgumentParser(description="Generate synthetic company/version/master_39 workbooks and QC fix files")
+    ap.add_argument("--out-dir", default=OUT_DIR)
+    ap.add_argument("--firms", type=int, default=200)
+    ap.add_argument("--years", type=int, default=5)
+    ap.add_argument("--start-year", type=int, default=START_YEAR)
+    ap.add_argument("--versions", type=int, default=2, help="master_39 workbooks (snapshot versions) per fiscal year")
+    ap.add_argument("--revision-rate", type=float, default=0.2, help="share of firm-years restated in each later version")
+    ap.add_argument("--sparsity", type=float, default=0.05, help="share of numeric cells left empty")
+    ap.add_argument("--dirty-rate", type=float, default=0.05,
+                    help="share of numeric cells written as text (separators, units, null tokens)")
+    ap.add_argument("--error-rate", type=float, default=0.01, help="rate of each injected QC error (bench_qc.make_panel)")
+    ap.add_argument("--note-rate", type=float, default=0.3, help="share of innovation cells with an evidence note")
+    ap.add_argument("--source-name", default="Synthetic")
+    ap.add_argument("--formats", default="xlsx,csv", help="comma-separated: xlsx, csv, parquet")
+    ap.add_argument("--seed", type=int, default=0)
+    args = ap.parse_args()
+    formats = [f.strip().lower() for f in args.formats.split(",") if f.strip()]
+    unknown = set(formats) - {"xlsx", "csv", "parquet"}
+    if unknown or not formats:
+        raise SystemExit(f"--formats: xlsx, csv, parquet (got {args.formats})")
+
+    rng = np.random.default_rng(args.seed)
+    clean, dirty, company_info = base_panels(args, rng)
+    years = list(range(args.start_year, args.start_year + args.years))
+    tags = [f"v{k + 1}.0_synthetic" for k in range(args.versions)]
+    panel_dir, expected_dir = os.path.join(args.out_dir, "panel"), os.path.join(args.out_dir, "expected")
+    for d in (panel_dir, expected_dir):
+        os.makedirs(d, exist_ok=True)
+
+    source_info = pd.DataFrame([{"source_name": args.source_name, "source_type": "financial_statement",
+                                 "provider": "make_synthetic.py", "note": f"seed {args.seed}"}])
+    version_info = pd.DataFrame([{"source_name": args.source_name, "fiscal_year": y,
+                                  "period_from": pd.Timestamp(y, 1, 1), "period_to": pd.Timestamp(y, 12, 31),
+                                  "version_tag": tag} for tag in tags for y in years])
+    write_book(os.path.join(args.out_dir, "company_info.xlsx"),
+               {"company_info": company_info, "source_info": source_info, "version_info": version_info}, formats)
+    print(f"✅ company_info.xlsx: {len(company_info)} firm, {len(version_info)} dòng version_info")
+
+    final_keys = set(zip(dirty["ticker"], dirty["fiscal_year"].astype(int)))
+    source_map = []
+    for k, tag in enumerate(tags):
+        panel = dirty if k == 0 else revise(clean, args.revision_rate, rng)
+        if k > 0:
+            final_keys -= set(zip(panel["ticker"], panel["fiscal_year"].astype(int)))
+        cells, expected = sheet_cells(panel, args, rng)
+        name = "master_39_" + re.sub(r"[^\w.-]", "_", tag)
+        write_book(os.path.join(panel_dir, name + ".xlsx"), {SHEET_NAME: cells}, formats)
+        if "parquet" in formats:
+            expected.to_parquet(os.path.join(expected_dir, f"panel_{tag}.parquet"), index=False)
+        if "csv" in formats or "parquet" not in formats:
+            expected.to_csv(os.path.join(expected_dir, f"panel_{tag}.csv"), index=False, encoding="utf-8-sig")
+        source_map.append({"workbook": name + ".xlsx", "source_name": args.source_name, "version_tag": tag,
+                           "sheet": SHEET_NAME})
+        print(f"✅ panel/{name}: {len(cells)} firm-year")
+    pd.DataFrame(source_map).to_csv(os.path.join(panel_dir, "source_map.csv"), index=False, encoding="utf-8-sig")
+
+    fixes = fix_rows(clean, dirty, final_keys, tags[0])
+    fixes.to_csv(os.path.join(args.out_dir, "qc_report.csv"), index=False, encoding="utf-8-sig")
+    print(f"✅ qc_report.csv: {len(fixes)} ô cần sửa (quick_fix.py --csv <file> --excel panel/master_39_{tags[0]}.xlsx)")
+
+if __name__ == "__main__":
+    main()
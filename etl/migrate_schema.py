@@ -0,0 +1,124 @@
+import argparse
+import re
+from typing import Dict, List, Tuple
+from sql_script import object_name, read_schema, run_statements, split_statements, statement_kind
+
+# Nâng một database đã có dữ liệu lên schema_and_seed.sql hiện tại (không DROP bảng nào):
+#   python etl/migrate_schema.py            # in các thay đổi rồi áp dụng
+#   python etl/migrate_schema.py --dry-run  # chỉ in
+# - Bảng chưa có: CREATE TABLE IF NOT EXISTS như trong schema.
+# - Bảng đã có: thêm các cột và KEY có trong schema mà DB chưa có (một ALTER TABLE mỗi bảng); cột mới có
+#   trong BACKFILL được điền từ dữ liệu hiện có (vd. snapshot_date của các bảng FACT từ fact_data_snapshot).
+# - View, procedure, trigger: xóa rồi tạo lại đúng như schema; trigger được gỡ trước khi ALTER/backfill.
+# - Cuối cùng dựng lại panel_latest từ view (CALL sp_refresh_panel_latest(1)).
+# - Không xóa cột/index thừa và không đổi kiểu cột đã có.
+
+COLUMN_RE = re.compile(r"^\s*`(\w+)`\s+(.+?),?\s*$")
+KEY_RE = re.compile(r"^\s*((?:UNIQUE\s+)?KEY\s+`(\w+)`\s+\(.+\)),?\s*$")
+# New column -> statement that fills it on existing rows ({table} = the table it was added to)
+BACKFILL = {
+    "snapshot_date": "UPDATE `{table}` t JOIN `fact_data_snapshot` s ON s.snapshot_id = t.snapshot_id "
+                     "SET t.snapshot_date = s.snapshot_date",
+}
+
+def table_parts(statement: str) -> Tuple[List[Tuple[str, str]], List[Tuple[str, str]]]:
+    """(columns, keys) of a CREATE TABLE statement as (name, definition) in declaration order."""
+    columns, keys = [], []
+    for line in statement.splitlines()[1:]:
+        m = KEY_RE.match(line)
+        if m:
+            keys.append((m.group(2), m.group(1)))
+            continue
+        m = COLUMN_RE.match(line)
+        if m:
+            columns.append((m.group(1), m.group(2)))
+    return columns, keys
+
+def existing_schema(conn) -> Tuple[Dict[str, List[str]], Dict[str, set]]:
+    """table -> columns and table -> index names of the current database."""
+    cur = conn.cursor()
+    try:
+        cur.execute("SELECT TABLE_NAME, COLUMN_NAME FROM INFORMATION_SCHEMA.COLUMNS "
+                    "WHERE TABLE_SCHEMA = DATABASE() ORDER BY TABLE_NAME, ORDINAL_POSITION")
+        columns: Dict[str, List[str]] = {}
+        for table, col in cur.fetchall():
+            columns.setdefault(table, []).append(col)
+        cur.execute("SELECT DISTINCT TABLE_NAME, INDEX_NAME FROM INFORMATION_SCHEMA.STATISTICS "
+                    "WHERE TABLE_SCHEMA = DATABASE()")
+        indexes: Dict[str, set] = {}
+        for table, index in cur.fetchall():
+            indexes.setdefault(table, set()).add(index)
+    finally:
+        cur.close()
+    return columns, indexes
+
+def plan_tables(conn, statements: List[str]) -> Tuple[List[str], List[str]]:
+    """(DDL for the tables, backfill statements) that bring the database up to the schema."""
+    columns, indexes = existing_schema(conn)
+    ddl, backfill = [], []
+    for statement in statements:
+        if statement_kind(statement) != "CREATE TABLE":
+            continue
+        table = object_name(statement)
+        if table not in columns:
+            ddl.append(statement)
+            continue
+        want_cols, want_keys = table_parts(statement)
+        changes, prev = [], None
+        for name, definition in want_cols:
+            if name not in columns[table]:
+                changes.append(f"ADD COLUMN `{name}` {definition}" + (f" AFTER `{prev}`" if prev else " FIRST"))
+                if name in BACKFILL:
+                    backfill.append(BACKFILL[name].format(table=table))
+            prev = name
+        changes += [f"ADD {definition}" for name, definition in want_keys if name not in indexes.get(table, set())]
+        if changes:
+            ddl.append(f"ALTER TABLE `{table}`\n  " + ",\n  ".join(changes))
+    return ddl, backfill
+
+def plan_routines(statements: List[str]) -> Tuple[List[str], List[str]]:
+    """(DROP TRIGGER statements, CREATE VIEW/PROCEDURE/TRIGGER statements with their DROP first)."""
+    drops, creates = [], []
+    for statement in statements:
+        kind = statement_kind(statement)
+        if kind == "CREATE TRIGGER":
+            drops.append(f"DROP TRIGGER IF EXISTS `{object_name(statement)}`")
+            creates.append(statement)
+        elif kind == "CREATE PROCEDURE":
+            creates += [f"DROP PROCEDURE IF EXISTS `{object_name(statement)}`", statement]
+        elif kind == "CREATE VIEW":
+            creates.append(statement)
+    return drops, creates
+
+def migrate(conn, dry_run: bool = False) -> int:
+    statements = split_statements(read_schema())
+    ddl, backfill = plan_tables(conn, statements)
+    drops, creates = plan_routines(statements)
+    for statement in ddl + backfill:
+        print(statement.splitlines()[0] + " ..." if statement.startswith("CREATE TABLE") else statement, end=";\n")
+    print(f">>> {len(ddl)} table changes, {len(backfill)} backfills, {len(creates)} view/procedure/trigger statements")
+    if dry_run:
+        return 0
+    run_statements(conn, drops)
+    run_statements(conn, ddl)
+    run_statements(conn, backfill)
+    conn.commit()
+    run_statements(conn, creates)
+    from panel_latest import refresh_panel_latest
+    _, rows = refresh_panel_latest(conn, full=True)
+    print(f"✅ panel_latest dựng lại: {rows} dòng")
+    return len(ddl) + len(backfill)
+
+def main():
+    ap = argparse.ArgumentParser(description="Upgrade an existing database to schema_and_seed.sql without dropping data")
+    ap.add_argument("--dry-run", action="store_true", help="print the table changes only")
+    args = ap.parse_args()
+    from database_setup import engine
+    conn = engine.raw_connection()
+    try:
+        migrate(conn, dry_run=args.dry_run)
+    finally:
+        conn.close()
+
+if __name__ == "__main__":
+    main()
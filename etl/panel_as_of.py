@@ -0,0 +1,91 @@
+from datetime import date
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+import pandas as pd
+from sqlalchemy import text
+
+from panel_latest import VIEW_COLUMNS
+
+# Panel tại một thời điểm (as-of): các cột của vw_firm_panel_latest như chúng đã là ở một mốc trong quá khứ.
+#   df, cutoff = read_panel_as_of(engine, cutoff_date=date(2024, 6, 30))
+#   df, cutoff = read_panel_as_of(engine, version_tag="v2024", tickers=["VNM"], fiscal_years=[2022, 2023])
+#   python etl/export_panel.py --as-of 2024-06-30 | --version-tag v2024
+# - Mỗi (firm, năm, bảng FACT): dòng có snapshot mới nhất không sau mốc; mốc = (snapshot_date, snapshot_id),
+#   với version_tag là snapshot mới nhất mang tag đó (snapshot cùng ngày nhưng tạo sau không được tính).
+# - Mỗi tra cứu là một range read trên idx_<bảng>_latest (firm_id, fiscal_year, snapshot_date DESC, snapshot_id DESC),
+#   tag được tra qua idx_fact_data_snapshot_version_tag.
+# - Cùng truy vấn với CALL sp_panel_as_of(cutoff, version_tag) trong schema_and_seed.sql, thêm lọc ticker / năm.
+
+MAX_SNAPSHOT_ID = 2 ** 63 - 1
+# (alias, fact table, view columns it provides), in the order of vw_firm_panel_latest's CTEs
+BLOCKS = [
+    ("oy", "fact_ownership_year", ["managerial_inside_own", "state_own", "institutional_own", "foreign_own"]),
+    ("fy", "fact_financial_year", [
+        "net_sales", "total_assets", "selling_expenses", "general_admin_expenses", "intangible_assets_net",
+        "manufacturing_overhead", "net_operating_income", "raw_material_consumption", "merchandise_purchase_year",
+        "wip_goods_purchase", "outside_manufacturing_expenses", "production_cost", "rnd_expenses", "net_income",
+        "total_equity", "total_liabilities", "cash_and_equivalents", "long_term_debt", "current_assets",
+        "current_liabilities", "growth_ratio", "inventory", "net_ppe"]),
+    ("cf", "fact_cashflow_year", ["net_cfo", "capex", "net_cfi"]),
+    ("my", "fact_market_year", ["shares_outstanding", "market_value_equity", "dividend_cash_paid", "eps_basic"]),
+    ("iv", "fact_innovation_year", ["product_innovation", "process_innovation"]),
+    ("meta", "fact_firm_year_meta", ["employees_count", "firm_age"]),
+]
+KEY_SOURCES = {"firm_id": "f", "ticker": "f", "fiscal_year": "k"}
+
+def resolve_cutoff(conn, cutoff_date: Optional[date] = None, version_tag: Optional[str] = None) -> Tuple[date, int]:
+    """
+    (snapshot_date, snapshot_id) bound of an as-of read; conn is a SQLAlchemy connection.
+    ValueError unless exactly one of cutoff_date / version_tag is given, LookupError for an unknown tag.
+    """
+    if (cutoff_date is None) == (version_tag is None):
+        raise ValueError("Cần đúng một trong cutoff_date / version_tag")
+    if version_tag is None:
+        return cutoff_date, MAX_SNAPSHOT_ID
+    row = conn.execute(text(
+        "SELECT snapshot_date, snapshot_id FROM fact_data_snapshot WHERE version_tag = :tag "
+        "ORDER BY snapshot_date DESC, snapshot_id DESC LIMIT 1"), {"tag": version_tag}).fetchone()
+    if row is None:
+        raise LookupError(f"Không có snapshot nào với version_tag '{version_tag}'")
+    return row[0], int(row[1])
+
+def as_of_query(tickers: Optional[Iterable[str]] = None,
+                fiscal_years: Optional[Iterable[int]] = None) -> Tuple[str, Dict[str, Any]]:
+    """SQL (binds :cutoff_date, :cutoff_id) returning the view columns as of the cutoff, and the filter binds."""
+    cutoff = "{t}snapshot_date <= :cutoff_date AND ({t}snapshot_date < :cutoff_date OR {t}snapshot_id <= :cutoff_id)"
+    params: Dict[str, Any] = {}
+    key_filter = ""
+    if fiscal_years is not None:
+        years = sorted({int(y) for y in fiscal_years})
+        params.update({f"y{i}": y for i, y in enumerate(years)})
+        key_filter = f" AND fiscal_year IN ({', '.join(f':y{i}' for i in range(len(years)))})" if years else " AND 1 = 0"
+    keys = "\n    UNION\n".join(
+        f"    SELECT firm_id, fiscal_year FROM `{table}` WHERE {cutoff.format(t='')}{key_filter}"
+        for _, table, _ in BLOCKS)
+    source = dict(KEY_SOURCES, **{c: alias for alias, _, cols in BLOCKS for c in cols})
+    lookups = "\n".join(
+        f"  LEFT JOIN LATERAL (\n"
+        f"    SELECT {', '.join(f't.`{c}`' for c in cols)}\n"
+        f"    FROM `{table}` t\n"
+        f"    WHERE t.firm_id = k.firm_id AND t.fiscal_year = k.fiscal_year AND {cutoff.format(t='t.')}\n"
+        f"    ORDER BY t.snapshot_date DESC, t.snapshot_id DESC\n"
+        f"    LIMIT 1\n"
+        f"  ) {alias} ON TRUE"
+        for alias, table, cols in BLOCKS)
+    sql = (f"SELECT {', '.join(f'{source[c]}.{c}' for c in VIEW_COLUMNS)}\n"
+           f"FROM (\n{keys}\n) k\n"
+           f"  JOIN `dim_firm` f ON f.firm_id = k.firm_id\n{lookups}")
+    if tickers is not None:
+        names = sorted({str(t).strip().upper() for t in tickers})
+        params.update({f"t{i}": t for i, t in enumerate(names)})
+        sql += f"\nWHERE f.ticker IN ({', '.join(f':t{i}' for i in range(len(names)))})" if names else "\nWHERE 1 = 0"
+    return sql + "\nORDER BY f.ticker, k.fiscal_year", params
+
+def read_panel_as_of(engine, cutoff_date: Optional[date] = None, version_tag: Optional[str] = None,
+                     tickers: Optional[List[str]] = None,
+                     fiscal_years: Optional[List[int]] = None) -> Tuple[pd.DataFrame, Tuple[date, int]]:
+    """The panel as of cutoff_date or version_tag; returns (panel, resolved (snapshot_date, snapshot_id) bound)."""
+    sql, params = as_of_query(tickers, fiscal_years)
+    with engine.connect() as conn:
+        cutoff = resolve_cutoff(conn, cutoff_date, version_tag)
+        df = pd.read_sql(text(sql), conn, params=dict(params, cutoff_date=cutoff[0], cutoff_id=cutoff[1]))
+    return df, cutoff
@@ -0,0 +1,117 @@
+import argparse
+import csv
+import fnmatch
+import glob
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple
+import pandas as pd
+
+from import_panel import new_stats, prepare_panel
+from workbook_cache import read_excel
+
+# Nạp nhiều workbook một lần cho import_panel (--excel là thư mục hoặc glob):
+# - Mỗi workbook được đọc + làm sạch trong một tiến trình riêng (ProcessPoolExecutor, --parse-workers),
+#   vì openpyxl tốn CPU và bị GIL giới hạn nếu dùng thread.
+# - --source-map CSV (workbook,source_name,version_tag[,sheet]) gán nguồn/phiên bản cho từng file
+#   (workbook so khớp tên file theo kiểu glob); file không khớp dùng --source-name/--version-tag/--sheet.
+# - Gộp kết quả, khử trùng lặp theo (ticker, fiscal_year, source_name): workbook mới hơn (mtime) được giữ.
+# - Mỗi nhóm (source_name, version_tag) được nạp bằng loader thường với snapshot của riêng nhóm đó.
+
+WORKBOOK_EXTS = (".xlsx", ".xlsm", ".xls")
+
+def is_workbook_batch(excel: str) -> bool:
+    return os.path.isdir(excel) or glob.has_magic(excel)
+
+def find_workbooks(excel: str) -> List[str]:
+    if os.path.isdir(excel):
+        paths = [os.path.join(excel, f) for f in os.listdir(excel)]
+    else:
+        paths = glob.glob(excel)
+    # "~$x.xlsx" are Excel lock files of open workbooks
+    paths = [p for p in paths if p.lower().endswith(WORKBOOK_EXTS) and not os.path.basename(p).startswith("~$")]
+    return sorted(os.path.abspath(p) for p in paths)
+
+def load_source_map(path: Optional[str]) -> List[Dict[str, str]]:
+    if not path:
+        return []
+    with open(path, encoding="utf-8-sig", newline="") as f:
+        rules = [{k.strip(): (v or "").strip() for k, v in r.items() if k} for r in csv.DictReader(f)]
+    for r in rules:
+        if not r.get("workbook"):
+            raise SystemExit(f"--source-map {path}: every row needs a 'workbook' file name or pattern")
+    return rules
+
+def workbook_settings(path: str, rules: List[Dict[str, str]], args) -> Dict[str, str]:
+    """First matching --source-map row wins; empty cells fall back to the command-line defaults."""
+    name = os.path.basename(path)
+    rule = next((r for r in rules if fnmatch.fnmatch(name, r["workbook"]) or r["workbook"] == path), {})
+    return {
+        "source_name": rule.get("source_name") or args.source_name,
+        "version_tag": rule.get("version_tag") or args.version_tag,
+        "sheet": rule.get("sheet") or args.sheet,
+    }
+
+def parse_workbook(path: str, settings: Dict[str, Any]) -> Tuple[pd.DataFrame, float]:
+    """Process-pool task: read + clean one workbook (module-level so it pickles)."""
+    t0 = time.perf_counter()
+    clean_args = argparse.Namespace(price_reference=settings["price_reference"],
+        currency_code=settings["currency_code"], unit_scale=settings["unit_scale"])
+    df = prepare_panel(read_excel(path, sheet_name=settings["sheet"]), clean_args)
+    df["_workbook"] = os.path.basename(path)
+    df["_workbook_mtime"] = os.path.getmtime(path)
+    df["_source_name"] = settings["source_name"]
+    df["_version_tag"] = settings["version_tag"]
+    return df, time.perf_counter() - t0
+
+def parse_workbooks(args) -> Tuple[pd.DataFrame, int, int]:
+    """Parse every workbook of the batch in parallel; returns the merged, de-duplicated frame, rows read, bytes read."""
+    paths = find_workbooks(args.excel)
+    if not paths:
+        raise SystemExit(f"No workbooks ({', '.join(WORKBOOK_EXTS)}) found for --excel {args.excel}")
+    rules = load_source_map(args.source_map)
+    common = {"price_reference": args.price_reference, "currency_code": args.currency_code,
+              "unit_scale": args.unit_scale}
+    tasks = {p: {**common, **workbook_settings(p, rules, args)} for p in paths}
+    for p, t in tasks.items():
+        print(f">>> workbook {os.path.basename(p)} [{t['sheet']}] -> source={t['source_name']}, version_tag={t['version_tag']}")
+
+    workers = max(1, min(args.parse_workers or os.cpu_count() or 1, len(paths)))
+    t0 = time.perf_counter()
+    frames = []
+    with ProcessPoolExecutor(max_workers=workers) as ex:
+        futures = {p: ex.submit(parse_workbook, p, t) for p, t in tasks.items()}
+        for p, fut in futures.items():
+            try:
+                df, secs = fut.result()
+            except SystemExit as e:  # prepare_panel reports bad sheets with SystemExit
+                raise SystemExit(f"{os.path.basename(p)}: {e}")
+            print(f">>> parsed {os.path.basename(p)}: {len(df)} rows in {secs:.2f}s")
+            frames.append(df)
+    wall = time.perf_counter() - t0
+    print(f">>> parsed {len(paths)} workbooks with {workers} processes in {wall:.2f}s")
+
+    merged = pd.concat(frames, ignore_index=True, sort=False)
+    rows_read = len(merged)
+    # Newest workbook wins for the same (ticker, fiscal_year, source); ties keep the later file name
+    merged = merged.sort_values(["_workbook_mtime", "_workbook"], kind="stable")
+    dupes = merged.duplicated(["ticker", "fiscal_year", "_source_name"], keep="last")
+    if dupes.any():
+        print(f">>> dropped {int(dupes.sum())} duplicate (ticker, fiscal_year, source) rows from older workbooks")
+    merged = merged[~dupes].sort_index().reset_index(drop=True)
+    return merged, rows_read, sum(os.path.getsize(p) for p in paths)
+
+def load_batch(conn, df: pd.DataFrame, args, loader: Callable) -> Dict[str, Dict[str, float]]:
+    """Run the chosen loader once per (source_name, version_tag) group, in the caller's transaction."""
+    stats = new_stats()
+    for (source_name, version_tag), g in df.groupby(["_source_name", "_version_tag"], sort=True):
+        print(f">>> loading group source={source_name}, version_tag={version_tag}: {len(g)} rows "
+              f"from {sorted(g['_workbook'].unique().tolist())}")
+        gargs = argparse.Namespace(**{**vars(args), "source_name": source_name, "version_tag": version_tag})
+        part = loader(conn, g.drop(columns=["_workbook", "_workbook_mtime", "_source_name", "_version_tag"]).copy(),
+                      gargs)
+        for table, v in part.items():
+            for k, n in v.items():
+                stats[table][k] += n
+    return stats
@@ -0,0 +1,131 @@
+import argparse
+from typing import Iterable, Tuple
+import pandas as pd
+from sql_batch import BATCH_SIZE, insert_many
+
+# Bảng panel_latest: bản vật chất hóa của vw_firm_panel_latest, làm mới theo từng (firm_id, fiscal_year):
+#   refresh_panel_latest(conn)              # chỉ các firm-year trong panel_latest_dirty (sau mỗi lần nạp / quick_fix)
+#   refresh_panel_latest(conn, full=True)   # dựng lại toàn bộ từ view
+#   python etl/panel_latest.py [--full] [--verify]
+# - Loader và quick_fix ghi firm-year của mỗi lô vừa ghi vào panel_latest_dirty (mark_dirty, cùng giao dịch,
+#   một câu INSERT nhiều dòng thay cho trigger trên từng dòng FACT); trigger trên fact_data_snapshot làm việc đó
+#   khi đổi snapshot_date. sp_refresh_panel_latest(0) xóa rồi dựng lại đúng các dòng đó bằng tra cứu theo khóa chính.
+# - Sửa bảng FACT bằng tay (không qua loader / quick_fix): chạy python etl/panel_latest.py --full.
+# - Đọc panel (export_panel, qc_checks.get_data) = quét bảng có index, không tính lại 6 window function.
+# - View vẫn giữ nguyên để đối chiếu: --verify so panel_latest với vw_firm_panel_latest từng ô.
+# - conn: kết nối DB-API (pymysql của import_panel hoặc engine.raw_connection()).
+
+PANEL_TABLE = "panel_latest"
+DIRTY_TABLE = "panel_latest_dirty"
+VIEW_NAME = "vw_firm_panel_latest"
+REFRESH_PROCEDURE = "sp_refresh_panel_latest"
+# Columns of vw_firm_panel_latest, in view order
+VIEW_COLUMNS = [
+    "firm_id", "ticker", "fiscal_year",
+    "managerial_inside_own", "state_own", "institutional_own", "foreign_own", "shares_outstanding",
+    "net_sales", "total_assets", "selling_expenses", "general_admin_expenses", "intangible_assets_net",
+    "manufacturing_overhead", "net_operating_income", "raw_material_consumption", "merchandise_purchase_year",
+    "wip_goods_purchase", "outside_manufacturing_expenses", "production_cost", "rnd_expenses",
+    "product_innovation", "process_innovation", "net_income", "total_equity", "market_value_equity",
+    "total_liabilities", "net_cfo", "capex", "net_cfi", "cash_and_equivalents", "long_term_debt",
+    "current_assets", "current_liabilities", "growth_ratio", "inventory", "dividend_cash_paid", "eps_basic",
+    "employees_count", "net_ppe", "firm_age",
+]
+# panel_latest also keeps share_price and evidence_note (for qc_checks) after these, then refreshed_at (qc_incremental)
+
+def select_columns(alias: str = "") -> str:
+    prefix = f"{alias}." if alias else ""
+    return ", ".join(prefix + c for c in VIEW_COLUMNS)
+
+# Readers of panel_latest, also timed by bench_sql.py: the QC panel (qc_checks.get_data, qc_pushdown.violations_sql,
+# + founded_year/ngành) and the export (export_panel)
+QC_PANEL_SQL = f"""
+            SELECT 
+                {select_columns("v")},
+                f.founded_year,
+                f.industry_l2_id,
+                v.share_price,
+                v.evidence_note
+            FROM {PANEL_TABLE} v
+            -- Lấy năm thành lập từ bảng Dim
+            LEFT JOIN dim_firm f ON v.firm_id = f.firm_id
+"""
+EXPORT_SQL = f"SELECT {select_columns()} FROM {PANEL_TABLE} where ticker <> 'TEST'"
+
+def mark_dirty(conn, table_name: str, keys: Iterable[Tuple[int, int]], batch_size: int = BATCH_SIZE) -> int:
+    """Record the (firm_id, fiscal_year) keys just written to a FACT table, each once, in the caller's transaction."""
+    rows = [(table_name, f, y) for f, y in sorted({(int(f), int(y)) for f, y in keys})]
+    insert_many(conn, DIRTY_TABLE, ["table_name", "firm_id", "fiscal_year"], rows, batch_size,
+                on_duplicate="marked_at = CURRENT_TIMESTAMP(6)")
+    return len(rows)
+
+def refresh_panel_latest(conn, full: bool = False) -> Tuple[int, int]:
+    """CALL sp_refresh_panel_latest and commit; returns (firm-years refreshed, rows written)."""
+    cur = conn.cursor()
+    try:
+        cur.execute(f"CALL {REFRESH_PROCEDURE}(%s)", (1 if full else 0,))
+        cur.execute("SELECT @panel_latest_keys AS n_keys, @panel_latest_rows AS n_rows")
+        row = cur.fetchone()
+    finally:
+        cur.close()
+    conn.commit()
+    keys, rows = row.values() if isinstance(row, dict) else row  # DictCursor in import_panel
+    return int(keys or 0), int(rows or 0)
+
+def refresh_or_warn(conn, stage=None) -> None:
+    """Refresh the dirty firm-years (after a load, a fix or before a read); a failure only warns."""
+    try:
+        keys, rows = refresh_panel_latest(conn)
+        if stage is not None:
+            stage.rows_read, stage.rows_written = keys, rows
+        print(f"✅ {PANEL_TABLE}: làm mới {keys} firm-year ({rows} dòng)")
+    except Exception as e:
+        print(f"⚠️ Không làm mới được {PANEL_TABLE} ({e}); chạy lại: python etl/panel_latest.py")
+
+def refresh_stage(run, connect) -> None:
+    """refresh_or_warn as the "refresh_panel_latest" stage of a run, on a connection of its own."""
+    with run.stage("refresh_panel_latest") as st:
+        conn = connect()
+        try:
+            refresh_or_warn(conn, st)
+        finally:
+            conn.close()
+
+def verify(engine) -> Tuple[int, int]:
+    """(rows only in the view, rows only in panel_latest), comparing every view column."""
+    cols = select_columns()
+    view = pd.read_sql(f"SELECT {cols} FROM {VIEW_NAME}", engine)
+    table = pd.read_sql(f"SELECT {cols} FROM {PANEL_TABLE}", engine)
+    both = view.merge(table, on=VIEW_COLUMNS, how="outer", indicator=True)
+    only_view, only_table = both[both["_merge"] == "left_only"], both[both["_merge"] == "right_only"]
+    for label, part in (("chỉ có trong view", only_view), (f"chỉ có trong {PANEL_TABLE}", only_table)):
+        if not part.empty:
+            print(f"⚠️ {len(part)} dòng {label}, ví dụ:")
+            print(part[["ticker", "fiscal_year"]].head(10).to_string(index=False))
+    return len(only_view), len(only_table)
+
+def main():
+    ap = argparse.ArgumentParser(description=f"Refresh {PANEL_TABLE} (materialized {VIEW_NAME})")
+    ap.add_argument("--full", action="store_true", help=f"rebuild every row from {VIEW_NAME} instead of the dirty firm-years")
+    ap.add_argument("--verify", action="store_true", help=f"compare {PANEL_TABLE} with {VIEW_NAME} after the refresh")
+    args = ap.parse_args()
+    from database_setup import engine  # not at import time: import_panel uses its own pymysql connection
+    from run_ledger import run_ledger
+    with run_ledger("panel_latest", engine.raw_connection, args=vars(args)) as run:
+        with run.stage("refresh_full" if args.full else "refresh") as st:
+            conn = engine.raw_connection()
+            try:
+                st.rows_read, st.rows_written = refresh_panel_latest(conn, full=args.full)
+            finally:
+                conn.close()
+            print(f"✅ {PANEL_TABLE}: làm mới {st.rows_read} firm-year ({st.rows_written} dòng)")
+        if args.verify:
+            with run.stage("verify") as st:
+                missing, extra = verify(engine)
+                st.rows_skipped = missing + extra
+            if missing or extra:
+                raise SystemExit(f"{PANEL_TABLE} khác {VIEW_NAME}: chạy lại với --full")
+            print(f"✅ {PANEL_TABLE} khớp {VIEW_NAME}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,293 @@
+import json
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Any, Dict, List, Optional, Tuple
+import pandas as pd
+import pymysql
+
+from import_panel import (FACT_TABLE_COLS, ROW_HASH_TABLE, add_counts, changed_rows, frame_rows, mysql_connect,
+    new_stats, resolve_direct_ids, save_row_hashes, upsert_fact)
+from panel_latest import mark_dirty
+
+# Parallel loader cho import_panel (--workers N):
+# - Mỗi đơn vị công việc là (bảng FACT, fiscal_year); các đơn vị được chia cho N kết nối MySQL.
+# - Luồng chính dựng rows cho đơn vị kế tiếp trong khi các worker đang INSERT (overlap parse/insert).
+# - --commit-policy atomic  : mỗi kết nối là một nhánh XA; coordinator PREPARE tất cả rồi mới COMMIT.
+# - --commit-policy per-unit: commit từng đơn vị và ghi before-image vào rollback manifest (JSON).
+
+DEADLOCK_ERRORS = {1205, 1213}  # lock wait timeout, deadlock
+UNIT_RETRIES = 3
+
+def json_value(v: Any) -> Any:
+    if isinstance(v, Decimal):
+        return str(v)
+    if isinstance(v, (datetime, date)):
+        return v.isoformat(sep=" ") if isinstance(v, datetime) else v.isoformat()
+    return v
+
+class ConnectionPool:
+    """One pymysql connection per worker thread; the coordinator keeps the full list to commit/rollback."""
+
+    def __init__(self, args, xa_prefix: Optional[str] = None):
+        self.args = args
+        self.xa_prefix = xa_prefix
+        self.local = threading.local()
+        self.lock = threading.Lock()
+        self.conns: List[Tuple[Any, Optional[str]]] = []
+
+    def get(self):
+        conn = getattr(self.local, "conn", None)
+        if conn is None:
+            a = self.args
+            conn = mysql_connect(a.db_host, a.db_port, a.db_user, a.db_pass, a.db_name)
+            with self.lock:
+                xid = f"{self.xa_prefix}-{len(self.conns)}" if self.xa_prefix else None
+                self.conns.append((conn, xid))
+            if xid:
+                with conn.cursor() as cur:
+                    cur.execute("XA START %s", (xid,))
+            self.local.conn = conn
+        return conn
+
+    def close_all(self) -> None:
+        for conn, _ in self.conns:
+            try:
+                conn.close()
+            except Exception:
+                pass
+
+def xa_finish(pool: ConnectionPool, ok: bool) -> None:
+    """Two-phase commit: PREPARE every branch, then COMMIT; any failure before COMMIT rolls back every branch."""
+    def each(stmt: str, only=None):
+        for conn, xid in pool.conns:
+            if only is None or xid in only:
+                with conn.cursor() as cur:
+                    cur.execute(stmt, (xid,))
+
+    prepared: List[str] = []
+    try:
+        each("XA END %s")
+        if not ok:
+            raise RuntimeError("a work unit failed")
+        for conn, xid in pool.conns:
+            with conn.cursor() as cur:
+                cur.execute("XA PREPARE %s", (xid,))
+            prepared.append(xid)
+    except Exception:
+        for conn, xid in pool.conns:
+            try:
+                with conn.cursor() as cur:
+                    cur.execute("XA ROLLBACK %s", (xid,))
+            except Exception as e:
+                print(f"!!! XA ROLLBACK {xid} failed: {e}")
+        print(f">>> rolled back {len(pool.conns)} XA branches")
+        if ok:
+            raise
+        return
+
+    committed = []
+    for conn, xid in pool.conns:
+        try:
+            with conn.cursor() as cur:
+                cur.execute("XA COMMIT %s", (xid,))
+            committed.append(xid)
+        except Exception as e:
+            # Branch stays PREPARED on the server: finish it by hand with XA COMMIT (see XA RECOVER)
+            pending = [x for x in prepared if x not in committed]
+            raise SystemExit(f"XA COMMIT failed on {xid}: {e}. Prepared branches still pending: {pending}")
+    print(f">>> committed {len(committed)} XA branches")
+
+class Manifest:
+    """Rollback manifest for per-unit commits: before-image + inserted keys of every committed unit."""
+
+    def __init__(self, path: str, run_id: str, args):
+        self.path = path
+        self.lock = threading.Lock()
+        self.data = {
+            "run_id": run_id,
+            "started_at": datetime.now().isoformat(sep=" "),
+            "excel": args.excel,
+            "sheet": args.sheet,
+            "source_name": args.source_name,
+            "version_tag": args.version_tag,
+            "status": "running",
+            "units": [],
+        }
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.save()
+
+    def save(self) -> None:
+        tmp = self.path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.data, f, ensure_ascii=False, indent=1)
+        os.replace(tmp, self.path)
+
+    def add_unit(self, unit: Dict[str, Any]) -> None:
+        with self.lock:
+            self.data["units"].append(unit)
+            self.save()
+
+    def finish(self, status: str) -> None:
+        with self.lock:
+            self.data["status"] = status
+            self.data["finished_at"] = datetime.now().isoformat(sep=" ")
+            self.save()
+
+def fetch_before_image(conn, table: str, year: int, snapshot_id: int, firm_ids: List[int]) -> List[Dict[str, Any]]:
+    if not firm_ids:
+        return []
+    ph = ",".join(["%s"] * len(firm_ids))
+    with conn.cursor() as cur:
+        cur.execute(
+            f"SELECT * FROM {table} WHERE fiscal_year=%s AND snapshot_id=%s AND firm_id IN ({ph}) FOR UPDATE",
+            [year, snapshot_id] + firm_ids,
+        )
+        return [{k: json_value(v) for k, v in r.items()} for r in cur.fetchall()]
+
+def run_unit(pool: ConnectionPool, manifest: Optional[Manifest], table: str, year: int, snapshot_id: int,
+             rows: List[Tuple[Any, ...]], hash_rows: List[Tuple[Any, ...]], batch_size: int) -> Tuple[str, int, float]:
+    cols = FACT_TABLE_COLS[table]
+    conn = pool.get()
+    for attempt in range(1, UNIT_RETRIES + 1):
+        t0 = time.perf_counter()
+        try:
+            if manifest is None:
+                n = upsert_fact(conn, table, cols, rows, batch_size=batch_size)
+                save_row_hashes(conn, hash_rows, batch_size)
+            else:
+                firm_ids = sorted({int(r[0]) for r in rows})
+                before = fetch_before_image(conn, table, year, snapshot_id, firm_ids)
+                n = upsert_fact(conn, table, cols, rows, batch_size=batch_size)
+                save_row_hashes(conn, hash_rows, batch_size)
+                conn.commit()
+                existing = {int(b["firm_id"]) for b in before}
+                manifest.add_unit({
+                    "table": table, "fiscal_year": year, "snapshot_id": snapshot_id,
+                    "committed_at": datetime.now().isoformat(sep=" "),
+                    "inserted_firm_ids": [f for f in firm_ids if f not in existing],
+                    "hashed_firm_ids": [int(h[1]) for h in hash_rows],
+                    "before": before,
+                })
+            return table, n, time.perf_counter() - t0
+        except pymysql.err.MySQLError as e:
+            # In XA mode a deadlock kills the whole branch, so only per-unit commits can retry
+            if manifest is None or not e.args or e.args[0] not in DEADLOCK_ERRORS or attempt == UNIT_RETRIES:
+                raise
+            conn.rollback()
+            print(f">>> retry {table} {year} after MySQL error {e.args[0]} (attempt {attempt})")
+
+def load_parallel(conn, df: pd.DataFrame, args) -> Dict[str, Dict[str, float]]:
+    """Spread (table, fiscal_year) units over --workers connections with the chosen --commit-policy."""
+    snapshots = resolve_direct_ids(conn, df, args)
+    run_id = datetime.now().strftime("%Y%m%d%H%M%S") + "-" + uuid.uuid4().hex[:6]
+    atomic = args.commit_policy == "atomic"
+
+    manifest = None
+    if not atomic:
+        path = args.manifest or os.path.join("outputs", f"import_panel_manifest_{run_id}.json")
+        manifest = Manifest(path, run_id, args)
+        print(f">>> rollback manifest: {path}")
+
+    pool = ConnectionPool(args, xa_prefix=f"import_panel-{run_id}" if atomic else None)
+    stats = new_stats()
+    stats_lock = threading.Lock()
+    failed = threading.Event()
+    errors: List[BaseException] = []
+    inflight = threading.BoundedSemaphore(args.workers * 2)  # bounded look-ahead of parsed units
+
+    def done(fut):
+        inflight.release()
+        try:
+            table, n, secs = fut.result()
+        except BaseException as e:
+            errors.append(e)
+            failed.set()
+            return
+        with stats_lock:
+            stats[table]["rowcount"] += n
+            stats[table]["seconds"] += secs
+
+    snapshots = {int(y): int(s) for y, s in snapshots.items()}
+    groups = {int(y): g for y, g in df.groupby("fiscal_year")}
+    units = [(table, y) for y in sorted(groups) for table in FACT_TABLE_COLS]
+    print(f">>> parallel load: {len(units)} units, workers={args.workers}, commit_policy={args.commit_policy}")
+
+    t_start = time.perf_counter()
+    try:
+        with ThreadPoolExecutor(max_workers=args.workers, thread_name_prefix="panel") as ex:
+            for table, y in units:
+                inflight.acquire()
+                if failed.is_set():
+                    inflight.release()
+                    break
+                # Build the next unit's rows here while the workers are busy inserting
+                cols = FACT_TABLE_COLS[table]
+                if args.incremental:
+                    rows, hash_rows, counts = changed_rows(conn, groups[y], table, cols, y, snapshots[y])
+                else:
+                    rows, hash_rows, counts = frame_rows(groups[y], cols), [], {}
+                with stats_lock:
+                    stats[table]["rows"] += len(groups[y])
+                    add_counts(stats[table], counts)
+                fut = ex.submit(run_unit, pool, manifest, table, y, snapshots[y], rows, hash_rows, args.batch_size)
+                fut.add_done_callback(done)
+
+        ok = not errors
+        if atomic:
+            xa_finish(pool, ok)
+        elif manifest is not None:
+            manifest.finish("completed" if ok else "failed")
+            if not ok:
+                print(f">>> {len(manifest.data['units'])} units were committed before the failure; "
+                      f"undo with --rollback-manifest {manifest.path}")
+        if errors:
+            raise errors[0]
+    finally:
+        pool.close_all()
+
+    print(f">>> parallel load wall time: {time.perf_counter() - t_start:.2f}s")
+    print("Snapshots used:", snapshots)
+    return stats
+
+def rollback_manifest(conn, path: str, batch_size: int = 1000) -> None:
+    """Undo committed units in reverse order: delete inserted keys, re-upsert the before-image."""
+    with open(path, encoding="utf-8") as f:
+        data = json.load(f)
+    units = data.get("units", [])
+    print(f">>> rolling back {len(units)} units of run {data.get('run_id')} ({path})")
+    try:
+        for u in reversed(units):
+            table, year, snap = u["table"], u["fiscal_year"], u["snapshot_id"]
+            inserted = u.get("inserted_firm_ids") or []
+            hashed = u.get("hashed_firm_ids") or []
+            with conn.cursor() as cur:
+                if inserted:
+                    ph = ",".join(["%s"] * len(inserted))
+                    cur.execute(f"DELETE FROM {table} WHERE fiscal_year=%s AND snapshot_id=%s AND firm_id IN ({ph})",
+                                [year, snap] + inserted)
+                if hashed:
+                    # Forget the fingerprints so the next --incremental run re-sends these rows
+                    ph = ",".join(["%s"] * len(hashed))
+                    cur.execute(f"DELETE FROM {ROW_HASH_TABLE} WHERE table_name=%s AND snapshot_id=%s "
+                                f"AND fiscal_year=%s AND firm_id IN ({ph})", [table, snap, year] + hashed)
+            mark_dirty(conn, table, [(f, year) for f in inserted], batch_size)
+            before = u.get("before") or []
+            if before:
+                cols = list(before[0].keys())
+                rows = [tuple(b.get(c) for c in cols) for b in before]
+                upsert_fact(conn, table, cols, rows, batch_size=batch_size)
+            print(f"  - {table} {year}: deleted {len(inserted)} inserted rows, restored {len(before)} rows")
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    data["status"] = "rolled_back"
+    data["rolled_back_at"] = datetime.now().isoformat(sep=" ")
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, indent=1)
+    print(">>> rollback done")
@@ -1,445 +1,210 @@
-from sqlalchemy import text
+import argparse
 import pandas as pd
 import os
 from database_setup import engine
-#====================================================================
-GROWTH_LIMITS = (-0.95, 5.0)
-MARKET_CAP_TOLERANCE = 0.05  # Cho phép sai số 5%
+from run_ledger import run_ledger
+from schema_catalog import load_catalog
+from qc_rules import GROWTH_LIMITS, MARKET_CAP_TOLERANCE, evaluate_rules  # noqa: F401  (ngưỡng dùng chung)
+import qc_incremental
+import qc_issues
+import qc_pushdown
+import panel_latest
+from qc_outliers import PRIORITY as OUTLIER_TYPES, find_outliers
+
+REPORT_PATH = os.path.join("outputs", "qc_report.csv")
+
+# Panel dùng cho QC: bảng panel_latest (view vật chất hóa, có sẵn giá và ghi chú mới nhất) + founded_year/ngành
+# (get_data, qc_pushdown.violations_sql)
+PANEL_SQL = panel_latest.QC_PANEL_SQL
 #====================================================================
 def find_table(engine, column_name):
-    query = text("""
-        SELECT TABLE_NAME 
-        FROM INFORMATION_SCHEMA.COLUMNS 
-        WHERE COLUMN_NAME = :col 
-          AND TABLE_SCHEMA = 'vn_firm_panel_test'
-          AND TABLE_NAME LIKE 'fact_%'
-    """)
-    with engine.connect() as conn:
-        result = conn.execute(query, {"col": column_name}).fetchone()
-        return result[0] if result else None
+    """Bảng FACT chứa cột (danh mục INFORMATION_SCHEMA nạp một lần cho cả lần chạy)."""
+    return load_catalog(engine).table_for(column_name)
 #====================================================================   
 def find_tables_for_columns(engine, columns):
-    tables = set() 
-    
-    for col in columns:
-        tbl = find_table(engine, col)
-        if tbl:
-            tables.add(tbl)
-            
-    return ", ".join(sorted(list(tables))) if tables else "Unknown"
+    return load_catalog(engine).tables_for(columns)
 #====================================================================    
-def get_data():
-    """Lấy dữ liệu từ View và Join với các bảng để lấy thêm dữ liệu cần thiết cho QC checks"""
+def get_data(firm_ids=None):
+    """Lấy dữ liệu từ bảng panel_latest và Join với dim_firm để lấy thêm dữ liệu cần thiết cho QC checks
+    (firm_ids: chỉ lấy các doanh nghiệp này, theo lô IN (...), dùng cho --incremental)"""
     try:
-        query = """
-            SELECT 
-                v.*, 
-                f.founded_year,
-                m.share_price,
-                i.evidence_note
-            FROM vw_firm_panel_latest v
-            -- Lấy năm thành lập từ bảng Dim
-            LEFT JOIN dim_firm f ON v.firm_id = f.firm_id
-            -- Lấy giá mới nhất từ bảng Fact Market bằng Subquery
-            LEFT JOIN (
-                SELECT firm_id, fiscal_year, share_price
-                FROM (
-                    SELECT firm_id, fiscal_year, share_price, 
-                        ROW_NUMBER() OVER (PARTITION BY firm_id, fiscal_year ORDER BY snapshot_id DESC) as rn
-                    FROM fact_market_year
-                ) t1 WHERE rn = 1
-            ) m ON v.firm_id = m.firm_id AND v.fiscal_year = m.fiscal_year
-            -- Lấy Note mới nhất từ bảng Fact Innovation
-            LEFT JOIN (
-                SELECT firm_id, fiscal_year, evidence_note
-                FROM (
-                    SELECT firm_id, fiscal_year, evidence_note, 
-                        ROW_NUMBER() OVER (PARTITION BY firm_id, fiscal_year ORDER BY snapshot_id DESC) as rn
-                    FROM fact_innovation_year
-                ) t2 WHERE rn = 1
-            ) i ON v.firm_id = i.firm_id AND v.fiscal_year = i.fiscal_year
-            """
-        df = pd.read_sql(query, engine)
-        return df
+        query = PANEL_SQL
+        if firm_ids is None:
+            return pd.read_sql(query, engine)
+        ids = sorted({int(f) for f in firm_ids})
+        parts = [pd.read_sql(query + f" WHERE v.firm_id IN ({', '.join(map(str, ids[i:i + 1000]))})", engine)
+                 for i in range(0, len(ids), 1000)]
+        return pd.concat(parts, ignore_index=True) if parts else pd.read_sql(query + " WHERE 1 = 0", engine)
     except Exception as e:
         print(f"Lỗi khi lấy dữ liệu tổng hợp: {e}")
         return None
 #====================================================================   
-def run_qc_checks(df):
-    """Thực hiện các quy định QC"""
-    qc_results = []
-    df = df.sort_values(by=['ticker', 'fiscal_year']) 
-
-    for ticker, group in df.groupby('ticker'):
-        # Chuyển nhóm về list để duyệt theo chỉ mục (index)
-        rows = group.to_dict('records')
-        
-        for i in range(len(rows)):
-            row = rows[i]
-            year = row['fiscal_year']
-            age = row.get('firm_age')
-            founded = row.get('founded_year')
-
-            # 1. Kiểm tra logic tuổi doanh nghiệp (firm_age) dựa trên năm thành lập (founded_year)
-            if founded is not None and age is not None:
-                expected_age = year - founded if year >= founded else None 
-                if age != expected_age:
-                    qc_results.append({
-                        'ticker': ticker, 
-                        'fiscal_year': year, 
-                        'table_name': find_table(engine, 'firm_age'),
-                        'column_name': 'firm_age',
-                        'error_type': 'AGE_LOGIC_ERROR', 
-                        'message': f"Không khớp năm thành lập. Có: {age}, Tính toán: {expected_age}",       
-                        'old_value': age,
-                    })
-
-            # 2. Kiểm tra tính tiến triển của tuổi doanh nghiệp qua các năm (firm_age phải tăng dần theo năm)
-            if i > 0:
-                prev_row = rows[i-1]
-                # Check nếu năm tăng 1 thì tuổi phải tăng 1
-                if year == prev_row['fiscal_year'] + 1:
-                    if age is not None and prev_row['firm_age'] is not None:
-                        if age != prev_row['firm_age'] + 1:
-                            qc_results.append({
-                                'ticker': ticker, 
-                                'fiscal_year': year, 
-                                'table_name': find_table(engine, 'firm_age'), 
-                                'column_name': 'firm_age',
-                                'error_type': 'PROGRESSION_ERROR', 
-                                'message': f"Tuổi không tăng tiến đều (Năm trước: {prev_row['firm_age']}, Năm nay: {age})",
-                                'old_value': age,
-                            })
-                # Check nếu bị mất năm (Time Gap)
-                elif year > prev_row['fiscal_year'] + 1:
-                    qc_results.append({
-                        'ticker': ticker, 
-                        'fiscal_year': f"{prev_row['fiscal_year']}-{year}",
-                        'table_name': None, 
-                        'column_name': 'fiscal_year', 
-                        'error_type': 'TIME_GAP', 
-                        'message': "Dữ liệu bị đứt quãng thời gian",
-                        'old_value': None
-                    })
-
-    for index, row in df.iterrows():
-        ticker = row['ticker']
-        year = row['fiscal_year']
-
-        # Các điều kiện kiểm tra tối thiểu
-        # 1. Kiểm tra Ownership ratios trong khoảng [0, 1]
-        own_fields = ['managerial_inside_own', 'state_own', 'institutional_own', 'foreign_own']
-        for field in own_fields:
-            val = row.get(field)
-            if val is not None and (val < 0 or val > 1):
-                qc_results.append({
-                    'ticker': ticker, 
-                    'fiscal_year': year, 
-                    'table_name': find_table(engine, field),
-                    'column_name': field,
-                    'error_type': 'RANGE_ERROR', 
-                    'message': f'Giá trị {val} nằm ngoài khoảng [0,1]',
-                    'old_value': val
-                })
-
-        # 2. Kiểm tra Shares outstanding > 0
-        shares = row.get('shares_outstanding')
-        if shares is not None and shares <= 0:
-            qc_results.append({
-                'ticker': ticker, 
-                'fiscal_year': year, 
-                'table_name': find_table(engine, 'shares_outstanding'),
-                'column_name': 'shares_outstanding',
-                'error_type': 'INVALID_VALUE', 
-                'message': 'Số lượng cổ phiếu phải lớn hơn 0',
-                'old_value': shares
-            })
-
-        # 3. Kiểm tra các trường không âm
-        non_negative_fields = [            
-            'net_sales',              
-            'total_assets',                       
-            'intangible_assets_net',                       
-            'total_liabilities',            
-            'cash_and_equivalents',       
-            'long_term_debt',                 
-            'current_assets',                  
-            'current_liabilities',           
-            'inventory',                               
-            'net_ppe',
-            'wip_goods_purchase',
-            'merchandise_purchase_year',
-            'firm_age',
-            'employees_count'
-        ]
-        for field in non_negative_fields:
-            val = row.get(field)
-            if val is not None and val < 0:
-                qc_results.append({
-                    'ticker': ticker, 
-                    'fiscal_year': year, 
-                    'table_name': find_table(engine, field),
-                    'column_name': field,
-                    'error_type': 'NEGATIVE_VALUE', 
-                    'message': f'Giá trị {field} không được âm',
-                    'old_value': val
-                })
-
-        # 4. Kiểm tra các trường không dương (chi phí)
-        non_positive_fields = [
-            'selling_expenses',             
-            'general_admin_expenses',
-            'manufacturing_overhead',         
-            'raw_material_consumption',                            
-            'outside_manufacturing_expenses', 
-            'production_cost',                
-            'rnd_expenses', 
-            'capex',  
-            'dividend_cash_paid'
-        ]
-        for field in non_positive_fields:
-            val = row.get(field)
-            if val is not None and val > 0:
-                qc_results.append({
-                    'ticker': ticker, 
-                    'fiscal_year': year, 
-                    'table_name': find_table(engine, field),
-                    'column_name': field,
-                    'error_type': 'POSITIVE_VALUE', 
-                    'message': f'Giá trị {field} không được dương',
-                    'old_value': val
-                })
-
-        # 5. Kiểm tra Growth ratio 
-        growth = row.get('growth_ratio')
-        if growth is not None:
-            if growth < GROWTH_LIMITS[0] or growth > GROWTH_LIMITS[1]:
-                qc_results.append({
-                    'ticker': ticker, 
-                    'fiscal_year': year, 
-                    'table_name': find_table(engine, 'growth_ratio'), 
-                    'column_name': 'growth_ratio',
-                    'error_type': 'OUTLIER', 
-                    'message': f'Tỷ lệ tăng trưởng {growth} bất thường',
-                    'old_value': growth
-                })
-
-        # 6. Kiểm tra tính nhất quán Market Cap
-        price = row.get('share_price')
-        mkt_cap = row.get('market_value_equity')
-        if all(v is not None for v in [shares, price, mkt_cap]):
-            calculated_cap = shares * price
-            diff = abs(calculated_cap - mkt_cap) / mkt_cap if mkt_cap != 0 else 0
-            if diff > MARKET_CAP_TOLERANCE:
-                qc_results.append({
-                    'ticker': ticker, 
-                    'fiscal_year': year, 
-                    'table_name': find_tables_for_columns(engine, ['market_value_equity', 'shares_outstanding', 'share_price']),
-                    'column_name': 'market_value_equity/shares_outstanding/share_price',
-                    'error_type': 'INCONSISTENT', 
-                    'message': f'Sai lệch vốn hóa ({diff:.2%}) so với tính toán',
-                    'old_value': (mkt_cap, shares, price)
-                })
-        
-        # Các điều kiện thêm ngoài 6 mục tối thiểu
-        # 7. Kiểm tra tính cân đối của bảng cân đối kế toán
-        assets = row.get('total_assets')
-        liabilities = row.get('total_liabilities')
-        equity = row.get('total_equity')
-
-        # Kiểm tra nếu cả 3 biến đều có dữ liệu
-        if all(v is not None for v in [assets, liabilities, equity]):
-            # Công thức: Tài sản = Nợ phải trả + Vốn chủ sở hữu
-            total_source = liabilities + equity
-            absolute_diff = abs(assets - total_source)
-            
-            # Tính tỷ lệ sai lệch tương đối
-            relative_diff = absolute_diff / assets if assets != 0 else 0
-
-            if relative_diff > MARKET_CAP_TOLERANCE:
-                qc_results.append({
-                    'ticker': ticker,
-                    'fiscal_year': year,
-                    'table_name': find_tables_for_columns(engine, ['total_assets', 'total_liabilities', 'total_equity']),
-                    'column_name': 'total_assets/total_liabilities/total_equity',
-                    'error_type': 'ACCOUNTING_IMBALANCE',
-                    'message': f'Bảng cân đối không khớp. Chênh lệch: {absolute_diff:,.0f} ({relative_diff:.2%})',
-                    'old_value': (assets, liabilities, equity)
-                })
-
-       # 8. Kiểm tra tính hợp lý thành phần tài sản
-        curr_assets = row.get('current_assets')
-        if assets is not None and curr_assets is not None and curr_assets > assets:
-            qc_results.append({
-                'ticker': ticker, 
-                'fiscal_year': year, 
-                'table_name': find_tables_for_columns(engine, ['current_assets', 'total_assets']),
-                'column_name': 'current_assets/total_assets',
-                'error_type': 'COMPONENT_ERROR', 
-                'message': 'Tài sản ngắn hạn vượt quá tổng tài sản',
-                'old_value': (curr_assets, assets)
-            })
-
-        cash = row.get('cash_and_equivalents')
-        inv = row.get('inventory')
-        if curr_assets is not None and cash is not None and inv is not None and (cash + inv) > curr_assets:
-            qc_results.append({
-                'ticker': ticker, 
-                'fiscal_year': year, 
-                'table_name': find_tables_for_columns(engine, ['cash_and_equivalents', 'inventory', 'current_assets']),
-                'column_name': 'cash_and_equivalents/inventory/current_assets',
-                'error_type': 'COMPONENT_ERROR', 
-                'message': 'Tổng tiền mặt và hàng tồn kho vượt quá tài sản ngắn hạn',
-                'old_value': (cash, inv, curr_assets)
-            })
-
-        ppe = row.get('net_ppe')
-        intang = row.get('intangible_assets_net')
-        if assets is not None and ppe is not None and intang is not None and (ppe + intang) > assets:
-            qc_results.append({
-                'ticker': ticker, 
-                'fiscal_year': year, 
-                'table_name': find_tables_for_columns(engine, ['net_ppe', 'intangible_assets_net', 'total_assets']),
-                'column_name': 'net_ppe/intangible_assets_net/total_assets',
-                'error_type': 'COMPONENT_ERROR', 
-                'message': 'Tổng PPE và tài sản vô hình vượt quá tổng tài sản',
-                'old_value': (ppe, intang, assets)
-            })
-
-        # 9. Kiểm tra tính hợp lý thành phần nợ
-        lt_debt = row.get('long_term_debt')
-        curr_liab = row.get('current_liabilities')
-        if liabilities is not None and lt_debt is not None and curr_liab is not None and (lt_debt + curr_liab) > liabilities:
-                qc_results.append({
-                    'ticker': ticker, 
-                    'fiscal_year': year, 
-                    'table_name': find_tables_for_columns(engine, ['long_term_debt', 'current_liabilities', 'total_liabilities']),
-                    'column_name': 'long_term_debt/current_liabilities/total_liabilities',
-                    'error_type': 'COMPONENT_ERROR', 
-                    'message': 'Nợ dài hạn và nợ ngắn hạn vượt quá tổng nợ',
-                    'old_value': (lt_debt, curr_liab, liabilities)
-                })
-
-        # 10. Kiểm tra các biến về doanh thu và lợi nhuận:
-        revenue = row.get('net_sales')
-        net_income = row.get('net_income')
-        if revenue is not None and net_income is not None and net_income > revenue:
-            qc_results.append({
-                'ticker': ticker, 
-                'fiscal_year': year, 
-                'table_name': find_tables_for_columns(engine, ['net_income', 'net_sales']),
-                'column_name': 'net_income/net_sales',
-                'error_type': 'COMPONENT_ERROR', 
-                'message': 'Lợi nhuận ròng vượt quá doanh thu',
-                'old_value': (net_income, revenue)
-            })
-
-        # 11. Kiểm tra các trường dummy (0/1)
-        prod = row['product_innovation']
-        proc = row['process_innovation']
-        note = str(row['evidence_note']).strip() if row['evidence_note'] else ""
-
-        for field in ['product_innovation', 'process_innovation']:
-            val = row.get(field)
-            if pd.isna(val) or val is None:
-                qc_results.append({
-                    'ticker': ticker, 
-                    'fiscal_year': year,
-                    'table_name': find_table(engine, field),
-                    'column_name': field,
-                    'error_type': 'MISSING_VALUE', 
-                    'message': f'Biến {field} đang bị để trống (NULL). Chỉ chấp nhận 0 hoặc 1.',
-                    'old_value': None
-                    })
-                continue 
-            
-            if val not in [0, 1]:
-                qc_results.append({
-                    'ticker': ticker, 
-                    'fiscal_year': year,
-                    'table_name': find_table(engine, field),
-                    'column_name': field,
-                    'error_type': 'INVALID_DUMMY', 
-                    'message': f'Giá trị {field} không hợp lệ (hiện tại là {val}). Chỉ chấp nhận 0 hoặc 1.',
-                    'old_value': val
-                })
-
-        note_lower = note.lower()
-        parts = note_lower.split('|')
-        
-        prod_content = ""
-        proc_content = ""
-
-        for p in parts:
-            if 'product:' in p:
-                prod_content = p.replace('product:', '').replace('nan', '').replace('none', '').strip()
-            if 'process:' in p:
-                proc_content = p.replace('process:', '').replace('nan', '').replace('none', '').strip()
-
-        is_prod_note_empty = not prod_content
-        is_proc_note_empty = not proc_content
-
-        if prod == 1 and is_prod_note_empty:
-            qc_results.append({
-                'ticker': ticker, 'fiscal_year': year, 
-                'table_name': find_table(engine, 'evidence_note'),
-                'column_name': 'evidence_note', 
-                'error_type': 'MISSING_PRODUCT_NOTE',
-                'message': f'Đổi mới SP (1) nhưng ghi chú "product:" trống hoặc nan. (Gốc: "{note}")',
-                'old_value': note
-            })
-
-        if prod == 0 and not is_prod_note_empty:
-            qc_results.append({
-                'ticker': ticker, 'fiscal_year': year, 
-                'table_name': find_table(engine, 'evidence_note'),
-                'column_name': 'evidence_note', 'error_type': 'UNEXPECTED_PRODUCT_NOTE',
-                'message': f'Không đổi mới SP (0) nhưng "product:" lại có thuyết minh. (Gốc: "{note}")',
-                'old_value': note
-            })
-
-        if proc == 1 and is_proc_note_empty:
-            qc_results.append({
-                'ticker': ticker, 'fiscal_year': year, 
-                'table_name': find_table(engine, 'evidence_note'),
-                'column_name': 'evidence_note', 'error_type': 'MISSING_PROCESS_NOTE',
-                'message': f'Đổi mới QT (1) nhưng ghi chú "process:" trống hoặc nan. (Gốc: "{note}")',
-                'old_value': note
-            })
-        if proc == 0 and not is_proc_note_empty:
-            qc_results.append({
-                'ticker': ticker, 'fiscal_year': year, 
-                'table_name': find_table(engine, 'evidence_note'),
-                'column_name': 'evidence_note', 'error_type': 'UNEXPECTED_PROCESS_NOTE',
-                'message': f'Không đổi mới QT (0) nhưng "process:" lại có thuyết minh. (Gốc: "{note}")',
-                'old_value': note
-            })
-
-    qc_results.append({
-        'new_value': None
-    })  
-    return pd.DataFrame(qc_results)
+def table_for(columns):
+    """Tên bảng FACT cho một luật: một cột -> find_table, nhiều cột -> find_tables_for_columns."""
+    if len(columns) == 1:
+        return find_table(engine, columns[0])
+    return find_tables_for_columns(engine, columns)
 #====================================================================
-def main():
+def get_violations():
+    """--pushdown: các luật được dịch sang SQL, chỉ lấy về dòng vi phạm (+ dòng năm trước làm ngữ cảnh)"""
+    try:
+        return pd.read_sql(qc_pushdown.violations_sql(PANEL_SQL), engine)
+    except Exception as e:
+        print(f"Lỗi khi chạy QC trên Database: {e}")
+        return None
+#====================================================================
+def run_qc_checks(df, pushdown=False, outliers=False):
+    """Thực hiện các quy định QC (qc_rules.RULES, mỗi luật tính một lần trên cả cột)
+    (pushdown: df là kết quả get_violations(), chỉ gồm các dòng vi phạm;
+     outliers: thêm cảnh báo ngoại lai median/MAD của qc_outliers, cần cả panel)"""
+    if pushdown:
+        issues = qc_pushdown.issues_from_violations(df, table_for)
+    else:
+        issues = evaluate_rules(df, table_for)
+    if outliers:
+        found = find_outliers(df, table_for)
+        if not found.empty:
+            issues = pd.concat([issues, found], ignore_index=True) if not issues.empty else found
+    if issues.empty:
+        return pd.DataFrame([{'new_value': None}])
+    # Dòng cuối giữ chỗ cho cột new_value (người sửa điền vào, quick_fix đọc lại)
+    return pd.concat([issues, pd.DataFrame([{'new_value': None}])], ignore_index=True).infer_objects()
+#====================================================================
+def read_watermarks(run):
+    """Mốc nước snapshot/override hiện tại của mọi firm-year (đọc TRƯỚC panel: dữ liệu mới hơn chỉ làm lần sau kiểm tra lại)."""
+    with run.stage("read_watermarks") as st:
+        with engine.connect() as conn:
+            current = qc_incremental.current_watermarks(conn)
+        st.rows_read = len(current)
+    return current
+#====================================================================
+def save_qc_state(run, current, plan=None):
+    try:
+        with run.stage("save_qc_state") as st:
+            with engine.begin() as conn:
+                st.rows_written = qc_incremental.save_state(conn, current, plan)
+    except Exception as e:
+        print(f"!!! Không lưu được {qc_incremental.STATE_TABLE} (lần --incremental sau sẽ kiểm tra lại): {e}")
+#====================================================================
+def save_issues(run, issues, scope=None, keep_types=(), live=None):
+    """Ghi issue vào fact_qc_issue (quick_fix đọc các issue đang mở có new_value từ bảng này)."""
+    with run.stage("save_issues") as st:
+        with engine.begin() as conn:
+            st.rows_written, st.rows_skipped = qc_issues.save_issues(conn, issues, run.run_id, scope,
+                                                                     keep_types, live)
+    print(f"Đã ghi {st.rows_written} issue vào {qc_issues.ISSUE_TABLE} ({st.rows_skipped} issue cũ được thay thế).")
+#====================================================================
+def run_incremental(run):
+    """Chỉ kiểm tra lại các firm-year có snapshot/override mới (và dòng liền sau), gộp vào qc_report.csv."""
+    current = read_watermarks(run)
+    with engine.connect() as conn:
+        saved = qc_incremental.load_state(conn)
+    if saved.empty or not os.path.exists(REPORT_PATH):
+        print("Chưa có trạng thái QC trước đó -> kiểm tra toàn bộ.")
+        return run_full(run, current)
+
+    plan = qc_incremental.plan_recheck(current, saved)
+    print(f"Firm-year thay đổi: {plan.stale}, cần kiểm tra lại: {len(plan.recheck)}, "
+          f"đọc thêm làm ngữ cảnh: {len(plan.fetch) - len(plan.recheck)}, đã bị xóa: {len(plan.removed)}")
+    if plan.empty():
+        print("Không có firm-year nào thay đổi kể từ lần kiểm tra trước.")
+        return
+
+    with run.stage("read_panel") as st:
+        df = get_data(firm_ids=plan.fetch["firm_id"])
+        if df is None:
+            print("Không thể kết nối để lấy dữ liệu.")
+            run.fail(ConnectionError("get_data() returned None"))
+            return
+        df = qc_incremental.restrict(df, plan.fetch)
+        st.rows_read = len(df)
+        st.bytes_read = int(df.memory_usage(deep=True).sum())
+    with run.stage("load_catalog") as st:
+        st.rows_read = sum(len(cols) for cols in load_catalog(engine).tables.values())
+    with run.stage("run_qc_checks") as st:
+        replaced = plan.replaced
+        issues = qc_incremental.keep_issues(evaluate_rules(df, table_for), replaced)
+        st.rows_read, st.rows_written = len(df), len(issues)
+    # Không tính lại ngoại lai (cần cả panel): giữ cảnh báo ngoại lai cũ của các firm-year còn tồn tại
+    live = qc_incremental.live_keys(current)
+    with run.stage("write_report") as st:
+        report_df = qc_incremental.merge_report(qc_incremental.read_report(REPORT_PATH), issues, replaced,
+                                                OUTLIER_TYPES, live)
+        report_df.to_csv(REPORT_PATH, index=False, encoding="utf-8-sig")
+        st.rows_written = len(report_df)
+    save_issues(run, issues, replaced, OUTLIER_TYPES, live)
+    save_qc_state(run, current, plan)
+    print(f"Kiểm tra lại {len(plan.recheck)} firm-year: {len(issues)} cảnh báo mới, "
+          f"tổng {len(report_df) - 1} cảnh báo. Chi tiết tại: {REPORT_PATH}")
+#====================================================================
+def run_full(run, current=None, pushdown=False, outliers=True):
     print("Đang tải dữ liệu từ Database...")
-    df = get_data()
-    
+    if current is None:
+        try:
+            current = read_watermarks(run)
+        except Exception as e:
+            print(f"!!! Không đọc được mốc nước QC, bỏ qua {qc_incremental.STATE_TABLE}: {e}")
+    with run.stage("read_violations" if pushdown else "read_panel") as st:
+        df = get_violations() if pushdown else get_data()
+        if df is not None:
+            st.rows_read = len(df)
+            st.bytes_read = int(df.memory_usage(deep=True).sum())  # in-memory size of the result set
+
     if df is not None:
         print("Đang chạy kiểm tra QC...")
-        report_df = run_qc_checks(df)
-        
+        with run.stage("load_catalog") as st:
+            st.rows_read = sum(len(cols) for cols in load_catalog(engine).tables.values())
+        outliers = outliers and not pushdown
+        with run.stage("run_qc_checks") as st:
+            report_df = run_qc_checks(df, pushdown, outliers)
+            st.rows_read = len(df)
+            st.rows_written = max(len(report_df) - 1, 0)  # last row is the new_value placeholder
+        if outliers:
+            save_issues(run, report_df.iloc[:-1])
+        else:
+            # Bước ngoại lai bị bỏ qua: giữ cảnh báo ngoại lai của lần chạy đầy đủ trước (báo cáo + fact_qc_issue)
+            live = qc_incremental.live_keys(current) if current is not None else None
+            issues = report_df.iloc[:-1]
+            report_df = qc_incremental.merge_report(qc_incremental.read_report(REPORT_PATH),
+                                                    issues.drop(columns="new_value"), None, OUTLIER_TYPES, live)
+            save_issues(run, issues, None, OUTLIER_TYPES, live)
+
         if not report_df.empty and len(report_df) > 2:
-            output_dir = "outputs"
-            os.makedirs(output_dir, exist_ok=True)
-            
-            report_path = os.path.join(output_dir, "qc_report.csv")
-            report_df.to_csv(report_path, index=False, encoding="utf-8-sig")
-            
-            print(f"Đã tìm thấy {len(report_df)-1} cảnh báo. Chi tiết tại: {report_path}")
+            os.makedirs(os.path.dirname(REPORT_PATH), exist_ok=True)
+            with run.stage("write_report") as st:
+                report_df.to_csv(REPORT_PATH, index=False, encoding="utf-8-sig")
+                st.rows_written = len(report_df)
+            # State matches the report just written (no report -> keep the old pair)
+            if current is not None:
+                save_qc_state(run, current)
+
+            print(f"Đã tìm thấy {len(report_df)-1} cảnh báo. Chi tiết tại: {REPORT_PATH}")
         else:
             print("Chúc mừng! Dữ liệu không có lỗi logic nào.")
     else:
         print("Không thể kết nối để lấy dữ liệu.")
+        run.fail(ConnectionError("get_data() returned None"))
+#====================================================================
+def main():
+    ap = argparse.ArgumentParser(description="QC checks on panel_latest (materialized vw_firm_panel_latest) -> outputs/qc_report.csv")
+    ap.add_argument("--incremental", action="store_true",
+                    help=f"re-check only firm-years whose snapshots/overrides changed since the last run "
+                         f"({qc_incremental.STATE_TABLE}) and merge into the existing report")
+    ap.add_argument("--pushdown", action="store_true",
+                    help="evaluate the rules as SQL predicates in MySQL and fetch only the violating rows")
+    ap.add_argument("--no-outliers", action="store_true",
+                    help="skip the robust outlier stage (industry-year and firm median/MAD, log jumps, unit scale); "
+                         "it needs the whole panel, so --incremental and --pushdown always skip it")
+    args = ap.parse_args()
+    if args.incremental and args.pushdown:
+        raise SystemExit("--incremental and --pushdown cannot be combined")
+    with run_ledger("qc_checks", engine.raw_connection, args=vars(args)) as run:
+        # Firm-year nạp/sửa sau lần làm mới trước (thường không còn gì: loader và quick_fix đã làm mới)
+        panel_latest.refresh_stage(run, engine.raw_connection)
+        if args.incremental:
+            run_incremental(run)
+        else:
+            run_full(run, pushdown=args.pushdown, outliers=not args.no_outliers)
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,195 @@
+import os
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+import numpy as np
+import pandas as pd
+from sqlalchemy import text
+from qc_rules import issue_year
+from sql_batch import insert_many, update_clause
+
+# QC tăng dần cho qc_checks --incremental, theo "mốc nước" của từng (firm_id, fiscal_year):
+#   current = current_watermarks(conn); saved = load_state(conn)
+#   plan = plan_recheck(current, saved)        # dòng cần chạy lại + dòng cần đọc làm ngữ cảnh
+#   merged = merge_report(read_report(path), issues, plan.replaced)
+#   save_state(conn, current, plan)
+# - Mốc nước = snapshot_id của dòng mới nhất từng bảng FACT (cùng thứ tự với panel: snapshot_date DESC,
+#   snapshot_id DESC), panel_latest.refreshed_at (dòng được dựng lại mỗi khi firm-year bị ghi: nạp lại vào cùng
+#   snapshot, quick_fix, đổi snapshot_date), MAX(override_id) của fact_value_override_log và
+#   dim_firm.founded_year (luật AGE_LOGIC_ERROR).
+#   Lưu trong etl_qc_state; một firm-year "cũ" khi mốc nước khác bản đã lưu hoặc chưa từng được kiểm tra.
+# - Luật theo chuỗi năm (PROGRESSION_ERROR, TIME_GAP) so dòng với dòng liền trước của cùng doanh nghiệp:
+#   kiểm tra lại dòng cũ + dòng liền sau nó, đọc thêm dòng liền trước của mỗi dòng đó làm ngữ cảnh.
+# - Firm-year đã bị xóa khỏi FACT: bỏ issue + state của nó, kiểm tra lại dòng liền sau.
+# - Cảnh báo ngoại lai (qc_outliers, cần cả panel) không được tính lại ở đây: dòng cũ của chúng được giữ
+#   (merge_report / qc_issues.save_issues với keep_types), trừ khi firm-year đã bị xóa.
+# - Sửa fact bằng SQL tay (không qua loader/quick_fix, nên không vào panel_latest_dirty) không được phát hiện:
+#   chạy qc_checks không có --incremental để làm mới toàn bộ. panel_latest.py --full dựng lại mọi dòng,
+#   nên lần --incremental sau đó kiểm tra lại toàn bộ.
+
+STATE_TABLE = "etl_qc_state"
+SNAPSHOT_COLUMNS = {
+    "oy_snapshot_id": "fact_ownership_year",
+    "fy_snapshot_id": "fact_financial_year",
+    "cf_snapshot_id": "fact_cashflow_year",
+    "my_snapshot_id": "fact_market_year",
+    "iv_snapshot_id": "fact_innovation_year",
+    "meta_snapshot_id": "fact_firm_year_meta",
+}
+WATERMARK_COLUMNS = list(SNAPSHOT_COLUMNS) + ["panel_refreshed_us", "last_override_id", "founded_year"]
+KEY = ["firm_id", "fiscal_year"]
+BATCH_SIZE = 1000
+
+class RecheckPlan:
+    """Firm-years to re-check (their issues are replaced), to read (re-check + previous rows), and removed."""
+
+    def __init__(self, recheck: pd.DataFrame, fetch: pd.DataFrame, removed: pd.DataFrame, stale: int):
+        self.recheck = recheck  # firm_id, ticker, fiscal_year
+        self.fetch = fetch      # firm_id, fiscal_year
+        self.removed = removed  # firm_id, ticker, fiscal_year
+        self.stale = stale
+
+    @property
+    def replaced(self) -> Set[Tuple[str, int]]:
+        """(ticker, fiscal_year) whose rows in the persisted report are dropped before the merge."""
+        keys = pd.concat([self.recheck, self.removed], ignore_index=True)
+        return set(zip(keys["ticker"].astype(str), keys["fiscal_year"].astype(int)))
+
+    def empty(self) -> bool:
+        return self.recheck.empty and self.removed.empty
+
+def current_watermarks(conn) -> pd.DataFrame:
+    """One row per firm-year present in any fact table: firm_id, ticker, fiscal_year + WATERMARK_COLUMNS."""
+    parts = [f"""SELECT '{col}' AS wm, firm_id, fiscal_year, snapshot_id AS v FROM (
+                   SELECT firm_id, fiscal_year, snapshot_id, ROW_NUMBER() OVER (
+                     PARTITION BY firm_id, fiscal_year ORDER BY snapshot_date DESC, snapshot_id DESC) AS rn
+                   FROM {table}) t WHERE rn = 1"""
+             for col, table in SNAPSHOT_COLUMNS.items()]
+    long = pd.read_sql(text(" UNION ALL ".join(parts)), conn)
+    wm = long.pivot_table(index=KEY, columns="wm", values="v", aggfunc="max")
+    wm = wm.reindex(columns=list(SNAPSHOT_COLUMNS)).reset_index()
+    refreshed = pd.read_sql(text("""
+        SELECT firm_id, fiscal_year, CAST(UNIX_TIMESTAMP(refreshed_at) * 1000000 AS SIGNED) AS panel_refreshed_us
+        FROM panel_latest"""), conn)
+    overrides = pd.read_sql(text("""
+        SELECT firm_id, fiscal_year, MAX(override_id) AS last_override_id
+        FROM fact_value_override_log GROUP BY firm_id, fiscal_year"""), conn)
+    firms = pd.read_sql(text("SELECT firm_id, ticker, founded_year FROM dim_firm"), conn)
+    wm = wm.merge(refreshed, on=KEY, how="left").merge(overrides, on=KEY, how="left")
+    wm = wm.merge(firms, on="firm_id", how="inner")
+    return normalize(wm)[["firm_id", "ticker", "fiscal_year"] + WATERMARK_COLUMNS]
+
+def load_state(conn) -> pd.DataFrame:
+    state = pd.read_sql(text(f"SELECT firm_id, fiscal_year, {', '.join(WATERMARK_COLUMNS)} FROM {STATE_TABLE}"), conn)
+    return normalize(state)
+
+def normalize(df: pd.DataFrame) -> pd.DataFrame:
+    """Integer keys, nullable-integer watermarks (so NULL == NULL when comparing with the saved state)."""
+    df = df.copy()
+    for col in KEY:
+        df[col] = df[col].astype("int64")
+    for col in WATERMARK_COLUMNS:
+        if col in df.columns:
+            df[col] = pd.to_numeric(df[col]).astype("Int64")
+    return df
+
+def plan_recheck(current: pd.DataFrame, saved: pd.DataFrame) -> RecheckPlan:
+    """Stale firm-years, the next firm-year of each (its progression/gap issue depends on it) and their context."""
+    merged = current.merge(saved, on=KEY, how="left", suffixes=("", "_saved"), indicator=True)
+    stale = (merged["_merge"] == "left_only").to_numpy()
+    for col in WATERMARK_COLUMNS:
+        now, before = merged[col], merged[f"{col}_saved"]
+        stale |= ~((now == before).fillna(False) | (now.isna() & before.isna())).to_numpy()
+    cur = merged[["firm_id", "ticker", "fiscal_year"]].assign(stale=stale, removed=False)
+
+    tickers = current.drop_duplicates("firm_id").set_index("firm_id")["ticker"]
+    gone = saved[KEY].merge(current[KEY], on=KEY, how="left", indicator=True)
+    gone = gone[gone["_merge"] == "left_only"][KEY]
+    gone = gone.assign(ticker=gone["firm_id"].map(tickers), stale=True, removed=True)
+
+    # Removed rows stay in the sorted series so that the row after them is re-checked too
+    rows = pd.concat([cur, gone], ignore_index=True).sort_values(KEY, kind="stable").reset_index(drop=True)
+    same_firm = rows["firm_id"].eq(rows["firm_id"].shift(1))
+    rows["recheck"] = rows["stale"] | (same_firm & rows["stale"].shift(1, fill_value=False))
+
+    live = rows[~rows["removed"]].reset_index(drop=True)
+    next_same_firm = live["firm_id"].eq(live["firm_id"].shift(-1))
+    fetch = live["recheck"] | (next_same_firm & live["recheck"].shift(-1, fill_value=False))
+
+    removed = rows[rows["removed"]]
+    return RecheckPlan(
+        recheck=live.loc[live["recheck"], ["firm_id", "ticker", "fiscal_year"]].reset_index(drop=True),
+        fetch=live.loc[fetch, KEY].reset_index(drop=True),
+        removed=removed.loc[removed["ticker"].notna(), ["firm_id", "ticker", "fiscal_year"]].reset_index(drop=True),
+        stale=int(stale.sum()),
+    )
+
+def restrict(df: pd.DataFrame, keys: pd.DataFrame) -> pd.DataFrame:
+    """Rows of the panel whose (firm_id, fiscal_year) is in keys."""
+    wanted = pd.MultiIndex.from_frame(keys[KEY].astype("int64"))
+    have = pd.MultiIndex.from_arrays([df["firm_id"].astype("int64"), df["fiscal_year"].astype("int64")])
+    return df[have.isin(wanted)].reset_index(drop=True)
+
+def keep_issues(issues: pd.DataFrame, keys: Set[Tuple[str, int]]) -> pd.DataFrame:
+    """Issues of the re-checked firm-years only (the context rows were checked without their own previous row)."""
+    own = [(str(t), issue_year(y)) in keys for t, y in zip(issues["ticker"], issues["fiscal_year"])]
+    return issues[np.array(own, dtype=bool)].reset_index(drop=True)
+
+def read_report(path: str) -> Optional[pd.DataFrame]:
+    """The persisted report as text (new_value edits kept as typed), without the trailing placeholder row."""
+    if not os.path.exists(path):
+        return None
+    old = pd.read_csv(path, dtype=str, keep_default_na=False, encoding="utf-8-sig")
+    return old[old["ticker"] != ""].reset_index(drop=True)
+
+def live_keys(current: pd.DataFrame) -> Set[Tuple[str, int]]:
+    """(ticker, fiscal_year) of every firm-year still in the fact tables."""
+    return set(zip(current["ticker"].astype(str), current["fiscal_year"].astype(int)))
+
+def kept_mask(tickers, years, error_types, keep_types: Iterable[str],
+              live: Optional[Set[Tuple[str, int]]]) -> np.ndarray:
+    """Old issues of a stage that did not run this time (keep_types), on firm-years that still exist (live)."""
+    keep_types = set(keep_types)
+    return np.array([e in keep_types and (live is None or (str(t), issue_year(y)) in live)
+                     for t, y, e in zip(tickers, years, error_types)], dtype=bool)
+
+def merge_report(old: Optional[pd.DataFrame], issues: pd.DataFrame, replaced: Optional[Set[Tuple[str, int]]],
+                 keep_types: Iterable[str] = (), live: Optional[Set[Tuple[str, int]]] = None) -> pd.DataFrame:
+    """
+    Old rows of untouched firm-years (every firm-year when replaced is None) and old rows of keep_types on live
+    firm-years (with any new_value already filled in) + the fresh issues, ordered by ticker then firm-year,
+    and the new_value placeholder row last like run_qc_checks.
+    """
+    fresh = issues.astype(object).assign(new_value=None)
+    if old is not None and not old.empty:
+        if replaced is None:
+            drop = np.ones(len(old), dtype=bool)
+        else:
+            drop = np.array([(t, issue_year(y)) in replaced for t, y in zip(old["ticker"], old["fiscal_year"])],
+                            dtype=bool)
+        drop &= ~kept_mask(old["ticker"], old["fiscal_year"], old["error_type"], keep_types, live)
+        fresh = pd.concat([old[~drop], fresh], ignore_index=True)
+    if not fresh.empty:
+        order = pd.DataFrame({"t": fresh["ticker"].astype(str), "y": fresh["fiscal_year"].map(issue_year)})
+        fresh = fresh.loc[order.sort_values(["t", "y"], kind="stable").index].reset_index(drop=True)
+    return pd.concat([fresh, pd.DataFrame([{'new_value': None}])], ignore_index=True)
+
+def state_rows(current: pd.DataFrame, keys: Optional[pd.DataFrame] = None) -> List[Dict[str, Optional[int]]]:
+    rows = current if keys is None else current.merge(keys[KEY], on=KEY, how="inner")
+    rows = rows[KEY + WATERMARK_COLUMNS].astype(object)
+    return rows.where(rows.notna(), None).to_dict("records")
+
+def upsert_state(conn, rows: List[Dict[str, Optional[int]]]) -> int:
+    cols = KEY + WATERMARK_COLUMNS
+    insert_many(conn, STATE_TABLE, cols, [tuple(row[c] for c in cols) for row in rows], BATCH_SIZE,
+                on_duplicate=update_clause(cols, KEY) + ", checked_at = CURRENT_TIMESTAMP")
+    return len(rows)
+
+def save_state(conn, current: pd.DataFrame, plan: Optional[RecheckPlan] = None) -> int:
+    """Record the watermarks just checked: every firm-year after a full run, the re-checked ones otherwise."""
+    if plan is None:
+        conn.execute(text(f"DELETE FROM {STATE_TABLE}"))
+        return upsert_state(conn, state_rows(current))
+    for i in range(0, len(plan.removed), BATCH_SIZE):
+        part = plan.removed.iloc[i:i + BATCH_SIZE]
+        pairs = ", ".join(f"({int(f)}, {int(y)})" for f, y in zip(part["firm_id"], part["fiscal_year"]))
+        conn.execute(text(f"DELETE FROM {STATE_TABLE} WHERE (firm_id, fiscal_year) IN ({pairs})"))
+    return upsert_state(conn, state_rows(current, plan.recheck))
@@ -0,0 +1,98 @@
+from typing import Any, Iterable, Optional, Set, Tuple
+import pandas as pd
+from sqlalchemy import text
+from dim_keys import KEYS
+from qc_incremental import kept_mask
+from qc_rules import issue_year
+from sql_batch import insert_many
+
+# Lưu issue QC vào bảng fact_qc_issue (thay cho việc quick_fix đọc lại cả qc_report.csv):
+#   save_issues(conn, issues, run_id)                    # lần chạy toàn bộ: thay mọi issue đang mở
+#   save_issues(conn, issues, run_id, scope=replaced)    # --incremental: chỉ các (ticker, năm) được kiểm tra lại
+#   save_issues(..., keep_types=qc_outliers.PRIORITY, live=keys)  # bước ngoại lai không chạy: giữ issue cũ của nó
+#   fixes = open_fixes(conn)                             # issue đang mở đã có new_value -> quick_fix
+# - Trạng thái: open -> fixed (quick_fix đã áp dụng) | ignored (người duyệt bỏ qua) | superseded (lần QC sau thay thế).
+# - new_value người duyệt đã điền trên issue đang mở được chép sang issue mới cùng (ticker, năm, error_type, cột).
+# - Ghi theo lô: một câu INSERT nhiều dòng cho mỗi BATCH_SIZE issue, một câu UPDATE cho mỗi lô issue bị thay.
+# - Xem nhanh: SELECT * FROM fact_qc_issue WHERE status = 'open' AND ticker = 'VNM';
+
+ISSUE_TABLE = "fact_qc_issue"
+BATCH_SIZE = 1000
+MATCH_KEY = ["ticker", "fiscal_year", "error_type", "column_name"]
+INSERT_COLUMNS = ["run_id", "firm_id", "ticker", "fiscal_year", "year_label", "table_name", "column_name",
+                  "error_type", "message", "old_value", "new_value"]
+
+def text_or_none(v: Any) -> Optional[str]:
+    return None if v is None or (isinstance(v, float) and pd.isna(v)) else str(v)
+
+def issue_rows(conn, issues: pd.DataFrame, run_id: Optional[int]) -> pd.DataFrame:
+    """QC issues (qc_rules.ISSUE_COLUMNS, maybe new_value) -> rows of fact_qc_issue."""
+    if issues.empty:
+        return pd.DataFrame(columns=INSERT_COLUMNS)
+    rows = pd.DataFrame({
+        "run_id": run_id,
+        "ticker": issues["ticker"].astype(str).str.strip().tolist(),
+        "fiscal_year": [issue_year(y) for y in issues["fiscal_year"]],
+        "year_label": issues["fiscal_year"].astype(str).tolist(),
+        "table_name": [text_or_none(v) for v in issues["table_name"]],
+        "column_name": issues["column_name"].astype(str).tolist(),
+        "error_type": issues["error_type"].astype(str).tolist(),
+        "message": [text_or_none(v) for v in issues["message"]],
+        "old_value": [text_or_none(v) for v in issues["old_value"]],
+        "new_value": [text_or_none(v) for v in issues.get("new_value", pd.Series([None] * len(issues)))],
+    })
+    firm_ids = KEYS.firm_ids(conn, rows["ticker"].unique().tolist())
+    rows["firm_id"] = [firm_ids.get(t.upper()) for t in rows["ticker"]]
+    return rows[INSERT_COLUMNS]
+
+def read_open(conn, scope: Optional[Set[Tuple[str, int]]] = None) -> pd.DataFrame:
+    df = pd.read_sql(text(f"""
+        SELECT issue_id, ticker, fiscal_year, error_type, column_name, new_value
+        FROM {ISSUE_TABLE} WHERE status = 'open'"""), conn)
+    if scope is not None and not df.empty:
+        df = df[[(t, int(y)) in scope for t, y in zip(df["ticker"], df["fiscal_year"])]]
+    return df
+
+def insert_rows(conn, rows: pd.DataFrame) -> int:
+    records = list(rows[INSERT_COLUMNS].astype(object).where(rows.notna(), None).itertuples(index=False, name=None))
+    insert_many(conn, ISSUE_TABLE, INSERT_COLUMNS, records, BATCH_SIZE)
+    return len(records)
+
+def set_status(conn, issue_ids: Iterable[int], status: str, extra: str = "") -> int:
+    ids = [int(i) for i in issue_ids]
+    for i in range(0, len(ids), BATCH_SIZE):
+        part = ", ".join(map(str, ids[i:i + BATCH_SIZE]))
+        conn.execute(text(f"UPDATE {ISSUE_TABLE} SET status = :status{extra} WHERE issue_id IN ({part})"),
+                     {"status": status})
+    return len(ids)
+
+def save_issues(conn, issues: pd.DataFrame, run_id: Optional[int],
+                scope: Optional[Set[Tuple[str, int]]] = None, keep_types: Iterable[str] = (),
+                live: Optional[Set[Tuple[str, int]]] = None) -> Tuple[int, int]:
+    """
+    Supersede the open issues of the checked firm-years (all of them when scope is None) and bulk-insert the new
+    issues, carrying over new_value already entered on a matching open issue. Open issues of keep_types (a stage
+    that did not run) stay open on firm-years in live (None: all). Returns (inserted, superseded).
+    """
+    rows = issue_rows(conn, issues, run_id)
+    old = read_open(conn, scope)
+    if not old.empty:
+        old = old[~kept_mask(old["ticker"], old["fiscal_year"], old["error_type"], keep_types, live)]
+    if not old.empty:
+        entered = old[old["new_value"].notna()].drop_duplicates(MATCH_KEY, keep="last")
+        carried = rows.merge(entered[MATCH_KEY + ["new_value"]], on=MATCH_KEY, how="left", suffixes=("", "_old"))
+        rows["new_value"] = carried["new_value"].where(carried["new_value"].notna(), carried["new_value_old"]).tolist()
+    superseded = set_status(conn, old["issue_id"], "superseded")
+    return insert_rows(conn, rows), superseded
+
+def open_fixes(conn) -> pd.DataFrame:
+    """Open issues that have a new_value, oldest first: same columns as qc_report.csv plus issue_id."""
+    return pd.read_sql(text(f"""
+        SELECT issue_id, ticker, year_label AS fiscal_year, table_name, column_name, error_type, message,
+               old_value, new_value
+        FROM {ISSUE_TABLE}
+        WHERE status = 'open' AND new_value IS NOT NULL AND TRIM(new_value) <> ''
+        ORDER BY issue_id"""), conn)
+
+def mark_fixed(conn, issue_ids: Iterable[int]) -> int:
+    return set_status(conn, issue_ids, "fixed", ", fixed_at = CURRENT_TIMESTAMP")
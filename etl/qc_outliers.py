@@ -0,0 +1,126 @@
+from typing import Callable, List, Optional
+import numpy as np
+import pandas as pd
+from qc_rules import ISSUE_COLUMNS
+
+# Phát hiện giá trị ngoại lai bằng thống kê bền vững cho qc_checks (bổ sung cho dải cố định GROWTH_LIMITS):
+#   issues = find_outliers(df, table_of)      # cùng cột với qc_rules.ISSUE_COLUMNS
+# - Mỗi cột trong OUTLIER_FIELDS được đưa về thang log có dấu: sign(x) * log10(1 + |x|), để sai đơn vị
+#   (VND / nghìn / triệu VND) và mất dấu đều thành khoảng cách lớn.
+# - Bốn phép kiểm tra, mỗi phép là một lượt groupby().transform trên cả panel (mọi cột cùng lúc):
+#     UNIT_SCALE        |x| lệch >= 10^MAGNITUDE_MIN lần trung vị |x| của chính doanh nghiệp
+#     JUMP              |log10(x_t / x_{t-1})| >= LOG_JUMP_LIMIT giữa hai năm liền nhau
+#     OUTLIER_FIRM      robust z (median/MAD) trong chuỗi năm của doanh nghiệp >= ROBUST_Z_LIMIT
+#     OUTLIER_INDUSTRY  robust z trong cùng ngành (dim_firm.industry_l2_id) và cùng năm >= ROBUST_Z_LIMIT
+# - Mỗi ô chỉ báo một issue, theo thứ tự ưu tiên trên (chẩn đoán cụ thể nhất trước).
+# - Cần cả panel (trung vị ngành): qc_checks chỉ chạy bước này khi kiểm tra toàn bộ.
+
+# Level / sign-stable fields only: income and cash-flow totals change sign legitimately from year to year
+OUTLIER_FIELDS = [
+    'net_sales', 'total_assets', 'total_equity', 'total_liabilities', 'cash_and_equivalents', 'current_assets',
+    'current_liabilities', 'long_term_debt', 'inventory', 'net_ppe', 'intangible_assets_net',
+    'selling_expenses', 'general_admin_expenses', 'production_cost', 'capex', 'dividend_cash_paid',
+    'market_value_equity', 'shares_outstanding', 'share_price', 'employees_count',
+]
+ROBUST_Z_LIMIT = 5.0
+LOG_JUMP_LIMIT = 2.0     # x100 from one year to the next
+MAGNITUDE_MIN = 3        # 10^3: the smallest unit slip (VND vs thousand VND)
+MIN_GROUP_SIZE = 5       # industry-year peers needed for a median/MAD
+MIN_FIRM_YEARS = 4       # years of the firm needed for its own median/MAD
+MAD_SCALE = 0.6745       # robust z = 0.6745 * (x - median) / MAD
+MIN_LOG_MAD = 0.1        # MAD floor on the log10 scale: a short, steady series must not turn +-30% into z > 5
+
+MESSAGES = {
+    "UNIT_SCALE": "Giá trị {value} lệch khoảng 10^{k} lần so với trung vị của doanh nghiệp ({median:,.0f}) - nghi sai đơn vị",
+    "JUMP": "Giá trị thay đổi đột biến so với năm trước ({prev} -> {value}, gấp {ratio:.3g} lần)",
+    "OUTLIER_FIRM": "Giá trị {value} bất thường so với chuỗi năm của doanh nghiệp (robust z = {z:.1f})",
+    "OUTLIER_INDUSTRY": "Giá trị {value} bất thường so với cùng ngành cùng năm (robust z = {z:.1f}, trung vị ngành {median:,.0f})",
+}
+PRIORITY = ["UNIT_SCALE", "JUMP", "OUTLIER_FIRM", "OUTLIER_INDUSTRY"]
+
+def signed_log(x: pd.DataFrame) -> pd.DataFrame:
+    return np.sign(x) * np.log10(1 + x.abs())
+
+def robust_z(s: pd.DataFrame, keys: List[pd.Series], min_size: int):
+    """(z, median in original units) of every cell within its group; NaN where the group is too small."""
+    g = s.groupby(keys, sort=False, dropna=True)
+    med = g.transform("median")
+    mad = (s - med).abs().groupby(keys, sort=False, dropna=True).transform("median")
+    ok = g.transform("count") >= min_size
+    z = (MAD_SCALE * (s - med) / mad.clip(lower=MIN_LOG_MAD)).where(ok)
+    return z, np.sign(med) * (10 ** med.abs() - 1)
+
+def find_outliers(df: pd.DataFrame, table_of: Callable[[List[str]], Optional[str]],
+                  fields: Optional[List[str]] = None) -> pd.DataFrame:
+    d = df.sort_values(by=['ticker', 'fiscal_year']).reset_index(drop=True)
+    fields = [c for c in (OUTLIER_FIELDS if fields is None else fields) if c in d.columns]
+    if d.empty or not fields:
+        return pd.DataFrame(columns=ISSUE_COLUMNS)
+    x = d[fields].apply(pd.to_numeric, errors="coerce").astype("float64")
+    s = signed_log(x).where(x != 0)  # 0 is "none this year" (no debt, no dividend), not a scale error
+    ticker = d['ticker']
+    year = pd.to_numeric(d['fiscal_year'], errors="coerce")
+
+    # --- Theo doanh nghiệp: trung vị |x| và robust z trong chuỗi năm ---
+    a = x.abs().where(x != 0)
+    firm_med = a.groupby(ticker, sort=False).transform("median")
+    firm_n = a.groupby(ticker, sort=False).transform("count")
+    with np.errstate(divide="ignore", invalid="ignore"):
+        k = np.round(np.log10(a / firm_med))
+    unit = (k.abs() >= MAGNITUDE_MIN) & (firm_n >= MIN_FIRM_YEARS)
+    firm_z, _ = robust_z(s, [ticker], MIN_FIRM_YEARS)
+
+    # --- Năm liền trước của cùng doanh nghiệp (panel đã sắp theo ticker, năm) ---
+    consecutive = (ticker.eq(ticker.shift(1)) & year.eq(year.shift(1) + 1)).to_numpy()[:, None]
+    prev = x.shift(1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        ratio = a / prev.abs().where(prev != 0)
+    jump = (np.log10(ratio).abs() >= LOG_JUMP_LIMIT) & consecutive
+
+    # --- Cùng ngành, cùng năm ---
+    if 'industry_l2_id' in d.columns:
+        ind_z, ind_med = robust_z(s, [d['industry_l2_id'], d['fiscal_year']], MIN_GROUP_SIZE)
+    else:
+        ind_z, ind_med = pd.DataFrame(np.nan, index=s.index, columns=fields), None
+
+    flags = {
+        "UNIT_SCALE": unit.to_numpy(),
+        "JUMP": jump.to_numpy(),
+        "OUTLIER_FIRM": (firm_z.abs() >= ROBUST_Z_LIMIT).to_numpy(),
+        "OUTLIER_INDUSTRY": (ind_z.abs() >= ROBUST_Z_LIMIT).to_numpy(),
+    }
+    tables = {c: table_of([c]) for c in fields}
+    taken = np.zeros(x.shape, dtype=bool)
+    frames = []
+    for error_type in PRIORITY:
+        cells = flags[error_type] & ~taken
+        taken |= cells
+        rows, cols = np.nonzero(cells)
+        if not len(rows):
+            continue
+        values = [d[fields[c]].iat[r] for r, c in zip(rows, cols)]
+        if error_type == "UNIT_SCALE":
+            messages = [MESSAGES[error_type].format(value=v, k=int(k.iat[r, c]), median=firm_med.iat[r, c])
+                        for v, r, c in zip(values, rows, cols)]
+        elif error_type == "JUMP":
+            messages = [MESSAGES[error_type].format(value=v, prev=d[fields[c]].iat[r - 1], ratio=ratio.iat[r, c])
+                        for v, r, c in zip(values, rows, cols)]
+        elif error_type == "OUTLIER_FIRM":
+            messages = [MESSAGES[error_type].format(value=v, z=firm_z.iat[r, c]) for v, r, c in zip(values, rows, cols)]
+        else:
+            messages = [MESSAGES[error_type].format(value=v, z=ind_z.iat[r, c], median=ind_med.iat[r, c])
+                        for v, r, c in zip(values, rows, cols)]
+        frames.append(pd.DataFrame({
+            'ticker': ticker.iloc[rows].tolist(),
+            'fiscal_year': d['fiscal_year'].iloc[rows].tolist(),
+            'table_name': [tables[fields[c]] for c in cols],
+            'column_name': [fields[c] for c in cols],
+            'error_type': error_type,
+            'message': messages,
+            'old_value': values,
+            '_pos': rows, '_col': cols,
+        }))
+    if not frames:
+        return pd.DataFrame(columns=ISSUE_COLUMNS)
+    out = pd.concat(frames, ignore_index=True).sort_values(['_pos', '_col'], kind="stable")
+    return out[ISSUE_COLUMNS].reset_index(drop=True).astype(object)
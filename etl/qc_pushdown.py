@@ -0,0 +1,151 @@
+from typing import Any, Dict, List, Optional
+import numpy as np
+import pandas as pd
+from qc_rules import RULES, evaluate_rules, issue_year
+
+# QC đẩy xuống DB (qc_checks --pushdown): mỗi luật trong qc_rules.RULES được dịch thành một vị từ SQL
+# (luật theo chuỗi năm dùng LAG), DB chỉ trả về các dòng vi phạm:
+#   sql = violations_sql(PANEL_SQL)           # PANEL_SQL: câu SELECT của panel (view + founded_year, ...)
+#   rows = pd.read_sql(sql, engine)           # dòng vi phạm + dòng liền trước của vi phạm theo chuỗi năm
+#   issues = issues_from_violations(rows, table_of)
+# - Message được dựng bằng đúng các evaluator của qc_rules trên tập dòng nhỏ này, nên báo cáo giống hệt
+#   bản pandas (cùng thứ tự, cùng nội dung); chỉ giữ issue của dòng mà SQL đã gắn cờ.
+# - Cần MySQL 8 (window functions, REGEXP_REPLACE). Lượng dữ liệu kéo về tỉ lệ với số lỗi, không với panel.
+
+def lit(v: Any) -> str:
+    return "'" + str(v).replace("'", "''") + "'" if isinstance(v, str) else repr(v)
+
+def ws_trim(expr: str) -> str:
+    """str.strip(): leading/trailing whitespace of any kind, not only spaces."""
+    return f"REGEXP_REPLACE({expr}, '^[[:space:]]+|[[:space:]]+$', '')"
+
+def label_empty_sql(label: str) -> str:
+    """
+    qc_rules.label_is_empty on the lower-cased note `_n`: the last '|' part holding the label, with the label,
+    'nan' and 'none' removed and trimmed, is empty (or no part holds the label) -> 1.
+    """
+    lab, after = lit(label), f"SUBSTRING_INDEX(_n, {lit(label)}, -1)"
+    before = f"SUBSTRING(_n, 1, CHAR_LENGTH(_n) - CHAR_LENGTH({after}) - {len(label)})"
+    part = f"CONCAT(SUBSTRING_INDEX({before}, '|', -1), {lab}, SUBSTRING_INDEX({after}, '|', 1))"
+    content = ws_trim(f"REPLACE(REPLACE(REPLACE({part}, {lab}, ''), 'nan', ''), 'none', '')")
+    return f"CASE WHEN LOCATE({lab}, _n) = 0 THEN 1 WHEN CHAR_LENGTH({content}) = 0 THEN 1 ELSE 0 END"
+
+def label_column(label: str) -> str:
+    return "_empty_" + "".join(ch if ch.isalnum() else "_" for ch in label).strip("_")
+
+# --- Vị từ cho từng kind: rule -> list (sub, điều kiện SQL) ---
+def pred_age(rule):
+    age, founded = rule["column"], rule["founded"]
+    return [(0, f"{age} IS NOT NULL AND {founded} IS NOT NULL AND ticker IS NOT NULL "
+                f"AND (fiscal_year < {founded} OR {age} <> fiscal_year - {founded})")]
+
+def pred_lag_progression(rule):
+    col = rule["column"]
+    return [(0, f"_prev_year IS NOT NULL AND fiscal_year = _prev_year + 1 AND {col} IS NOT NULL "
+                f"AND _prev_{col} IS NOT NULL AND {col} <> _prev_{col} + {lit(rule['step'])}")]
+
+def pred_time_gap(rule):
+    return [(0, "_prev_year IS NOT NULL AND fiscal_year > _prev_year + 1")]
+
+def pred_range(rule):
+    return [(sub, f"({col} < {lit(rule['min'])} OR {col} > {lit(rule['max'])})")
+            for sub, col in enumerate(rule["columns"])]
+
+SIGN_SQL = {"positive": "<= 0", "non_negative": "< 0", "non_positive": "> 0"}
+
+def pred_sign(rule):
+    return [(sub, f"{col} {SIGN_SQL[rule['sign']]}") for sub, col in enumerate(rule["columns"])]
+
+def pred_identity(rule):
+    total = rule["total"]
+    calc = (" * " if rule["op"] == "product" else " + ").join(rule["parts"])
+    # Same as the pandas mask: |calc - total| / total (signed total, total == 0 never flagged)
+    return [(0, f"{total} <> 0 AND ABS(({calc}) - {total}) / {total} > {lit(rule['tolerance'])}")]
+
+def pred_component(rule):
+    return [(0, f"({' + '.join(rule['parts'])}) > {rule['total']}")]
+
+def pred_dummy(rule):
+    domain = ", ".join(lit(v) for v in rule["domain"])
+    return [(sub, f"({col} IS NULL OR {col} NOT IN ({domain}))") for sub, col in enumerate(rule["columns"])]
+
+def pred_evidence(rule):
+    empty = label_column(rule["label"])
+    return [(0, f"{rule['flag']} = {lit(rule['when'])} AND {empty} = {1 if rule['when'] == 1 else 0}")]
+
+PREDICATES = {
+    "age": pred_age,
+    "lag_progression": pred_lag_progression,
+    "time_gap": pred_time_gap,
+    "range": pred_range,
+    "sign": pred_sign,
+    "identity": pred_identity,
+    "component": pred_component,
+    "dummy": pred_dummy,
+    "evidence": pred_evidence,
+}
+SEQUENCE_KINDS = ("lag_progression", "time_gap")  # compare with the previous row of the same ticker
+
+def flag(cond: str) -> str:
+    return f"CASE WHEN {cond} THEN 1 ELSE 0 END"
+
+def sequence_flags(rules: List[Dict[str, Any]]) -> Dict[str, str]:
+    """error_type -> flag column of each rule that looks at the previous row."""
+    return {r["error_type"]: f"_seq_{n}" for n, r in enumerate(rules) if r["kind"] in SEQUENCE_KINDS}
+
+def violations_sql(panel_sql: str, rules: Optional[List[Dict[str, Any]]] = None) -> str:
+    """
+    One SELECT returning the panel rows that break at least one rule (_hit = 1), plus the previous row of each
+    row flagged by a sequence rule (evaluator context). Flag columns start with '_'.
+    """
+    rules = RULES if rules is None else rules
+    lags = sorted({r["column"] for r in rules if r["kind"] == "lag_progression"})
+    labels = sorted({r["label"] for r in rules if r["kind"] == "evidence"})
+    seq = sequence_flags(rules)
+    conds, seq_cols = [], []
+    for n, rule in enumerate(rules):
+        for _, cond in PREDICATES[rule["kind"]](rule):
+            conds.append(f"({cond})")
+            if rule["kind"] in SEQUENCE_KINDS:
+                seq_cols.append(f"{flag(cond)} AS {seq[rule['error_type']]}")
+    window = "OVER (PARTITION BY ticker ORDER BY fiscal_year)"
+    any_seq = " + ".join(seq.values()) or "0"
+    return f"""
+WITH p AS (
+{panel_sql}
+),
+n AS (
+    SELECT p.*, LOWER(COALESCE({ws_trim('evidence_note')}, '')) AS _n FROM p
+),
+s AS (
+    SELECT n.*, LAG(fiscal_year) {window} AS _prev_year
+           {''.join(f', LAG({c}) {window} AS _prev_{c}' for c in lags)}
+           {''.join(f', {label_empty_sql(lab)} AS {label_column(lab)}' for lab in labels)}
+    FROM n
+),
+f AS (
+    SELECT s.*{''.join(', ' + c for c in seq_cols)},
+           {flag(' OR '.join(conds) or '1 = 0')} AS _hit
+    FROM s
+),
+x AS (
+    SELECT f.*, LEAD({any_seq}) {window} AS _next_seq FROM f
+)
+SELECT * FROM x WHERE _hit = 1 OR _next_seq > 0
+ORDER BY ticker, fiscal_year"""
+
+def issues_from_violations(rows: pd.DataFrame, table_of, rules: Optional[List[Dict[str, Any]]] = None) -> pd.DataFrame:
+    """Issues of the violating rows, built by the pandas evaluators; context rows and spurious neighbours dropped."""
+    rules = RULES if rules is None else rules
+    panel = rows[[c for c in rows.columns if not c.startswith("_")]]
+    issues = evaluate_rules(panel, table_of, rules)
+    if issues.empty:
+        return issues
+    hit = rows.assign(_key=list(zip(rows["ticker"], rows["fiscal_year"].astype(int)))).set_index("_key")
+    keys = [(t, issue_year(y)) for t, y in zip(issues["ticker"], issues["fiscal_year"])]
+    seq = sequence_flags(rules)
+    keep = []
+    for key, error_type in zip(keys, issues["error_type"]):
+        col = seq.get(error_type, "_hit")
+        keep.append(key in hit.index and bool(hit.at[key, col] == 1))
+    return issues[np.array(keep, dtype=bool)].reset_index(drop=True)
@@ -0,0 +1,314 @@
+from typing import Any, Callable, Dict, List, Optional
+import numpy as np
+import pandas as pd
+
+# Bộ luật QC khai báo (RULES) + bộ đánh giá theo cột cho qc_checks.run_qc_checks:
+#   issues = evaluate_rules(df, table_of)      # table_of(["col", ...]) -> tên bảng FACT
+# - Mỗi luật là một dict: kind (age, lag_progression, time_gap, range, sign, identity, component,
+#   dummy, evidence), các cột liên quan, error_type và mẫu message (str.format).
+# - Mỗi luật được tính một lần trên cả cột (mặt nạ boolean); luật theo năm dùng dòng liền trước của
+#   cùng ticker (panel đã sắp theo ticker, fiscal_year). Chỉ các dòng bị gắn cờ mới được dựng message.
+# - Thứ tự dòng kết quả giống bản vòng lặp cũ: các luật scope="firm" trước (theo dòng), rồi luật
+#   scope="row" theo dòng, trong mỗi dòng theo thứ tự RULES và thứ tự cột trong luật.
+# - Khác bản cũ có chủ ý: AGE_LOGIC_ERROR / PROGRESSION_ERROR bỏ qua dòng có firm_age hoặc
+#   founded_year NULL (bản cũ so sánh với NaN nên báo lỗi giả "Tính toán: None").
+
+GROWTH_LIMITS = (-0.95, 5.0)
+MARKET_CAP_TOLERANCE = 0.05  # Cho phép sai số 5%
+
+OWN_FIELDS = ['managerial_inside_own', 'state_own', 'institutional_own', 'foreign_own']
+NON_NEGATIVE_FIELDS = [
+    'net_sales', 'total_assets', 'intangible_assets_net', 'total_liabilities', 'cash_and_equivalents',
+    'long_term_debt', 'current_assets', 'current_liabilities', 'inventory', 'net_ppe', 'wip_goods_purchase',
+    'merchandise_purchase_year', 'firm_age', 'employees_count',
+]
+NON_POSITIVE_FIELDS = [
+    'selling_expenses', 'general_admin_expenses', 'manufacturing_overhead', 'raw_material_consumption',
+    'outside_manufacturing_expenses', 'production_cost', 'rnd_expenses', 'capex', 'dividend_cash_paid',
+]
+
+RULES: List[Dict[str, Any]] = [
+    # --- Theo chuỗi năm của từng doanh nghiệp ---
+    {"kind": "age", "scope": "firm", "column": "firm_age", "founded": "founded_year",
+     "error_type": "AGE_LOGIC_ERROR", "message": "Không khớp năm thành lập. Có: {value}, Tính toán: {expected}"},
+    {"kind": "lag_progression", "scope": "firm", "column": "firm_age", "step": 1,
+     "error_type": "PROGRESSION_ERROR", "message": "Tuổi không tăng tiến đều (Năm trước: {prev}, Năm nay: {value})"},
+    {"kind": "time_gap", "scope": "firm", "column": "fiscal_year",
+     "error_type": "TIME_GAP", "message": "Dữ liệu bị đứt quãng thời gian"},
+    # --- Theo từng dòng ---
+    {"kind": "range", "columns": OWN_FIELDS, "min": 0, "max": 1,
+     "error_type": "RANGE_ERROR", "message": "Giá trị {value} nằm ngoài khoảng [0,1]"},
+    {"kind": "sign", "columns": ['shares_outstanding'], "sign": "positive",
+     "error_type": "INVALID_VALUE", "message": "Số lượng cổ phiếu phải lớn hơn 0"},
+    {"kind": "sign", "columns": NON_NEGATIVE_FIELDS, "sign": "non_negative",
+     "error_type": "NEGATIVE_VALUE", "message": "Giá trị {field} không được âm"},
+    {"kind": "sign", "columns": NON_POSITIVE_FIELDS, "sign": "non_positive",
+     "error_type": "POSITIVE_VALUE", "message": "Giá trị {field} không được dương"},
+    {"kind": "range", "columns": ['growth_ratio'], "min": GROWTH_LIMITS[0], "max": GROWTH_LIMITS[1],
+     "error_type": "OUTLIER", "message": "Tỷ lệ tăng trưởng {value} bất thường"},
+    {"kind": "identity", "total": "market_value_equity", "parts": ['shares_outstanding', 'share_price'],
+     "op": "product", "tolerance": MARKET_CAP_TOLERANCE,
+     "error_type": "INCONSISTENT", "message": "Sai lệch vốn hóa ({diff:.2%}) so với tính toán"},
+    {"kind": "identity", "total": "total_assets", "parts": ['total_liabilities', 'total_equity'],
+     "op": "sum", "tolerance": MARKET_CAP_TOLERANCE,
+     "error_type": "ACCOUNTING_IMBALANCE", "message": "Bảng cân đối không khớp. Chênh lệch: {abs_diff:,.0f} ({diff:.2%})"},
+    {"kind": "component", "parts": ['current_assets'], "total": "total_assets",
+     "error_type": "COMPONENT_ERROR", "message": "Tài sản ngắn hạn vượt quá tổng tài sản"},
+    {"kind": "component", "parts": ['cash_and_equivalents', 'inventory'], "total": "current_assets",
+     "error_type": "COMPONENT_ERROR", "message": "Tổng tiền mặt và hàng tồn kho vượt quá tài sản ngắn hạn"},
+    {"kind": "component", "parts": ['net_ppe', 'intangible_assets_net'], "total": "total_assets",
+     "error_type": "COMPONENT_ERROR", "message": "Tổng PPE và tài sản vô hình vượt quá tổng tài sản"},
+    {"kind": "component", "parts": ['long_term_debt', 'current_liabilities'], "total": "total_liabilities",
+     "error_type": "COMPONENT_ERROR", "message": "Nợ dài hạn và nợ ngắn hạn vượt quá tổng nợ"},
+    {"kind": "component", "parts": ['net_income'], "total": "net_sales",
+     "error_type": "COMPONENT_ERROR", "message": "Lợi nhuận ròng vượt quá doanh thu"},
+    {"kind": "dummy", "columns": ['product_innovation', 'process_innovation'], "domain": [0, 1],
+     "missing_type": "MISSING_VALUE", "missing_message": "Biến {field} đang bị để trống (NULL). Chỉ chấp nhận 0 hoặc 1.",
+     "error_type": "INVALID_DUMMY", "message": "Giá trị {field} không hợp lệ (hiện tại là {value}). Chỉ chấp nhận 0 hoặc 1."},
+    {"kind": "evidence", "flag": "product_innovation", "label": "product:", "when": 1,
+     "error_type": "MISSING_PRODUCT_NOTE",
+     "message": 'Đổi mới SP (1) nhưng ghi chú "product:" trống hoặc nan. (Gốc: "{note}")'},
+    {"kind": "evidence", "flag": "product_innovation", "label": "product:", "when": 0,
+     "error_type": "UNEXPECTED_PRODUCT_NOTE",
+     "message": 'Không đổi mới SP (0) nhưng "product:" lại có thuyết minh. (Gốc: "{note}")'},
+    {"kind": "evidence", "flag": "process_innovation", "label": "process:", "when": 1,
+     "error_type": "MISSING_PROCESS_NOTE",
+     "message": 'Đổi mới QT (1) nhưng ghi chú "process:" trống hoặc nan. (Gốc: "{note}")'},
+    {"kind": "evidence", "flag": "process_innovation", "label": "process:", "when": 0,
+     "error_type": "UNEXPECTED_PROCESS_NOTE",
+     "message": 'Không đổi mới QT (0) nhưng "process:" lại có thuyết minh. (Gốc: "{note}")'},
+]
+
+ISSUE_COLUMNS = ['ticker', 'fiscal_year', 'table_name', 'column_name', 'error_type', 'message', 'old_value']
+
+def issue_year(fiscal_year: Any) -> int:
+    """Firm-year an issue belongs to: TIME_GAP issues read "2020-2022" and belong to the later year."""
+    return int(str(fiscal_year).split("-")[-1])
+
+# --- Truy cập cột ---
+def raw(d: pd.DataFrame, col: str) -> pd.Series:
+    """Column as stored (a missing column reads as all NULL, like row.get() in the old loop)."""
+    return d[col] if col in d.columns else pd.Series([None] * len(d), index=d.index, dtype=object)
+
+def num(d: pd.DataFrame, col: str) -> pd.Series:
+    """Column as float64 for masks; NULL / non-numeric -> NaN so every comparison is False."""
+    return pd.to_numeric(raw(d, col), errors="coerce").astype("float64")
+
+def native(d: pd.DataFrame, col: str, idx: np.ndarray) -> List[Any]:
+    """Python scalars (int/float/str) of the flagged rows, as the old loop saw them in each row."""
+    return raw(d, col).iloc[idx].tolist()
+
+class Context:
+    """The sorted panel plus per-run memos (table names, parsed evidence notes)."""
+
+    def __init__(self, df: pd.DataFrame, table_of: Callable[[List[str]], Optional[str]]):
+        self.d = df.sort_values(by=['ticker', 'fiscal_year'])
+        self.table_of = table_of
+        self.tables: Dict[tuple, Optional[str]] = {}
+        self.notes: Optional[pd.Series] = None
+        self.note_empty: Dict[str, np.ndarray] = {}
+        tickers = raw(self.d, 'ticker')
+        # Previous row of the same ticker (the panel is sorted, so tickers are contiguous)
+        self.has_prev = (tickers.notna() & tickers.eq(tickers.shift(1))).to_numpy()
+        self.has_ticker = tickers.notna().to_numpy()
+
+    def table(self, columns: List[str]) -> Optional[str]:
+        key = tuple(columns)
+        if key not in self.tables:
+            self.tables[key] = self.table_of(list(columns))
+        return self.tables[key]
+
+    def issues(self, rule_no: int, sub: int, scope: int, mask: np.ndarray, column_name: str, table_name: Optional[str],
+               error_type: str, messages: List[str], old_values: List[Any],
+               fiscal_years: Optional[List[Any]] = None) -> pd.DataFrame:
+        idx = np.flatnonzero(mask)
+        out = pd.DataFrame({
+            'ticker': native(self.d, 'ticker', idx),
+            'fiscal_year': fiscal_years if fiscal_years is not None else native(self.d, 'fiscal_year', idx),
+            'table_name': [table_name] * len(idx),
+            'column_name': [column_name] * len(idx),
+            'error_type': [error_type] * len(idx),
+            'message': messages,
+            'old_value': pd.Series(old_values, dtype=object),
+        }, columns=ISSUE_COLUMNS).astype(object)
+        out['_scope'], out['_pos'], out['_rule'], out['_sub'] = scope, idx, rule_no, sub
+        return out
+
+# --- Bộ đánh giá cho từng kind: (ctx, rule, rule_no, scope) -> list DataFrame issue ---
+def eval_age(ctx: Context, rule, rule_no, scope):
+    d = ctx.d
+    age, founded, year = num(d, rule["column"]), num(d, rule["founded"]), num(d, 'fiscal_year')
+    valid = age.notna() & founded.notna() & pd.Series(ctx.has_ticker, index=d.index)
+    mask = (valid & ((year < founded) | (age != year - founded))).to_numpy()
+    if not mask.any():
+        return []
+    idx = np.flatnonzero(mask)
+    ages, foundeds, years = native(d, rule["column"], idx), native(d, rule["founded"], idx), native(d, 'fiscal_year', idx)
+    expected = [y - f if y >= f else None for y, f in zip(years, foundeds)]
+    messages = [rule["message"].format(value=a, expected=e) for a, e in zip(ages, expected)]
+    return [ctx.issues(rule_no, 0, scope, mask, rule["column"], ctx.table([rule["column"]]), rule["error_type"],
+                       messages, ages)]
+
+def eval_lag_progression(ctx: Context, rule, rule_no, scope):
+    d, col = ctx.d, rule["column"]
+    v, year = num(d, col).to_numpy(), num(d, 'fiscal_year').to_numpy()
+    prev_v, prev_year = np.roll(v, 1), np.roll(year, 1)
+    with np.errstate(invalid="ignore"):
+        mask = ctx.has_prev & (year == prev_year + 1) & ~np.isnan(v) & ~np.isnan(prev_v) & (v != prev_v + rule["step"])
+    if not mask.any():
+        return []
+    idx = np.flatnonzero(mask)
+    values, prevs = native(d, col, idx), native(d, col, idx - 1)
+    messages = [rule["message"].format(prev=p, value=x) for p, x in zip(prevs, values)]
+    return [ctx.issues(rule_no, 0, scope, mask, col, ctx.table([col]), rule["error_type"], messages, values)]
+
+def eval_time_gap(ctx: Context, rule, rule_no, scope):
+    year = num(ctx.d, 'fiscal_year').to_numpy()
+    with np.errstate(invalid="ignore"):
+        mask = ctx.has_prev & (year > np.roll(year, 1) + 1)
+    if not mask.any():
+        return []
+    idx = np.flatnonzero(mask)
+    years, prevs = native(ctx.d, 'fiscal_year', idx), native(ctx.d, 'fiscal_year', idx - 1)
+    return [ctx.issues(rule_no, 0, scope, mask, rule["column"], None, rule["error_type"], [rule["message"]] * len(idx),
+                       [None] * len(idx), fiscal_years=[f"{p}-{y}" for p, y in zip(prevs, years)])]
+
+def eval_range(ctx: Context, rule, rule_no, scope):
+    out = []
+    for sub, col in enumerate(rule["columns"]):
+        v = num(ctx.d, col)
+        mask = ((v < rule["min"]) | (v > rule["max"])).to_numpy()
+        if mask.any():
+            values = native(ctx.d, col, np.flatnonzero(mask))
+            out.append(ctx.issues(rule_no, sub, scope, mask, col, ctx.table([col]), rule["error_type"],
+                                  [rule["message"].format(value=x, field=col) for x in values], values))
+    return out
+
+SIGN_VIOLATION = {
+    "positive": lambda v: v <= 0,
+    "non_negative": lambda v: v < 0,
+    "non_positive": lambda v: v > 0,
+}
+
+def eval_sign(ctx: Context, rule, rule_no, scope):
+    out = []
+    for sub, col in enumerate(rule["columns"]):
+        mask = SIGN_VIOLATION[rule["sign"]](num(ctx.d, col)).to_numpy()
+        if mask.any():
+            values = native(ctx.d, col, np.flatnonzero(mask))
+            out.append(ctx.issues(rule_no, sub, scope, mask, col, ctx.table([col]), rule["error_type"],
+                                  [rule["message"].format(value=x, field=col) for x in values], values))
+    return out
+
+def eval_identity(ctx: Context, rule, rule_no, scope):
+    """|f(parts) - total| / total > tolerance (total == 0 -> not flagged); parts: product or sum."""
+    d, cols = ctx.d, [rule["total"]] + rule["parts"]
+    total = num(d, rule["total"])
+    parts = [num(d, c) for c in rule["parts"]]
+    calc = parts[0].copy()
+    for p in parts[1:]:
+        calc = calc * p if rule["op"] == "product" else calc + p
+    with np.errstate(divide="ignore", invalid="ignore"):
+        diff = ((calc - total).abs() / total).where(total != 0, 0.0)
+    mask = (diff > rule["tolerance"]).to_numpy()
+    if not mask.any():
+        return []
+    idx = np.flatnonzero(mask)
+    rows = list(zip(*[native(d, c, idx) for c in cols]))
+    messages = []
+    for row in rows:  # recomputed on the Python values so the message text matches the old loop exactly
+        t, ps = row[0], row[1:]
+        c = ps[0]
+        for p in ps[1:]:
+            c = c * p if rule["op"] == "product" else c + p
+        messages.append(rule["message"].format(diff=abs(c - t) / t if t != 0 else 0, abs_diff=abs(t - c)))
+    return [ctx.issues(rule_no, 0, scope, mask, "/".join(cols), ctx.table(cols), rule["error_type"], messages, rows)]
+
+def eval_component(ctx: Context, rule, rule_no, scope):
+    """sum(parts) > total, only when every value is present."""
+    d, cols = ctx.d, rule["parts"] + [rule["total"]]
+    parts_sum = sum(num(d, c) for c in rule["parts"])
+    mask = (parts_sum > num(d, rule["total"])).to_numpy()
+    if not mask.any():
+        return []
+    idx = np.flatnonzero(mask)
+    rows = list(zip(*[native(d, c, idx) for c in cols]))
+    return [ctx.issues(rule_no, 0, scope, mask, "/".join(cols), ctx.table(cols), rule["error_type"],
+                       [rule["message"]] * len(idx), rows)]
+
+def eval_dummy(ctx: Context, rule, rule_no, scope):
+    out = []
+    for sub, col in enumerate(rule["columns"]):
+        v = raw(ctx.d, col)
+        missing = v.isna().to_numpy()
+        invalid = (~v.isna() & ~v.isin(rule["domain"])).to_numpy()
+        if missing.any():
+            n = int(missing.sum())
+            out.append(ctx.issues(rule_no, sub, scope, missing, col, ctx.table([col]), rule["missing_type"],
+                                  [rule["missing_message"].format(field=col)] * n, [None] * n))
+        if invalid.any():
+            values = native(ctx.d, col, np.flatnonzero(invalid))
+            out.append(ctx.issues(rule_no, sub, scope, invalid, col, ctx.table([col]), rule["error_type"],
+                                  [rule["message"].format(field=col, value=x) for x in values], values))
+    return out
+
+def evidence_notes(d: pd.DataFrame) -> pd.Series:
+    """evidence_note as the old loop printed it: stripped text, "" for None/empty, "nan" for NaN."""
+    note = raw(d, 'evidence_note').astype(object)
+    truthy = note.map(bool, na_action=None)
+    return note.astype(str).str.strip().where(truthy, "")
+
+def label_is_empty(notes: pd.Series, label: str) -> np.ndarray:
+    """True when the last '|' part holding `label` has no text left (after dropping 'nan'/'none'), or no part has it."""
+    codes, uniques = pd.factorize(notes)  # notes repeat a lot: parse each distinct text once
+    uniques = pd.Series(uniques, dtype=object)
+    parts = uniques.str.lower().str.split('|').explode()
+    has = parts.str.contains(label, regex=False)
+    content = (parts[has].str.replace(label, '', regex=False).str.replace('nan', '', regex=False)
+               .str.replace('none', '', regex=False).str.strip())
+    last = content.groupby(level=0).last()
+    empty = np.ones(len(uniques), dtype=bool)
+    empty[last.index.to_numpy()] = last.eq("").to_numpy()
+    return empty[codes]
+
+def eval_evidence(ctx: Context, rule, rule_no, scope):
+    d = ctx.d
+    if ctx.notes is None:  # parsed once for all evidence rules
+        ctx.notes = evidence_notes(d.reset_index(drop=True))
+    if rule["label"] not in ctx.note_empty:
+        ctx.note_empty[rule["label"]] = label_is_empty(ctx.notes, rule["label"])
+    notes, empty = ctx.notes, ctx.note_empty[rule["label"]]
+    flag = raw(d, rule["flag"]).eq(rule["when"]).to_numpy()
+    mask = flag & (empty if rule["when"] == 1 else ~empty)
+    if not mask.any():
+        return []
+    idx = np.flatnonzero(mask)
+    values = notes.iloc[idx].tolist()
+    return [ctx.issues(rule_no, 0, scope, mask, 'evidence_note', ctx.table(['evidence_note']), rule["error_type"],
+                       [rule["message"].format(note=n) for n in values], values)]
+
+EVALUATORS = {
+    "age": eval_age,
+    "lag_progression": eval_lag_progression,
+    "time_gap": eval_time_gap,
+    "range": eval_range,
+    "sign": eval_sign,
+    "identity": eval_identity,
+    "component": eval_component,
+    "dummy": eval_dummy,
+    "evidence": eval_evidence,
+}
+
+def evaluate_rules(df: pd.DataFrame, table_of: Callable[[List[str]], Optional[str]],
+                   rules: Optional[List[Dict[str, Any]]] = None) -> pd.DataFrame:
+    """All issues of the panel as one frame (ISSUE_COLUMNS), in the order of the old row-by-row loop."""
+    ctx = Context(df, table_of)
+    frames = []
+    for rule_no, rule in enumerate(RULES if rules is None else rules):
+        scope = 0 if rule.get("scope") == "firm" else 1
+        frames.extend(EVALUATORS[rule["kind"]](ctx, rule, rule_no, scope))
+    if not frames:
+        return pd.DataFrame(columns=ISSUE_COLUMNS)
+    out = pd.concat(frames, ignore_index=True)
+    out = out.sort_values(['_scope', '_pos', '_rule', '_sub'], kind="stable")
+    return out[ISSUE_COLUMNS].reset_index(drop=True)
@@ -1,8 +1,16 @@
+import argparse
 import pandas as pd
 from sqlalchemy import text
 from datetime import datetime
 import os
 from database_setup import engine
+from dim_keys import KEYS
+import qc_issues
+from panel_latest import mark_dirty, refresh_stage
+from run_ledger import run_ledger
+from schema_catalog import load_catalog
+from sql_batch import insert_many
+from workbook_patch import WorkbookPatcher, patch_workbook
 
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 DATA_DIR = os.path.join(BASE_DIR, "data")
@@ -87,36 +95,41 @@ def smart_parse_value(column_name, val):
         # Nếu không thể ép kiểu (ví dụ nhập chữ "abc" vào cột sales), trả về chuỗi gốc
         return val_str
 
-def apply_quick_fix(engine, ticker, fiscal_year, table_name, column_name, raw_value, reason, user_name="Group_Member"):
+def apply_quick_fix(engine, ticker, fiscal_year, table_name, column_name, raw_value, reason, user_name="Group_Member",
+                    issue_id=None):
+    # Tên bảng/cột được ghép thẳng vào SQL: chỉ chấp nhận cặp có thật trong schema
+    problem = load_catalog(engine).check(table_name, column_name)
+    if problem:
+        print(f"❌ Bỏ qua {ticker} - {fiscal_year}: {problem}")
+        return False
     try:
         with engine.begin() as conn:
             # --- BƯỚC 1: LẤY THÔNG TIN CƠ BẢN ---
-            res_firm = conn.execute(text("SELECT firm_id FROM dim_firm WHERE ticker = :t"), {"t": ticker}).fetchone()
-            if not res_firm:
+            firm_id = KEYS.firm_id(conn, ticker)  # đã nạp sẵn theo lô trong main()
+            if firm_id is None:
                 print(f"❌ Không tìm thấy mã {ticker}")
-                return
-            firm_id = res_firm[0]
+                return False
 
             query_old = text(f"SELECT {column_name}, snapshot_id FROM {table_name} "
                              f"WHERE firm_id = :fid AND fiscal_year = :fy "
-                             f"ORDER BY snapshot_id DESC LIMIT 1")
+                             f"ORDER BY snapshot_date DESC, snapshot_id DESC LIMIT 1")
             res_old = conn.execute(query_old, {"fid": firm_id, "fy": fiscal_year}).fetchone()
             
             if not res_old:
                 print(f"❌ Không tìm thấy dữ liệu cho {ticker} năm {fiscal_year} trong bảng {table_name}")
-                return
+                return False
             
             old_value, latest_snap_id = res_old[0], res_old[1]
 
-            # --- BƯỚC 2: XỬ LÝ EXCEL TRƯỚC ĐỂ LẤY DTYPE ---
+            # --- BƯỚC 2: CẬP NHẬT DATABASE RỒI GHI Ô TƯƠNG ỨNG TRONG EXCEL ---
             if os.path.exists(EXCEL_PATH):
-                df_excel = pd.read_excel(EXCEL_PATH, sheet_name=SHEET_NAME)
                 final_value = smart_parse_value(column_name, raw_value)
 
                 # Cập nhật Database với giá trị đã ép kiểu
                 update_sql = text(f"UPDATE {table_name} SET {column_name} = :val "
                                   f"WHERE firm_id = :fid AND fiscal_year = :fy AND snapshot_id = :sid")
                 conn.execute(update_sql, {"val": final_value, "fid": firm_id, "fy": fiscal_year, "sid": latest_snap_id})
+                mark_dirty(conn, table_name, [(firm_id, fiscal_year)])  # panel_latest làm mới firm-year này
 
                 # Ghi Log
                 log_sql = text("""
@@ -129,39 +142,39 @@ def apply_quick_fix(engine, ticker, fiscal_year, table_name, column_name, raw_va
                     "old": str(old_value), "new": str(final_value), "re": reason, 
                     "user": user_name, "now": datetime.now()
                 })
+                if issue_id is not None:  # cùng giao dịch với UPDATE: issue chỉ "fixed" khi giá trị đã được ghi
+                    qc_issues.mark_fixed(conn, [issue_id])
                 print(f"✅ Đã cập nhật Database và ghi log cho {ticker} - {fiscal_year}")
                 
-                if column_name not in df_excel.columns:
-                    print(f"➕ Cột '{column_name}' chưa tồn tại trong Excel. Đang tự động tạo mới...")
-                    df_excel[column_name] = pd.NA  
-                    df_excel[column_name] = df_excel[column_name].astype(object) 
-                # Cập nhật Excel
-                mask = (df_excel['ticker'].astype(str).str.strip().str.upper() == str(ticker).strip().upper()) & \
-                       (df_excel['fiscal_year'].astype(float).astype(int) == int(fiscal_year))
-                
-                if mask.any():
-                    df_excel[column_name] = df_excel[column_name].astype(object)
-                    df_excel.loc[mask, column_name] = final_value
-                    df_excel.to_excel(EXCEL_PATH, sheet_name=SHEET_NAME, index=False)
+                # Cập nhật Excel: chỉ ô (ticker, năm, cột), các sheet khác giữ nguyên
+                with WorkbookPatcher(EXCEL_PATH, SHEET_NAME) as wb:
+                    found = wb.set(ticker, fiscal_year, column_name, final_value)
+                if found:
                     print(f"✅ Đã đồng bộ số liệu ({final_value}) vào file Excel.")
                 else:
                     print(f"⚠️ Cảnh báo: Không tìm thấy dòng tương ứng trong Excel.")
+                return True
             else:
                 print(f"⚠️ Cảnh báo: File Excel gốc không tồn tại.")
+                return False
 
     except Exception as e:
         print(f"❌ Lỗi: {e}")
+        return False
 
-def main():
-    # Đọc CSV chứa các dòng cần sửa
-    df_fixes = pd.read_csv(CSV_PATH)
+# --- CHẾ ĐỘ THEO LÔ: một giao dịch, UPDATE qua bảng tạm, một lần ghi log, một lần ghi Excel ---
+FIX_TEMP_TABLE = "tmp_quick_fix"
+BATCH_SIZE = 1000
 
+def valid_fixes(df_fixes):
+    """Các dòng sửa hợp lệ (bảng, một cột, một năm, có new_value) dưới dạng dict; in lý do bỏ qua từng dòng."""
+    fixes = []
     for index, row in df_fixes.iterrows():
         ticker = str(row['ticker']).strip()
-        
+
         # --- 1. KIỂM TRA TÊN BẢNG (Chặn lỗi .nan) ---
         table_name = str(row['table_name']).strip()
-        if table_name.lower() == 'nan' or not table_name:
+        if table_name.lower() in ('nan', 'none') or not table_name:
             print(f"Bỏ qua dòng {index} [{ticker}]: table_name bị trống (NaN)")
             continue
 
@@ -171,7 +184,7 @@ def main():
         if any(char in column_name for char in ['/', ',', ';', ' ']):
             print(f"Bỏ qua dòng {index} [{ticker}]: column_name chứa nhiều hơn 1 cột ('{column_name}')")
             continue
-        
+
         if column_name.lower() == 'nan' or not column_name:
             print(f"Bỏ qua dòng {index} [{ticker}]: column_name bị trống")
             continue
@@ -190,8 +203,182 @@ def main():
             print(f"Bỏ qua dòng {index} [{ticker}]: Không có giá trị mới để cập nhật.")
             continue
 
-        # --- NẾU VƯỢT QUA TẤT CẢ CÁC BƯỚC TRÊN -> CHẠY FIX ---
-        apply_quick_fix(engine, ticker, fiscal_year, table_name, column_name, new_value, row['message'])
-            
+        fixes.append({
+            "ticker": ticker, "fiscal_year": fiscal_year, "table_name": table_name, "column_name": column_name,
+            "raw_value": new_value, "reason": row['message'],
+            "issue_id": int(row['issue_id']) if 'issue_id' in row.index and pd.notna(row['issue_id']) else None,
+        })
+    return fixes
+
+def fetch_latest(conn, table_name, columns, firm_ids, years):
+    """(firm_id, fiscal_year) -> (snapshot_id, {column: value}) of the row the panel shows, one query per table."""
+    cols = ", ".join(columns)
+    rows = conn.execute(text(f"""
+        SELECT firm_id, fiscal_year, snapshot_id, {cols}
+        FROM (
+            SELECT firm_id, fiscal_year, snapshot_id, {cols},
+                   ROW_NUMBER() OVER (PARTITION BY firm_id, fiscal_year
+                                      ORDER BY snapshot_date DESC, snapshot_id DESC) AS rn
+            FROM {table_name}
+            WHERE firm_id IN ({', '.join(str(int(f)) for f in firm_ids)})
+              AND fiscal_year IN ({', '.join(str(int(y)) for y in years)})
+        ) x
+        WHERE rn = 1""")).fetchall()
+    return {(int(r[0]), int(r[1])): (int(r[2]), dict(zip(columns, r[3:]))) for r in rows}
+
+def apply_quick_fixes(engine, fixes, user_name="Group_Member"):
+    """
+    Áp dụng mọi dòng sửa trong MỘT giao dịch: tra firm_id theo lô, lấy giá trị cũ một câu cho mỗi bảng,
+    UPDATE ... JOIN bảng tạm cho mỗi (bảng, cột), ghi fact_value_override_log bằng INSERT nhiều dòng.
+    Trả về các dòng đã áp dụng (kèm final_value) để đồng bộ Excel một lần.
+    """
+    catalog = load_catalog(engine)
+    cells = {}
+    for f in fixes:
+        # Tên bảng/cột được ghép thẳng vào SQL: chỉ chấp nhận cặp có thật trong schema
+        problem = catalog.check(f["table_name"], f["column_name"])
+        if problem:
+            print(f"❌ Bỏ qua {f['ticker']} - {f['fiscal_year']}: {problem}")
+            continue
+        f = {**f, "final_value": smart_parse_value(f["column_name"], f["raw_value"])}
+        if COLUMN_TYPE_MAP.get(f["column_name"], 'str') != 'str' and isinstance(f["final_value"], str):
+            print(f"❌ Bỏ qua {f['ticker']} - {f['fiscal_year']}: '{f['raw_value']}' không phải số cho cột {f['column_name']}")
+            continue
+        key = (f["table_name"], f["column_name"], f["ticker"].upper(), f["fiscal_year"])
+        if key in cells:
+            print(f"⚠️ {f['ticker']} - {f['fiscal_year']} {f['column_name']}: nhiều dòng sửa cùng ô, dùng dòng sau cùng")
+        cells[key] = f
+    if not cells:
+        return []
+    if not os.path.exists(EXCEL_PATH):
+        print("⚠️ Cảnh báo: File Excel gốc không tồn tại.")
+        return []
+
+    applied = []
+    with engine.begin() as conn:
+        firm_ids = KEYS.firm_ids(conn, [f["ticker"] for f in cells.values()])
+        by_table = {}
+        for f in cells.values():
+            firm_id = firm_ids.get(f["ticker"].upper())
+            if firm_id is None:
+                print(f"❌ Không tìm thấy mã {f['ticker']}")
+                continue
+            by_table.setdefault(f["table_name"], []).append({**f, "firm_id": firm_id})
+
+        for table_name, group in by_table.items():
+            latest = fetch_latest(conn, table_name, sorted({f["column_name"] for f in group}),
+                                  {f["firm_id"] for f in group}, {f["fiscal_year"] for f in group})
+            for f in group:
+                found = latest.get((f["firm_id"], f["fiscal_year"]))
+                if found is None:
+                    print(f"❌ Không tìm thấy dữ liệu cho {f['ticker']} năm {f['fiscal_year']} trong bảng {table_name}")
+                    continue
+                applied.append({**f, "snapshot_id": found[0], "old_value": found[1][f["column_name"]]})
+        if not applied:
+            return []
+
+        conn.execute(text(f"DROP TEMPORARY TABLE IF EXISTS {FIX_TEMP_TABLE}"))
+        conn.execute(text(f"""
+            CREATE TEMPORARY TABLE {FIX_TEMP_TABLE} (
+                table_name VARCHAR(64) NOT NULL, column_name VARCHAR(64) NOT NULL,
+                firm_id BIGINT NOT NULL, fiscal_year SMALLINT NOT NULL, snapshot_id BIGINT NOT NULL,
+                new_value TEXT NULL,
+                PRIMARY KEY (table_name, column_name, firm_id, fiscal_year, snapshot_id)
+            )"""))
+        insert_many(conn, FIX_TEMP_TABLE, ["table_name", "column_name", "firm_id", "fiscal_year", "snapshot_id", "new_value"],
+                    [(f["table_name"], f["column_name"], f["firm_id"], f["fiscal_year"], f["snapshot_id"],
+                      None if f["final_value"] is None else str(f["final_value"])) for f in applied], BATCH_SIZE)
+        for table_name, column_name in sorted({(f["table_name"], f["column_name"]) for f in applied}):
+            conn.execute(text(f"""
+                UPDATE {table_name} t
+                JOIN {FIX_TEMP_TABLE} x
+                  ON x.firm_id = t.firm_id AND x.fiscal_year = t.fiscal_year AND x.snapshot_id = t.snapshot_id
+                 AND x.table_name = :tbl AND x.column_name = :col
+                SET t.{column_name} = x.new_value"""), {"tbl": table_name, "col": column_name})
+        for table_name in sorted({f["table_name"] for f in applied}):  # firm-year cần làm mới trong panel_latest
+            mark_dirty(conn, table_name, [(f["firm_id"], f["fiscal_year"]) for f in applied if f["table_name"] == table_name],
+                       BATCH_SIZE)
+
+        # Ghi Log (một câu cho mỗi BATCH_SIZE dòng)
+        now = datetime.now()
+        insert_many(conn, "fact_value_override_log",
+                    ["firm_id", "fiscal_year", "table_name", "column_name", "old_value", "new_value", "reason",
+                     "changed_by", "changed_at"],
+                    [(f["firm_id"], f["fiscal_year"], f["table_name"], f["column_name"], str(f["old_value"]),
+                      str(f["final_value"]), f["reason"], user_name, now) for f in applied], BATCH_SIZE)
+        issue_ids = [f["issue_id"] for f in applied if f["issue_id"] is not None]
+        if issue_ids:
+            qc_issues.mark_fixed(conn, issue_ids)
+        conn.execute(text(f"DROP TEMPORARY TABLE IF EXISTS {FIX_TEMP_TABLE}"))
+    print(f"✅ Đã cập nhật Database và ghi log cho {len(applied)} ô trong một giao dịch")
+    return applied
+
+def sync_workbook(applied):
+    """Ghi mọi giá trị đã sửa vào sheet master_39: mở workbook một lần, chỉ ghi các ô thay đổi, lưu một lần."""
+    try:
+        written, missing = patch_workbook(EXCEL_PATH, SHEET_NAME, [(f["ticker"], f["fiscal_year"], f["column_name"],
+                                                                     f["final_value"]) for f in applied])
+    except (KeyError, ValueError) as e:  # Database đã được cập nhật; chỉ file Excel chưa đồng bộ
+        print(f"❌ Không ghi được vào file Excel {EXCEL_PATH}: {e}")
+        return 0
+    for ticker, fiscal_year in missing:
+        print(f"⚠️ Cảnh báo: Không tìm thấy dòng tương ứng trong Excel ({ticker} - {fiscal_year}).")
+    if written:
+        print(f"✅ Đã đồng bộ {written} giá trị vào file Excel (một lần lưu, chỉ các ô thay đổi).")
+    return written
+
+def main():
+    global EXCEL_PATH
+    ap = argparse.ArgumentParser(description="Apply reviewed QC fixes (new_value) to the fact tables and the workbook")
+    ap.add_argument("--csv", nargs="?", const=CSV_PATH, default=None,
+                    help=f"read fixes from a QC report CSV (default {CSV_PATH}) instead of the open issues "
+                         f"in {qc_issues.ISSUE_TABLE}")
+    ap.add_argument("--one-by-one", action="store_true",
+                    help="old mode: one transaction and one workbook save per fix")
+    ap.add_argument("--excel", default=EXCEL_PATH, help="workbook to write the fixes back to")
+    args = ap.parse_args()
+    EXCEL_PATH = args.excel
+    with run_ledger("quick_fix", engine.raw_connection, {"csv_path": args.csv, "excel_path": EXCEL_PATH}) as run:
+        # Các issue đang mở đã có new_value (fact_qc_issue), hoặc CSV khi chạy với --csv
+        with run.stage("read_fixes") as st:
+            if args.csv:
+                df_fixes = pd.read_csv(args.csv)
+                st.bytes_read = os.path.getsize(args.csv)
+            else:
+                with engine.connect() as conn:
+                    df_fixes = qc_issues.open_fixes(conn)
+            st.rows_read = len(df_fixes)
+
+        # Tra firm_id cho mọi ticker một lần (một câu IN) thay vì mỗi dòng sửa một câu SELECT
+        with run.stage("resolve_firms") as st:
+            tickers = df_fixes['ticker'].dropna().astype(str).str.strip().unique().tolist()
+            with engine.connect() as conn:
+                st.rows_read, st.rows_written = len(tickers), len(KEYS.firm_ids(conn, tickers))
+
+        with run.stage("validate_fixes") as st:
+            fixes = valid_fixes(df_fixes)
+            st.rows_read, st.rows_written = len(df_fixes), len(fixes)
+            st.rows_skipped = st.rows_read - st.rows_written
+
+        if args.one_by_one:
+            with run.stage("apply_fixes") as st:
+                st.rows_read, st.rows_written = len(fixes), 0
+                for f in fixes:
+                    if apply_quick_fix(engine, f["ticker"], f["fiscal_year"], f["table_name"], f["column_name"],
+                                       f["raw_value"], f["reason"], issue_id=f["issue_id"]):
+                        st.rows_written += 1
+                st.rows_skipped = st.rows_read - st.rows_written
+            refresh_stage(run, engine.raw_connection)  # firm-years just fixed (mark_dirty in apply_quick_fix(es))
+            return
+
+        with run.stage("apply_fixes") as st:
+            applied = apply_quick_fixes(engine, fixes)
+            st.rows_read, st.rows_written = len(fixes), len(applied)
+            st.rows_skipped = st.rows_read - st.rows_written
+        if applied:
+            refresh_stage(run, engine.raw_connection)
+            with run.stage("sync_workbook") as st:
+                st.rows_read, st.rows_written = len(applied), sync_workbook(applied)
+
 if __name__ == "__main__":
     main()
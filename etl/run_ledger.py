@@ -0,0 +1,165 @@
+import json
+import os
+import socket
+import sys
+import time
+import traceback
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterator, Optional
+
+# Sổ ghi các lần chạy ETL (bảng etl_run / etl_run_stage trong schema_and_seed.sql):
+#   with run_ledger("import_panel", connect, args=vars(args)) as run:
+#       with run.stage("read_workbook") as st:
+#           df = read_excel(...)
+#           st.rows_read = len(df); st.bytes_read = os.path.getsize(path)
+# - connect: hàm không tham số trả về kết nối DB-API (pymysql hoặc engine.raw_connection của SQLAlchemy).
+# - Ledger dùng kết nối riêng, autocommit từng dòng: rollback của script không xóa dòng lỗi.
+# - Lỗi khi ghi ledger chỉ in cảnh báo, không bao giờ làm hỏng lần chạy ETL.
+
+def peak_rss_bytes() -> Optional[int]:
+    """Peak resident set size of this process so far (None if the platform gives no way to read it)."""
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return int(peak) if sys.platform == "darwin" else int(peak) * 1024  # bytes on macOS, KiB on Linux
+    except ImportError:
+        pass
+    try:
+        import psutil
+        mem = psutil.Process().memory_info()
+        return int(getattr(mem, "peak_wset", mem.rss))  # peak working set on Windows
+    except ImportError:
+        return None
+
+def error_text(exc: BaseException) -> str:
+    return "".join(traceback.format_exception_only(type(exc), exc)).strip()[:2000]
+
+class Stage:
+    """Counters of one stage; set the fields inside the `with run.stage(...)` block."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.rows_read: Optional[int] = None
+        self.rows_written: Optional[int] = None
+        self.rows_skipped: Optional[int] = None
+        self.bytes_read: Optional[int] = None
+        self.stage_id: Optional[int] = None
+
+class RunLedger:
+    def __init__(self, script: str, connect: Optional[Callable[[], Any]], args: Optional[Dict[str, Any]] = None):
+        self.script = script
+        self.run_id: Optional[int] = None
+        self.status = "running"
+        self.error: Optional[str] = None
+        self.totals = {"rows_read": 0, "rows_written": 0, "rows_skipped": 0, "bytes_read": 0}
+        self.t0 = time.perf_counter()
+        self.conn = None
+        try:
+            if connect is not None:
+                self.conn = connect()
+                self.run_id = self.insert(
+                    "INSERT INTO etl_run (script, args_json, host, pid, started_at, status) "
+                    "VALUES (%s, %s, %s, %s, %s, 'running')",
+                    (script, json.dumps(args or {}, ensure_ascii=False, default=str), socket.gethostname(),
+                     os.getpid(), datetime.now()),
+                )
+                print(f">>> etl_run id = {self.run_id}")
+        except Exception as e:
+            self.disable(e)
+
+    def disable(self, e: Exception) -> None:
+        print(f"!!! run ledger disabled ({self.script}): {e}")
+        self.run_id = None
+        if self.conn is not None:
+            try:
+                self.conn.close()
+            except Exception:
+                pass
+        self.conn = None
+
+    def insert(self, sql: str, params) -> int:
+        cur = self.conn.cursor()
+        try:
+            cur.execute(sql, params)
+            new_id = cur.lastrowid
+        finally:
+            cur.close()
+        self.conn.commit()
+        return int(new_id)
+
+    def execute(self, sql: str, params) -> None:
+        if self.run_id is None:
+            return
+        try:
+            cur = self.conn.cursor()
+            try:
+                cur.execute(sql, params)
+            finally:
+                cur.close()
+            self.conn.commit()
+        except Exception as e:
+            self.disable(e)
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[Stage]:
+        st = Stage(name)
+        started = datetime.now()
+        t0 = time.perf_counter()
+        if self.run_id is not None:
+            try:
+                st.stage_id = self.insert(
+                    "INSERT INTO etl_run_stage (run_id, stage_name, started_at, status) VALUES (%s, %s, %s, 'running')",
+                    (self.run_id, name, started),
+                )
+            except Exception as e:
+                self.disable(e)
+        status, error = "success", None
+        try:
+            yield st
+        except BaseException as e:  # SystemExit too: the scripts report most failures that way
+            status, error = "failed", error_text(e)
+            raise
+        finally:
+            for k in self.totals:
+                self.totals[k] += getattr(st, k) or 0
+            if st.stage_id is not None:
+                self.execute(
+                    "UPDATE etl_run_stage SET finished_at=%s, duration_s=%s, rows_read=%s, rows_written=%s, "
+                    "rows_skipped=%s, bytes_read=%s, peak_rss_bytes=%s, status=%s, error=%s WHERE stage_id=%s",
+                    (datetime.now(), round(time.perf_counter() - t0, 3), st.rows_read, st.rows_written,
+                     st.rows_skipped, st.bytes_read, peak_rss_bytes(), status, error, st.stage_id),
+                )
+
+    def fail(self, exc: BaseException) -> None:
+        """For scripts that catch and print their own errors instead of raising."""
+        self.status, self.error = "failed", error_text(exc)
+
+    def finish(self, exc: Optional[BaseException] = None) -> None:
+        if exc is not None:
+            self.fail(exc)
+        elif self.status == "running":
+            self.status = "success"
+        self.execute(
+            "UPDATE etl_run SET finished_at=%s, duration_s=%s, rows_read=%s, rows_written=%s, rows_skipped=%s, "
+            "bytes_read=%s, peak_rss_bytes=%s, status=%s, error=%s WHERE run_id=%s",
+            (datetime.now(), round(time.perf_counter() - self.t0, 3), self.totals["rows_read"],
+             self.totals["rows_written"], self.totals["rows_skipped"], self.totals["bytes_read"],
+             peak_rss_bytes(), self.status, self.error, self.run_id),
+        )
+        if self.conn is not None:
+            try:
+                self.conn.close()
+            except Exception:
+                pass
+            self.conn = None
+
+@contextmanager
+def run_ledger(script: str, connect: Optional[Callable[[], Any]], args: Optional[Dict[str, Any]] = None) -> Iterator[RunLedger]:
+    run = RunLedger(script, connect, args)
+    try:
+        yield run
+    except BaseException as e:
+        run.finish(e)
+        raise
+    run.finish()
@@ -1,12 +1,22 @@
 -- Auto-generated schema for vn_firm_panel
 -- Model: DIM + FACT + SNAPSHOT (+ AUDIT) as per data dictionary
--- MySQL 8.0+ recommended (window functions used in vw_firm_panel_latest)
+-- MySQL 8.0.14+ recommended (window functions in vw_firm_panel_latest, LATERAL in sp_refresh_panel_latest)
 
 CREATE DATABASE IF NOT EXISTS `vn_firm_panel_test` DEFAULT CHARACTER SET utf8mb4 COLLATE utf8mb4_unicode_ci;
 USE `vn_firm_panel_test`;
 
 SET FOREIGN_KEY_CHECKS=0;
+DROP PROCEDURE IF EXISTS `sp_panel_as_of`;
+DROP PROCEDURE IF EXISTS `sp_refresh_panel_latest`;
 DROP VIEW IF EXISTS `vw_firm_panel_latest`;
+DROP TABLE IF EXISTS `panel_latest_dirty`;
+DROP TABLE IF EXISTS `panel_latest`;
+DROP TABLE IF EXISTS `fact_qc_issue`;
+DROP TABLE IF EXISTS `etl_qc_state`;
+DROP TABLE IF EXISTS `etl_run_stage`;
+DROP TABLE IF EXISTS `etl_run`;
+DROP TABLE IF EXISTS `etl_import_checkpoint`;
+DROP TABLE IF EXISTS `etl_row_hash`;
 DROP TABLE IF EXISTS `fact_value_override_log`;
 DROP TABLE IF EXISTS `fact_firm_year_meta`;
 DROP TABLE IF EXISTS `fact_innovation_year`;
@@ -86,6 +96,7 @@ CREATE TABLE IF NOT EXISTS `fact_data_snapshot` (
   PRIMARY KEY (`snapshot_id`),
   UNIQUE KEY `uq_fact_data_snapshot_source_year_date_tag` (`source_id`,`fiscal_year`,`snapshot_date`,`version_tag`),
   KEY `idx_fact_data_snapshot_source_id` (`source_id`),
+  KEY `idx_fact_data_snapshot_version_tag` (`version_tag`,`snapshot_date`,`snapshot_id`),
   CONSTRAINT `fk_fact_data_snapshot_source_id` FOREIGN KEY (`source_id`)
     REFERENCES `dim_data_source` (`source_id`)
     ON DELETE RESTRICT ON UPDATE CASCADE
@@ -95,6 +106,7 @@ CREATE TABLE IF NOT EXISTS `fact_ownership_year` (
   `firm_id` BIGINT NOT NULL,
   `fiscal_year` SMALLINT NOT NULL,
   `snapshot_id` BIGINT NOT NULL,
+  `snapshot_date` DATE NULL,
   `managerial_inside_own` DECIMAL(10,6) NULL,
   `state_own` DECIMAL(10,6) NULL,
   `institutional_own` DECIMAL(10,6) NULL,
@@ -102,6 +114,7 @@ CREATE TABLE IF NOT EXISTS `fact_ownership_year` (
   `note` VARCHAR(255) NULL,
   `created_at` TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
   PRIMARY KEY (`firm_id`,`fiscal_year`,`snapshot_id`),
+  KEY `idx_fact_ownership_year_latest` (`firm_id`,`fiscal_year`,`snapshot_date` DESC,`snapshot_id` DESC),
   KEY `idx_fact_ownership_year_firm_id` (`firm_id`),
   CONSTRAINT `fk_fact_ownership_year_firm_id` FOREIGN KEY (`firm_id`)
     REFERENCES `dim_firm` (`firm_id`)
@@ -116,6 +129,7 @@ CREATE TABLE IF NOT EXISTS `fact_financial_year` (
   `firm_id` BIGINT NOT NULL,
   `fiscal_year` SMALLINT NOT NULL,
   `snapshot_id` BIGINT NOT NULL,
+  `snapshot_date` DATE NULL,
   `unit_scale` BIGINT NOT NULL DEFAULT 1,
   `currency_code` CHAR(3) NOT NULL DEFAULT 'VND',
   `net_sales` DECIMAL(20,2) NULL,
@@ -143,6 +157,7 @@ CREATE TABLE IF NOT EXISTS `fact_financial_year` (
   `net_ppe` DECIMAL(20,2) NULL,
   `created_at` TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
   PRIMARY KEY (`firm_id`,`fiscal_year`,`snapshot_id`),
+  KEY `idx_fact_financial_year_latest` (`firm_id`,`fiscal_year`,`snapshot_date` DESC,`snapshot_id` DESC),
   KEY `idx_fact_financial_year_firm_id` (`firm_id`),
   CONSTRAINT `fk_fact_financial_year_firm_id` FOREIGN KEY (`firm_id`)
     REFERENCES `dim_firm` (`firm_id`)
@@ -157,6 +172,7 @@ CREATE TABLE IF NOT EXISTS `fact_cashflow_year` (
   `firm_id` BIGINT NOT NULL,
   `fiscal_year` SMALLINT NOT NULL,
   `snapshot_id` BIGINT NOT NULL,
+  `snapshot_date` DATE NULL,
   `unit_scale` BIGINT NOT NULL DEFAULT 1,
   `currency_code` CHAR(3) NOT NULL DEFAULT 'VND',
   `net_cfo` DECIMAL(20,2) NULL,
@@ -164,6 +180,7 @@ CREATE TABLE IF NOT EXISTS `fact_cashflow_year` (
   `net_cfi` DECIMAL(20,2) NULL,
   `created_at` TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
   PRIMARY KEY (`firm_id`,`fiscal_year`,`snapshot_id`),
+  KEY `idx_fact_cashflow_year_latest` (`firm_id`,`fiscal_year`,`snapshot_date` DESC,`snapshot_id` DESC),
   KEY `idx_fact_cashflow_year_firm_id` (`firm_id`),
   CONSTRAINT `fk_fact_cashflow_year_firm_id` FOREIGN KEY (`firm_id`)
     REFERENCES `dim_firm` (`firm_id`)
@@ -178,6 +195,7 @@ CREATE TABLE IF NOT EXISTS `fact_market_year` (
   `firm_id` BIGINT NOT NULL,
   `fiscal_year` SMALLINT NOT NULL,
   `snapshot_id` BIGINT NOT NULL,
+  `snapshot_date` DATE NULL,
   `shares_outstanding` BIGINT NULL,
   `price_reference` ENUM('close_year_end','avg_year','close_fiscal_year_end','manual') NULL,
   `share_price` DECIMAL(20,4) NULL,
@@ -187,6 +205,7 @@ CREATE TABLE IF NOT EXISTS `fact_market_year` (
   `currency_code` CHAR(3) NOT NULL DEFAULT 'VND',
   `created_at` TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
   PRIMARY KEY (`firm_id`,`fiscal_year`,`snapshot_id`),
+  KEY `idx_fact_market_year_latest` (`firm_id`,`fiscal_year`,`snapshot_date` DESC,`snapshot_id` DESC),
   KEY `idx_fact_market_year_firm_id` (`firm_id`),
   CONSTRAINT `fk_fact_market_year_firm_id` FOREIGN KEY (`firm_id`)
     REFERENCES `dim_firm` (`firm_id`)
@@ -201,12 +220,14 @@ CREATE TABLE IF NOT EXISTS `fact_innovation_year` (
   `firm_id` BIGINT NOT NULL,
   `fiscal_year` SMALLINT NOT NULL,
   `snapshot_id` BIGINT NOT NULL,
+  `snapshot_date` DATE NULL,
   `product_innovation` TINYINT NULL,
   `process_innovation` TINYINT NULL,
   `evidence_source_id` SMALLINT NULL,
   `evidence_note` VARCHAR(500) NULL,
   `created_at` TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
   PRIMARY KEY (`firm_id`,`fiscal_year`,`snapshot_id`),
+  KEY `idx_fact_innovation_year_latest` (`firm_id`,`fiscal_year`,`snapshot_date` DESC,`snapshot_id` DESC),
   KEY `idx_fact_innovation_year_firm_id` (`firm_id`),
   CONSTRAINT `fk_fact_innovation_year_firm_id` FOREIGN KEY (`firm_id`)
     REFERENCES `dim_firm` (`firm_id`)
@@ -225,10 +246,12 @@ CREATE TABLE IF NOT EXISTS `fact_firm_year_meta` (
   `firm_id` BIGINT NOT NULL,
   `fiscal_year` SMALLINT NOT NULL,
   `snapshot_id` BIGINT NOT NULL,
+  `snapshot_date` DATE NULL,
   `employees_count` INT NULL,
   `firm_age` SMALLINT NULL,
   `created_at` TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
   PRIMARY KEY (`firm_id`,`fiscal_year`,`snapshot_id`),
+  KEY `idx_fact_firm_year_meta_latest` (`firm_id`,`fiscal_year`,`snapshot_date` DESC,`snapshot_id` DESC),
   KEY `idx_fact_firm_year_meta_firm_id` (`firm_id`),
   CONSTRAINT `fk_fact_firm_year_meta_firm_id` FOREIGN KEY (`firm_id`)
     REFERENCES `dim_firm` (`firm_id`)
@@ -257,6 +280,181 @@ CREATE TABLE IF NOT EXISTS `fact_value_override_log` (
     ON DELETE RESTRICT ON UPDATE CASCADE
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
 
+-- Content fingerprint of each loaded FACT row (import_panel.py --incremental)
+CREATE TABLE IF NOT EXISTS `etl_row_hash` (
+  `table_name` VARCHAR(64) NOT NULL,
+  `firm_id` BIGINT NOT NULL,
+  `fiscal_year` SMALLINT NOT NULL,
+  `snapshot_id` BIGINT NOT NULL,
+  `row_hash` CHAR(32) NOT NULL,
+  `loaded_at` TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+  PRIMARY KEY (`table_name`,`snapshot_id`,`fiscal_year`,`firm_id`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+-- Committed (year, table, batch) units of a chunked import (import_panel.py --chunked / --resume)
+CREATE TABLE IF NOT EXISTS `etl_import_checkpoint` (
+  `run_key` CHAR(40) NOT NULL,
+  `fiscal_year` SMALLINT NOT NULL,
+  `table_name` VARCHAR(64) NOT NULL,
+  `batch_no` INT NOT NULL,
+  `rows_loaded` INT NOT NULL,
+  `done_at` TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+  PRIMARY KEY (`run_key`,`fiscal_year`,`table_name`,`batch_no`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+-- Run ledger: one row per script run and per stage (etl/run_ledger.py)
+CREATE TABLE IF NOT EXISTS `etl_run` (
+  `run_id` BIGINT AUTO_INCREMENT NOT NULL,
+  `script` VARCHAR(64) NOT NULL,
+  `args_json` TEXT NULL,
+  `host` VARCHAR(128) NULL,
+  `pid` INT NULL,
+  `started_at` DATETIME(3) NOT NULL,
+  `finished_at` DATETIME(3) NULL,
+  `duration_s` DECIMAL(12,3) NULL,
+  `rows_read` BIGINT NULL,
+  `rows_written` BIGINT NULL,
+  `rows_skipped` BIGINT NULL,
+  `bytes_read` BIGINT NULL,
+  `peak_rss_bytes` BIGINT NULL,
+  `status` VARCHAR(16) NOT NULL DEFAULT 'running',
+  `error` TEXT NULL,
+  PRIMARY KEY (`run_id`),
+  KEY `idx_etl_run_script_started` (`script`,`started_at`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+CREATE TABLE IF NOT EXISTS `etl_run_stage` (
+  `stage_id` BIGINT AUTO_INCREMENT NOT NULL,
+  `run_id` BIGINT NOT NULL,
+  `stage_name` VARCHAR(64) NOT NULL,
+  `started_at` DATETIME(3) NOT NULL,
+  `finished_at` DATETIME(3) NULL,
+  `duration_s` DECIMAL(12,3) NULL,
+  `rows_read` BIGINT NULL,
+  `rows_written` BIGINT NULL,
+  `rows_skipped` BIGINT NULL,
+  `bytes_read` BIGINT NULL,
+  `peak_rss_bytes` BIGINT NULL,
+  `status` VARCHAR(16) NOT NULL DEFAULT 'running',
+  `error` TEXT NULL,
+  PRIMARY KEY (`stage_id`),
+  KEY `idx_etl_run_stage_name_started` (`stage_name`,`started_at`),
+  KEY `idx_etl_run_stage_run_id` (`run_id`),
+  CONSTRAINT `fk_etl_run_stage_run_id` FOREIGN KEY (`run_id`)
+    REFERENCES `etl_run` (`run_id`)
+    ON DELETE CASCADE ON UPDATE CASCADE
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+CREATE TABLE IF NOT EXISTS `etl_qc_state` (
+  `firm_id` BIGINT NOT NULL,
+  `fiscal_year` SMALLINT NOT NULL,
+  `oy_snapshot_id` BIGINT NULL,
+  `fy_snapshot_id` BIGINT NULL,
+  `cf_snapshot_id` BIGINT NULL,
+  `my_snapshot_id` BIGINT NULL,
+  `iv_snapshot_id` BIGINT NULL,
+  `meta_snapshot_id` BIGINT NULL,
+  `last_override_id` BIGINT NULL,
+  `founded_year` SMALLINT NULL,
+  `panel_refreshed_us` BIGINT NULL,
+  `checked_at` TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+  PRIMARY KEY (`firm_id`,`fiscal_year`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+CREATE TABLE IF NOT EXISTS `fact_qc_issue` (
+  `issue_id` BIGINT AUTO_INCREMENT NOT NULL,
+  `run_id` BIGINT NULL,
+  `firm_id` BIGINT NULL,
+  `ticker` VARCHAR(20) NOT NULL,
+  `fiscal_year` SMALLINT NOT NULL,
+  `year_label` VARCHAR(20) NOT NULL,
+  `table_name` VARCHAR(255) NULL,
+  `column_name` VARCHAR(255) NOT NULL,
+  `error_type` VARCHAR(40) NOT NULL,
+  `message` TEXT NULL,
+  `old_value` TEXT NULL,
+  `new_value` VARCHAR(255) NULL,
+  `status` ENUM('open','fixed','ignored','superseded') NOT NULL DEFAULT 'open',
+  `created_at` TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+  `updated_at` TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+  `fixed_at` TIMESTAMP NULL,
+  PRIMARY KEY (`issue_id`),
+  KEY `idx_fact_qc_issue_run_firm_year_rule_col` (`run_id`,`firm_id`,`fiscal_year`,`error_type`,`column_name`),
+  KEY `idx_fact_qc_issue_status_ticker_year` (`status`,`ticker`,`fiscal_year`),
+  KEY `idx_fact_qc_issue_status_rule` (`status`,`error_type`),
+  KEY `idx_fact_qc_issue_firm_id` (`firm_id`),
+  CONSTRAINT `fk_fact_qc_issue_firm_id` FOREIGN KEY (`firm_id`)
+    REFERENCES `dim_firm` (`firm_id`)
+    ON DELETE RESTRICT ON UPDATE CASCADE,
+  CONSTRAINT `fk_fact_qc_issue_run_id` FOREIGN KEY (`run_id`)
+    REFERENCES `etl_run` (`run_id`)
+    ON DELETE SET NULL ON UPDATE CASCADE
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+-- Materialized vw_firm_panel_latest (same columns, then share_price / evidence_note for qc_checks),
+-- refreshed per touched (firm_id, fiscal_year) by sp_refresh_panel_latest (etl/panel_latest.py);
+-- refreshed_at is when the row was last rebuilt (a content watermark of qc_checks --incremental)
+CREATE TABLE IF NOT EXISTS `panel_latest` (
+  `firm_id` BIGINT NOT NULL,
+  `ticker` VARCHAR(20) NOT NULL,
+  `fiscal_year` SMALLINT NOT NULL,
+  `managerial_inside_own` DECIMAL(10,6) NULL,
+  `state_own` DECIMAL(10,6) NULL,
+  `institutional_own` DECIMAL(10,6) NULL,
+  `foreign_own` DECIMAL(10,6) NULL,
+  `shares_outstanding` BIGINT NULL,
+  `net_sales` DECIMAL(20,2) NULL,
+  `total_assets` DECIMAL(20,2) NULL,
+  `selling_expenses` DECIMAL(20,2) NULL,
+  `general_admin_expenses` DECIMAL(20,2) NULL,
+  `intangible_assets_net` DECIMAL(20,2) NULL,
+  `manufacturing_overhead` DECIMAL(20,2) NULL,
+  `net_operating_income` DECIMAL(20,2) NULL,
+  `raw_material_consumption` DECIMAL(20,2) NULL,
+  `merchandise_purchase_year` DECIMAL(20,2) NULL,
+  `wip_goods_purchase` DECIMAL(20,2) NULL,
+  `outside_manufacturing_expenses` DECIMAL(20,2) NULL,
+  `production_cost` DECIMAL(20,2) NULL,
+  `rnd_expenses` DECIMAL(20,2) NULL,
+  `product_innovation` TINYINT NULL,
+  `process_innovation` TINYINT NULL,
+  `net_income` DECIMAL(20,2) NULL,
+  `total_equity` DECIMAL(20,2) NULL,
+  `market_value_equity` DECIMAL(20,2) NULL,
+  `total_liabilities` DECIMAL(20,2) NULL,
+  `net_cfo` DECIMAL(20,2) NULL,
+  `capex` DECIMAL(20,2) NULL,
+  `net_cfi` DECIMAL(20,2) NULL,
+  `cash_and_equivalents` DECIMAL(20,2) NULL,
+  `long_term_debt` DECIMAL(20,2) NULL,
+  `current_assets` DECIMAL(20,2) NULL,
+  `current_liabilities` DECIMAL(20,2) NULL,
+  `growth_ratio` DECIMAL(10,6) NULL,
+  `inventory` DECIMAL(20,2) NULL,
+  `dividend_cash_paid` DECIMAL(20,2) NULL,
+  `eps_basic` DECIMAL(20,6) NULL,
+  `employees_count` INT NULL,
+  `net_ppe` DECIMAL(20,2) NULL,
+  `firm_age` SMALLINT NULL,
+  `share_price` DECIMAL(20,4) NULL,
+  `evidence_note` VARCHAR(500) NULL,
+  `refreshed_at` TIMESTAMP(6) NOT NULL DEFAULT CURRENT_TIMESTAMP(6),
+  PRIMARY KEY (`firm_id`,`fiscal_year`),
+  UNIQUE KEY `uq_panel_latest_ticker_year` (`ticker`,`fiscal_year`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+-- (fact table, firm_id, fiscal_year) written since the last refresh of panel_latest. The loaders and quick_fix
+-- record the keys of each batch they write (panel_latest.mark_dirty, same transaction), not a trigger per row;
+-- after writing FACT rows by hand, insert their keys here or run CALL sp_refresh_panel_latest(1).
+-- The fact table is part of the key so parallel loaders of different tables never wait on the same row.
+CREATE TABLE IF NOT EXISTS `panel_latest_dirty` (
+  `table_name` VARCHAR(64) NOT NULL,
+  `firm_id` BIGINT NOT NULL,
+  `fiscal_year` SMALLINT NOT NULL,
+  `marked_at` TIMESTAMP(6) NOT NULL DEFAULT CURRENT_TIMESTAMP(6),
+  PRIMARY KEY (`table_name`,`firm_id`,`fiscal_year`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
 -- =========================
 -- View: latest firm-year panel (firm-year + 39 variables)
 -- =========================
@@ -279,12 +477,12 @@ oy_latest AS (
   SELECT oy.`firm_id`, oy.`fiscal_year`, oy.`snapshot_id`,
          oy.`managerial_inside_own`, oy.`state_own`, oy.`institutional_own`, oy.`foreign_own`
   FROM (
-    SELECT oy.*, s.snapshot_date,
-           ROW_NUMBER() OVER (PARTITION BY oy.firm_id, oy.fiscal_year ORDER BY s.snapshot_date DESC, oy.snapshot_id DESC) AS rn
-    FROM `fact_ownership_year` oy
-    JOIN `fact_data_snapshot` s ON s.snapshot_id = oy.snapshot_id
-  ) oy
-  WHERE oy.rn = 1
+    SELECT firm_id, fiscal_year, snapshot_id,
+           ROW_NUMBER() OVER (PARTITION BY firm_id, fiscal_year ORDER BY snapshot_date DESC, snapshot_id DESC) AS rn
+    FROM `fact_ownership_year`
+  ) x
+  JOIN `fact_ownership_year` oy ON oy.firm_id = x.firm_id AND oy.fiscal_year = x.fiscal_year AND oy.snapshot_id = x.snapshot_id
+  WHERE x.rn = 1
 ),
 fy_latest AS (
   SELECT fy.`firm_id`, fy.`fiscal_year`, fy.`snapshot_id`,
@@ -296,56 +494,56 @@ fy_latest AS (
          fy.`cash_and_equivalents`, fy.`long_term_debt`, fy.`current_assets`, fy.`current_liabilities`,
          fy.`growth_ratio`, fy.`inventory`, fy.`net_ppe`
   FROM (
-    SELECT fy.*, s.snapshot_date,
-           ROW_NUMBER() OVER (PARTITION BY fy.firm_id, fy.fiscal_year ORDER BY s.snapshot_date DESC, fy.snapshot_id DESC) AS rn
-    FROM `fact_financial_year` fy
-    JOIN `fact_data_snapshot` s ON s.snapshot_id = fy.snapshot_id
-  ) fy
-  WHERE fy.rn = 1
+    SELECT firm_id, fiscal_year, snapshot_id,
+           ROW_NUMBER() OVER (PARTITION BY firm_id, fiscal_year ORDER BY snapshot_date DESC, snapshot_id DESC) AS rn
+    FROM `fact_financial_year`
+  ) x
+  JOIN `fact_financial_year` fy ON fy.firm_id = x.firm_id AND fy.fiscal_year = x.fiscal_year AND fy.snapshot_id = x.snapshot_id
+  WHERE x.rn = 1
 ),
 cf_latest AS (
   SELECT cf.`firm_id`, cf.`fiscal_year`, cf.`snapshot_id`,
          cf.`net_cfo`, cf.`capex`, cf.`net_cfi`
   FROM (
-    SELECT cf.*, s.snapshot_date,
-           ROW_NUMBER() OVER (PARTITION BY cf.firm_id, cf.fiscal_year ORDER BY s.snapshot_date DESC, cf.snapshot_id DESC) AS rn
-    FROM `fact_cashflow_year` cf
-    JOIN `fact_data_snapshot` s ON s.snapshot_id = cf.snapshot_id
-  ) cf
-  WHERE cf.rn = 1
+    SELECT firm_id, fiscal_year, snapshot_id,
+           ROW_NUMBER() OVER (PARTITION BY firm_id, fiscal_year ORDER BY snapshot_date DESC, snapshot_id DESC) AS rn
+    FROM `fact_cashflow_year`
+  ) x
+  JOIN `fact_cashflow_year` cf ON cf.firm_id = x.firm_id AND cf.fiscal_year = x.fiscal_year AND cf.snapshot_id = x.snapshot_id
+  WHERE x.rn = 1
 ),
 my_latest AS (
   SELECT my.`firm_id`, my.`fiscal_year`, my.`snapshot_id`,
          my.`shares_outstanding`, my.`market_value_equity`, my.`dividend_cash_paid`, my.`eps_basic`
   FROM (
-    SELECT my.*, s.snapshot_date,
-           ROW_NUMBER() OVER (PARTITION BY my.firm_id, my.fiscal_year ORDER BY s.snapshot_date DESC, my.snapshot_id DESC) AS rn
-    FROM `fact_market_year` my
-    JOIN `fact_data_snapshot` s ON s.snapshot_id = my.snapshot_id
-  ) my
-  WHERE my.rn = 1
+    SELECT firm_id, fiscal_year, snapshot_id,
+           ROW_NUMBER() OVER (PARTITION BY firm_id, fiscal_year ORDER BY snapshot_date DESC, snapshot_id DESC) AS rn
+    FROM `fact_market_year`
+  ) x
+  JOIN `fact_market_year` my ON my.firm_id = x.firm_id AND my.fiscal_year = x.fiscal_year AND my.snapshot_id = x.snapshot_id
+  WHERE x.rn = 1
 ),
 iv_latest AS (
   SELECT iv.`firm_id`, iv.`fiscal_year`, iv.`snapshot_id`,
          iv.`product_innovation`, iv.`process_innovation`
   FROM (
-    SELECT iv.*, s.snapshot_date,
-           ROW_NUMBER() OVER (PARTITION BY iv.firm_id, iv.fiscal_year ORDER BY s.snapshot_date DESC, iv.snapshot_id DESC) AS rn
-    FROM `fact_innovation_year` iv
-    JOIN `fact_data_snapshot` s ON s.snapshot_id = iv.snapshot_id
-  ) iv
-  WHERE iv.rn = 1
+    SELECT firm_id, fiscal_year, snapshot_id,
+           ROW_NUMBER() OVER (PARTITION BY firm_id, fiscal_year ORDER BY snapshot_date DESC, snapshot_id DESC) AS rn
+    FROM `fact_innovation_year`
+  ) x
+  JOIN `fact_innovation_year` iv ON iv.firm_id = x.firm_id AND iv.fiscal_year = x.fiscal_year AND iv.snapshot_id = x.snapshot_id
+  WHERE x.rn = 1
 ),
 meta_latest AS (
   SELECT meta.`firm_id`, meta.`fiscal_year`, meta.`snapshot_id`,
          meta.`employees_count`, meta.`firm_age`
   FROM (
-    SELECT meta.*, s.snapshot_date,
-           ROW_NUMBER() OVER (PARTITION BY meta.firm_id, meta.fiscal_year ORDER BY s.snapshot_date DESC, meta.snapshot_id DESC) AS rn
-    FROM `fact_firm_year_meta` meta
-    JOIN `fact_data_snapshot` s ON s.snapshot_id = meta.snapshot_id
-  ) meta
-  WHERE meta.rn = 1
+    SELECT firm_id, fiscal_year, snapshot_id,
+           ROW_NUMBER() OVER (PARTITION BY firm_id, fiscal_year ORDER BY snapshot_date DESC, snapshot_id DESC) AS rn
+    FROM `fact_firm_year_meta`
+  ) x
+  JOIN `fact_firm_year_meta` meta ON meta.firm_id = x.firm_id AND meta.fiscal_year = x.fiscal_year AND meta.snapshot_id = x.snapshot_id
+  WHERE x.rn = 1
 )
 SELECT
   f.firm_id AS firm_id,
@@ -417,3 +615,298 @@ LEFT JOIN my_latest my ON my.firm_id=k.firm_id AND my.fiscal_year=k.fiscal_year
 LEFT JOIN iv_latest iv ON iv.firm_id=k.firm_id AND iv.fiscal_year=k.fiscal_year
 LEFT JOIN meta_latest meta ON meta.firm_id=k.firm_id AND meta.fiscal_year=k.fiscal_year;
 
+
+-- =========================
+-- panel_latest refresh: CALL sp_refresh_panel_latest(0) rebuilds only the firm-years in panel_latest_dirty,
+-- CALL sp_refresh_panel_latest(1) rebuilds everything from vw_firm_panel_latest.
+-- Sets @panel_latest_keys (firm-years refreshed) and @panel_latest_rows (rows written).
+-- =========================
+
+DELIMITER $$
+
+CREATE PROCEDURE `sp_refresh_panel_latest`(IN p_full TINYINT)
+BEGIN
+  DECLARE v_started TIMESTAMP(6) DEFAULT NOW(6);
+  IF p_full THEN
+    DELETE FROM `panel_latest`;
+    INSERT INTO `panel_latest` (
+      `firm_id`, `ticker`, `fiscal_year`, `managerial_inside_own`, `state_own`, `institutional_own`,
+      `foreign_own`, `shares_outstanding`, `net_sales`, `total_assets`, `selling_expenses`,
+      `general_admin_expenses`, `intangible_assets_net`, `manufacturing_overhead`, `net_operating_income`,
+      `raw_material_consumption`, `merchandise_purchase_year`, `wip_goods_purchase`,
+      `outside_manufacturing_expenses`, `production_cost`, `rnd_expenses`, `product_innovation`,
+      `process_innovation`, `net_income`, `total_equity`, `market_value_equity`, `total_liabilities`,
+      `net_cfo`, `capex`, `net_cfi`, `cash_and_equivalents`, `long_term_debt`, `current_assets`,
+      `current_liabilities`, `growth_ratio`, `inventory`, `dividend_cash_paid`, `eps_basic`,
+      `employees_count`, `net_ppe`, `firm_age`, `share_price`, `evidence_note`)
+    SELECT v.*, my.share_price, iv.evidence_note
+    FROM `vw_firm_panel_latest` v
+    LEFT JOIN (
+      SELECT t.firm_id, t.fiscal_year, t.share_price,
+             ROW_NUMBER() OVER (PARTITION BY t.firm_id, t.fiscal_year ORDER BY t.snapshot_date DESC, t.snapshot_id DESC) AS rn
+      FROM `fact_market_year` t
+    ) my ON my.firm_id = v.firm_id AND my.fiscal_year = v.fiscal_year AND my.rn = 1
+    LEFT JOIN (
+      SELECT t.firm_id, t.fiscal_year, t.evidence_note,
+             ROW_NUMBER() OVER (PARTITION BY t.firm_id, t.fiscal_year ORDER BY t.snapshot_date DESC, t.snapshot_id DESC) AS rn
+      FROM `fact_innovation_year` t
+    ) iv ON iv.firm_id = v.firm_id AND iv.fiscal_year = v.fiscal_year AND iv.rn = 1;
+    SET @panel_latest_rows = ROW_COUNT();
+    SET @panel_latest_keys = @panel_latest_rows;
+    DELETE FROM `panel_latest_dirty` WHERE `marked_at` <= v_started;
+  ELSE
+    DROP TEMPORARY TABLE IF EXISTS `tmp_panel_keys`;
+    CREATE TEMPORARY TABLE `tmp_panel_keys` (
+      `firm_id` BIGINT NOT NULL,
+      `fiscal_year` SMALLINT NOT NULL,
+      `marked_at` TIMESTAMP(6) NOT NULL,
+      PRIMARY KEY (`firm_id`,`fiscal_year`)
+    ) ENGINE=InnoDB;
+    INSERT INTO `tmp_panel_keys` (`firm_id`, `fiscal_year`, `marked_at`)
+      SELECT firm_id, fiscal_year, MAX(marked_at) FROM `panel_latest_dirty` GROUP BY firm_id, fiscal_year;
+    SET @panel_latest_keys = ROW_COUNT();
+
+    DELETE p FROM `panel_latest` p
+      JOIN `tmp_panel_keys` k ON k.firm_id = p.firm_id AND k.fiscal_year = p.fiscal_year;
+
+    -- Same selection as vw_firm_panel_latest: first entry of idx_<table>_latest for each table and key
+    INSERT INTO `panel_latest` (
+      `firm_id`, `ticker`, `fiscal_year`, `managerial_inside_own`, `state_own`, `institutional_own`,
+      `foreign_own`, `shares_outstanding`, `net_sales`, `total_assets`, `selling_expenses`,
+      `general_admin_expenses`, `intangible_assets_net`, `manufacturing_overhead`, `net_operating_income`,
+      `raw_material_consumption`, `merchandise_purchase_year`, `wip_goods_purchase`,
+      `outside_manufacturing_expenses`, `production_cost`, `rnd_expenses`, `product_innovation`,
+      `process_innovation`, `net_income`, `total_equity`, `market_value_equity`, `total_liabilities`,
+      `net_cfo`, `capex`, `net_cfi`, `cash_and_equivalents`, `long_term_debt`, `current_assets`,
+      `current_liabilities`, `growth_ratio`, `inventory`, `dividend_cash_paid`, `eps_basic`,
+      `employees_count`, `net_ppe`, `firm_age`, `share_price`, `evidence_note`)
+    SELECT
+      f.firm_id, f.ticker, k.fiscal_year, oy.managerial_inside_own, oy.state_own, oy.institutional_own,
+      oy.foreign_own, my.shares_outstanding, fy.net_sales, fy.total_assets, fy.selling_expenses,
+      fy.general_admin_expenses, fy.intangible_assets_net, fy.manufacturing_overhead,
+      fy.net_operating_income, fy.raw_material_consumption, fy.merchandise_purchase_year,
+      fy.wip_goods_purchase, fy.outside_manufacturing_expenses, fy.production_cost, fy.rnd_expenses,
+      iv.product_innovation, iv.process_innovation, fy.net_income, fy.total_equity, my.market_value_equity,
+      fy.total_liabilities, cf.net_cfo, cf.capex, cf.net_cfi, fy.cash_and_equivalents, fy.long_term_debt,
+      fy.current_assets, fy.current_liabilities, fy.growth_ratio, fy.inventory, my.dividend_cash_paid,
+      my.eps_basic, meta.employees_count, fy.net_ppe, meta.firm_age, my.share_price, iv.evidence_note
+    FROM `tmp_panel_keys` k
+      JOIN `dim_firm` f ON f.firm_id = k.firm_id
+      LEFT JOIN LATERAL (
+        SELECT t.`snapshot_id`,
+               t.`managerial_inside_own`, t.`state_own`, t.`institutional_own`, t.`foreign_own`
+        FROM `fact_ownership_year` t
+        WHERE t.firm_id = k.firm_id AND t.fiscal_year = k.fiscal_year
+        ORDER BY t.snapshot_date DESC, t.snapshot_id DESC
+        LIMIT 1
+      ) oy ON TRUE
+      LEFT JOIN LATERAL (
+        SELECT t.`snapshot_id`,
+               t.`net_sales`, t.`total_assets`, t.`selling_expenses`, t.`general_admin_expenses`,
+               t.`intangible_assets_net`, t.`manufacturing_overhead`, t.`net_operating_income`,
+               t.`raw_material_consumption`, t.`merchandise_purchase_year`, t.`wip_goods_purchase`,
+               t.`outside_manufacturing_expenses`, t.`production_cost`, t.`rnd_expenses`, t.`net_income`,
+               t.`total_equity`, t.`total_liabilities`, t.`cash_and_equivalents`, t.`long_term_debt`,
+               t.`current_assets`, t.`current_liabilities`, t.`growth_ratio`, t.`inventory`, t.`net_ppe`
+        FROM `fact_financial_year` t
+        WHERE t.firm_id = k.firm_id AND t.fiscal_year = k.fiscal_year
+        ORDER BY t.snapshot_date DESC, t.snapshot_id DESC
+        LIMIT 1
+      ) fy ON TRUE
+      LEFT JOIN LATERAL (
+        SELECT t.`snapshot_id`,
+               t.`net_cfo`, t.`capex`, t.`net_cfi`
+        FROM `fact_cashflow_year` t
+        WHERE t.firm_id = k.firm_id AND t.fiscal_year = k.fiscal_year
+        ORDER BY t.snapshot_date DESC, t.snapshot_id DESC
+        LIMIT 1
+      ) cf ON TRUE
+      LEFT JOIN LATERAL (
+        SELECT t.`snapshot_id`,
+               t.`shares_outstanding`, t.`market_value_equity`, t.`dividend_cash_paid`, t.`eps_basic`,
+               t.`share_price`
+        FROM `fact_market_year` t
+        WHERE t.firm_id = k.firm_id AND t.fiscal_year = k.fiscal_year
+        ORDER BY t.snapshot_date DESC, t.snapshot_id DESC
+        LIMIT 1
+      ) my ON TRUE
+      LEFT JOIN LATERAL (
+        SELECT t.`snapshot_id`,
+               t.`product_innovation`, t.`process_innovation`, t.`evidence_note`
+        FROM `fact_innovation_year` t
+        WHERE t.firm_id = k.firm_id AND t.fiscal_year = k.fiscal_year
+        ORDER BY t.snapshot_date DESC, t.snapshot_id DESC
+        LIMIT 1
+      ) iv ON TRUE
+      LEFT JOIN LATERAL (
+        SELECT t.`snapshot_id`,
+               t.`employees_count`, t.`firm_age`
+        FROM `fact_firm_year_meta` t
+        WHERE t.firm_id = k.firm_id AND t.fiscal_year = k.fiscal_year
+        ORDER BY t.snapshot_date DESC, t.snapshot_id DESC
+        LIMIT 1
+      ) meta ON TRUE
+    WHERE COALESCE(oy.snapshot_id, fy.snapshot_id, cf.snapshot_id, my.snapshot_id, iv.snapshot_id, meta.snapshot_id) IS NOT NULL;
+    SET @panel_latest_rows = ROW_COUNT();
+
+    -- Keys marked again while this refresh ran keep their newer marked_at and stay for the next refresh
+    DELETE d FROM `panel_latest_dirty` d
+      JOIN `tmp_panel_keys` k ON k.firm_id = d.firm_id AND k.fiscal_year = d.fiscal_year AND d.marked_at <= k.marked_at;
+    DROP TEMPORARY TABLE `tmp_panel_keys`;
+  END IF;
+END$$
+
+-- =========================
+-- Point-in-time panel: CALL sp_panel_as_of('2024-06-30', NULL) or CALL sp_panel_as_of(NULL, 'v2024')
+-- returns the vw_firm_panel_latest columns as they were at the cutoff: per (firm, year, table) the newest row
+-- whose snapshot is on or before the cutoff date, or (version_tag) not newer than the newest snapshot with that
+-- tag. Each lookup is a range read of idx_<table>_latest. Sets @panel_as_of_date and @panel_as_of_snapshot_id.
+-- =========================
+
+CREATE PROCEDURE `sp_panel_as_of`(IN p_cutoff DATE, IN p_version_tag VARCHAR(50))
+BEGIN
+  DECLARE v_date DATE DEFAULT p_cutoff;
+  DECLARE v_id BIGINT DEFAULT 9223372036854775807;
+  IF p_version_tag IS NOT NULL THEN
+    SET v_date = NULL;
+    SELECT snapshot_date, snapshot_id INTO v_date, v_id FROM `fact_data_snapshot`
+      WHERE version_tag = p_version_tag
+      ORDER BY snapshot_date DESC, snapshot_id DESC
+      LIMIT 1;
+  END IF;
+  IF v_date IS NULL THEN
+    SIGNAL SQLSTATE '45000' SET MESSAGE_TEXT = 'sp_panel_as_of: no cutoff date or unknown version_tag';
+  END IF;
+  SET @panel_as_of_date = v_date, @panel_as_of_snapshot_id = v_id;
+
+  SELECT
+    f.firm_id, f.ticker, k.fiscal_year, oy.managerial_inside_own, oy.state_own, oy.institutional_own,
+    oy.foreign_own, my.shares_outstanding, fy.net_sales, fy.total_assets, fy.selling_expenses,
+    fy.general_admin_expenses, fy.intangible_assets_net, fy.manufacturing_overhead,
+    fy.net_operating_income, fy.raw_material_consumption, fy.merchandise_purchase_year,
+    fy.wip_goods_purchase, fy.outside_manufacturing_expenses, fy.production_cost, fy.rnd_expenses,
+    iv.product_innovation, iv.process_innovation, fy.net_income, fy.total_equity, my.market_value_equity,
+    fy.total_liabilities, cf.net_cfo, cf.capex, cf.net_cfi, fy.cash_and_equivalents, fy.long_term_debt,
+    fy.current_assets, fy.current_liabilities, fy.growth_ratio, fy.inventory, my.dividend_cash_paid,
+    my.eps_basic, meta.employees_count, fy.net_ppe, meta.firm_age
+  FROM (
+    SELECT firm_id, fiscal_year FROM `fact_financial_year`
+      WHERE snapshot_date <= v_date AND (snapshot_date < v_date OR snapshot_id <= v_id)
+    UNION
+    SELECT firm_id, fiscal_year FROM `fact_ownership_year`
+      WHERE snapshot_date <= v_date AND (snapshot_date < v_date OR snapshot_id <= v_id)
+    UNION
+    SELECT firm_id, fiscal_year FROM `fact_cashflow_year`
+      WHERE snapshot_date <= v_date AND (snapshot_date < v_date OR snapshot_id <= v_id)
+    UNION
+    SELECT firm_id, fiscal_year FROM `fact_market_year`
+      WHERE snapshot_date <= v_date AND (snapshot_date < v_date OR snapshot_id <= v_id)
+    UNION
+    SELECT firm_id, fiscal_year FROM `fact_innovation_year`
+      WHERE snapshot_date <= v_date AND (snapshot_date < v_date OR snapshot_id <= v_id)
+    UNION
+    SELECT firm_id, fiscal_year FROM `fact_firm_year_meta`
+      WHERE snapshot_date <= v_date AND (snapshot_date < v_date OR snapshot_id <= v_id)
+  ) k
+    JOIN `dim_firm` f ON f.firm_id = k.firm_id
+    LEFT JOIN LATERAL (
+      SELECT t.`managerial_inside_own`, t.`state_own`, t.`institutional_own`, t.`foreign_own`
+      FROM `fact_ownership_year` t
+      WHERE t.firm_id = k.firm_id AND t.fiscal_year = k.fiscal_year
+        AND t.snapshot_date <= v_date AND (t.snapshot_date < v_date OR t.snapshot_id <= v_id)
+      ORDER BY t.snapshot_date DESC, t.snapshot_id DESC
+      LIMIT 1
+    ) oy ON TRUE
+    LEFT JOIN LATERAL (
+      SELECT t.`net_sales`, t.`total_assets`, t.`selling_expenses`, t.`general_admin_expenses`,
+             t.`intangible_assets_net`, t.`manufacturing_overhead`, t.`net_operating_income`,
+             t.`raw_material_consumption`, t.`merchandise_purchase_year`, t.`wip_goods_purchase`,
+             t.`outside_manufacturing_expenses`, t.`production_cost`, t.`rnd_expenses`, t.`net_income`,
+             t.`total_equity`, t.`total_liabilities`, t.`cash_and_equivalents`, t.`long_term_debt`,
+             t.`current_assets`, t.`current_liabilities`, t.`growth_ratio`, t.`inventory`, t.`net_ppe`
+      FROM `fact_financial_year` t
+      WHERE t.firm_id = k.firm_id AND t.fiscal_year = k.fiscal_year
+        AND t.snapshot_date <= v_date AND (t.snapshot_date < v_date OR t.snapshot_id <= v_id)
+      ORDER BY t.snapshot_date DESC, t.snapshot_id DESC
+      LIMIT 1
+    ) fy ON TRUE
+    LEFT JOIN LATERAL (
+      SELECT t.`net_cfo`, t.`capex`, t.`net_cfi`
+      FROM `fact_cashflow_year` t
+      WHERE t.firm_id = k.firm_id AND t.fiscal_year = k.fiscal_year
+        AND t.snapshot_date <= v_date AND (t.snapshot_date < v_date OR t.snapshot_id <= v_id)
+      ORDER BY t.snapshot_date DESC, t.snapshot_id DESC
+      LIMIT 1
+    ) cf ON TRUE
+    LEFT JOIN LATERAL (
+      SELECT t.`shares_outstanding`, t.`market_value_equity`, t.`dividend_cash_paid`, t.`eps_basic`
+      FROM `fact_market_year` t
+      WHERE t.firm_id = k.firm_id AND t.fiscal_year = k.fiscal_year
+        AND t.snapshot_date <= v_date AND (t.snapshot_date < v_date OR t.snapshot_id <= v_id)
+      ORDER BY t.snapshot_date DESC, t.snapshot_id DESC
+      LIMIT 1
+    ) my ON TRUE
+    LEFT JOIN LATERAL (
+      SELECT t.`product_innovation`, t.`process_innovation`
+      FROM `fact_innovation_year` t
+      WHERE t.firm_id = k.firm_id AND t.fiscal_year = k.fiscal_year
+        AND t.snapshot_date <= v_date AND (t.snapshot_date < v_date OR t.snapshot_id <= v_id)
+      ORDER BY t.snapshot_date DESC, t.snapshot_id DESC
+      LIMIT 1
+    ) iv ON TRUE
+    LEFT JOIN LATERAL (
+      SELECT t.`employees_count`, t.`firm_age`
+      FROM `fact_firm_year_meta` t
+      WHERE t.firm_id = k.firm_id AND t.fiscal_year = k.fiscal_year
+        AND t.snapshot_date <= v_date AND (t.snapshot_date < v_date OR t.snapshot_id <= v_id)
+      ORDER BY t.snapshot_date DESC, t.snapshot_id DESC
+      LIMIT 1
+    ) meta ON TRUE
+  ORDER BY f.ticker, k.fiscal_year;
+END$$
+
+-- snapshot_date on the FACT rows is a copy of fact_data_snapshot.snapshot_date, so the latest snapshot of a
+-- firm-year is the first entry of idx_<table>_latest (no join to fact_data_snapshot). The loaders write it with
+-- each row (import_panel.get_snapshot_dates / stg_snapshot_pick), no trigger per row; rows inserted by hand must
+-- set it too (NULL sorts last, so such a row is never the latest).
+-- This trigger keeps the copy in step when a snapshot's date changes and marks the firm-years of the snapshot
+-- dirty (one statement per table).
+CREATE TRIGGER `trg_fact_data_snapshot_au` AFTER UPDATE ON `fact_data_snapshot` FOR EACH ROW
+BEGIN
+  IF NOT (OLD.snapshot_date <=> NEW.snapshot_date) THEN
+    UPDATE `fact_ownership_year` SET `snapshot_date` = NEW.snapshot_date WHERE `snapshot_id` = NEW.snapshot_id;
+    INSERT INTO `panel_latest_dirty` (`table_name`, `firm_id`, `fiscal_year`)
+      SELECT 'fact_ownership_year', firm_id, fiscal_year FROM `fact_ownership_year` WHERE `snapshot_id` = NEW.snapshot_id
+      ON DUPLICATE KEY UPDATE `marked_at` = CURRENT_TIMESTAMP(6);
+    UPDATE `fact_financial_year` SET `snapshot_date` = NEW.snapshot_date WHERE `snapshot_id` = NEW.snapshot_id;
+    INSERT INTO `panel_latest_dirty` (`table_name`, `firm_id`, `fiscal_year`)
+      SELECT 'fact_financial_year', firm_id, fiscal_year FROM `fact_financial_year` WHERE `snapshot_id` = NEW.snapshot_id
+      ON DUPLICATE KEY UPDATE `marked_at` = CURRENT_TIMESTAMP(6);
+    UPDATE `fact_cashflow_year` SET `snapshot_date` = NEW.snapshot_date WHERE `snapshot_id` = NEW.snapshot_id;
+    INSERT INTO `panel_latest_dirty` (`table_name`, `firm_id`, `fiscal_year`)
+      SELECT 'fact_cashflow_year', firm_id, fiscal_year FROM `fact_cashflow_year` WHERE `snapshot_id` = NEW.snapshot_id
+      ON DUPLICATE KEY UPDATE `marked_at` = CURRENT_TIMESTAMP(6);
+    UPDATE `fact_market_year` SET `snapshot_date` = NEW.snapshot_date WHERE `snapshot_id` = NEW.snapshot_id;
+    INSERT INTO `panel_latest_dirty` (`table_name`, `firm_id`, `fiscal_year`)
+      SELECT 'fact_market_year', firm_id, fiscal_year FROM `fact_market_year` WHERE `snapshot_id` = NEW.snapshot_id
+      ON DUPLICATE KEY UPDATE `marked_at` = CURRENT_TIMESTAMP(6);
+    UPDATE `fact_innovation_year` SET `snapshot_date` = NEW.snapshot_date WHERE `snapshot_id` = NEW.snapshot_id;
+    INSERT INTO `panel_latest_dirty` (`table_name`, `firm_id`, `fiscal_year`)
+      SELECT 'fact_innovation_year', firm_id, fiscal_year FROM `fact_innovation_year` WHERE `snapshot_id` = NEW.snapshot_id
+      ON DUPLICATE KEY UPDATE `marked_at` = CURRENT_TIMESTAMP(6);
+    UPDATE `fact_firm_year_meta` SET `snapshot_date` = NEW.snapshot_date WHERE `snapshot_id` = NEW.snapshot_id;
+    INSERT INTO `panel_latest_dirty` (`table_name`, `firm_id`, `fiscal_year`)
+      SELECT 'fact_firm_year_meta', firm_id, fiscal_year FROM `fact_firm_year_meta` WHERE `snapshot_id` = NEW.snapshot_id
+      ON DUPLICATE KEY UPDATE `marked_at` = CURRENT_TIMESTAMP(6);
+  END IF;
+END$$
+
+-- ticker is carried on panel_latest
+CREATE TRIGGER `trg_dim_firm_au` AFTER UPDATE ON `dim_firm` FOR EACH ROW
+BEGIN
+  IF NOT (OLD.ticker <=> NEW.ticker) THEN
+    UPDATE `panel_latest` SET `ticker` = NEW.ticker WHERE `firm_id` = NEW.firm_id;
+  END IF;
+END$$
+
+DELIMITER ;
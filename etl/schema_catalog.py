@@ -0,0 +1,82 @@
+import os
+import re
+from typing import Dict, Iterable, List, Optional
+from sqlalchemy import text
+
+# Danh mục cột -> bảng FACT, đọc INFORMATION_SCHEMA một lần cho cả lần chạy:
+#   catalog = load_catalog(engine)
+#   catalog.table_for("net_sales")                       # "fact_financial_year"
+#   catalog.tables_for(["total_assets", "share_price"])  # "fact_financial_year, fact_market_year"
+#   catalog.check("fact_market_year", "share_price")     # None nếu hợp lệ, ngược lại là câu báo lỗi
+# - Một câu SELECT cho mọi bảng fact_% của schema hiện tại (DATABASE()), nhớ theo engine trong tiến trình.
+# - catalog_from_sql() dựng cùng danh mục từ schema_and_seed.sql (cho script chạy không cần DB).
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+SCHEMA_PATH = os.path.join(BASE_DIR, "schema_and_seed.sql")
+TABLE_PREFIX = "fact_"
+
+class SchemaCatalog:
+    def __init__(self, tables: Dict[str, List[str]]):
+        self.tables = tables  # table -> columns in ordinal order
+        self.columns: Dict[str, List[str]] = {}
+        for table in sorted(tables):
+            for col in tables[table]:
+                self.columns.setdefault(col, []).append(table)
+
+    def table_for(self, column: str) -> Optional[str]:
+        """First fact table (by name) that has the column."""
+        found = self.columns.get(column)
+        return found[0] if found else None
+
+    def tables_for(self, columns: Iterable[str]) -> str:
+        """Fact tables of several columns as "a, b" (same text as the old find_tables_for_columns)."""
+        tables = {self.table_for(c) for c in columns} - {None}
+        return ", ".join(sorted(tables)) if tables else "Unknown"
+
+    def check(self, table: str, column: str) -> Optional[str]:
+        """Reason why (table, column) cannot be used in dynamic SQL, or None when both exist."""
+        if table not in self.tables:
+            return f"bảng '{table}' không phải bảng FACT trong schema"
+        if column not in self.tables[table]:
+            owner = self.table_for(column)
+            hint = f" (cột này thuộc {owner})" if owner else ""
+            return f"cột '{column}' không có trong bảng {table}{hint}"
+        return None
+
+_LOADED: Dict[str, SchemaCatalog] = {}
+
+def load_catalog(engine, refresh: bool = False) -> SchemaCatalog:
+    """Catalog of the engine's current database; queried once per process unless refresh=True."""
+    key = str(engine.url)
+    if refresh or key not in _LOADED:
+        with engine.connect() as conn:
+            rows = conn.execute(text("""
+                SELECT TABLE_NAME, COLUMN_NAME
+                FROM INFORMATION_SCHEMA.COLUMNS
+                WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME LIKE :prefix
+                ORDER BY TABLE_NAME, ORDINAL_POSITION
+            """), {"prefix": TABLE_PREFIX + "%"}).fetchall()
+        tables: Dict[str, List[str]] = {}
+        for table, col in rows:
+            tables.setdefault(table, []).append(col)
+        _LOADED[key] = SchemaCatalog(tables)
+    return _LOADED[key]
+
+def catalog_from_sql(path: str = SCHEMA_PATH) -> SchemaCatalog:
+    """Same catalog parsed from the CREATE TABLE statements of schema_and_seed.sql."""
+    tables: Dict[str, List[str]] = {}
+    table = None
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            m = re.match(r"\s*CREATE TABLE IF NOT EXISTS `(\w+)`", line)
+            if m:
+                table = m.group(1) if m.group(1).startswith(TABLE_PREFIX) else None
+                if table:
+                    tables[table] = []
+                continue
+            if line.startswith(")"):
+                table = None
+            m = re.match(r"\s*`(\w+)` ", line)
+            if table and m:
+                tables[table].append(m.group(1))
+    return SchemaCatalog(tables)
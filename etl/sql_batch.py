@@ -0,0 +1,41 @@
+from typing import Any, List, Optional, Sequence
+import pandas as pd
+
+# Ghi nhiều dòng một câu INSERT, dùng chung cho loader, QC và quick_fix:
+#   insert_many(conn, "fact_value_override_log", cols, rows)                      # INSERT thường
+#   insert_many(conn, table, cols, rows, on_duplicate=update_clause(cols, KEY))   # upsert
+# - conn: kết nối pymysql hoặc Connection của SQLAlchemy (cùng placeholder %s, chạy trong giao dịch đang mở).
+# - rows: list tuple theo thứ tự cols, giá trị đã sạch None (không NaN, xem column_values); batch_size dòng mỗi câu.
+
+BATCH_SIZE = 1000
+
+def column_values(df: pd.DataFrame, col: str) -> List[Any]:
+    """One column as a Python list with NaN/NA -> None (done once per column, not per cell)."""
+    if col not in df.columns:
+        return [None] * len(df)
+    s = df[col]
+    return s.astype(object).where(s.notna(), None).tolist()
+
+def update_clause(cols: Sequence[str], key: Sequence[str]) -> str:
+    """"c = VALUES(c)" for every non-key column ("" when there is none)."""
+    return ", ".join(f"{c}=VALUES({c})" for c in cols if c not in set(key))
+
+def insert_many(conn, table: str, cols: Sequence[str], rows: List[Sequence[Any]], batch_size: int = BATCH_SIZE,
+                on_duplicate: Optional[str] = None) -> int:
+    """Multi-row INSERT (... ON DUPLICATE KEY UPDATE on_duplicate), batch_size rows per statement; affected rows."""
+    if not rows:
+        return 0
+    ph = "(" + ", ".join(["%s"] * len(cols)) + ")"
+    tail = f" ON DUPLICATE KEY UPDATE {on_duplicate}" if on_duplicate else ""
+    affected = 0
+    for i in range(0, len(rows), batch_size):
+        batch = rows[i:i + batch_size]
+        sql = f"INSERT INTO {table} ({', '.join(cols)}) VALUES " + ", ".join([ph] * len(batch)) + tail
+        params = tuple(v for row in batch for v in row)
+        if hasattr(conn, "exec_driver_sql"):
+            affected += conn.exec_driver_sql(sql, params).rowcount
+        else:
+            with conn.cursor() as cur:
+                cur.execute(sql, params)
+                affected += cur.rowcount
+    return affected
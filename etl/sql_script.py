@@ -0,0 +1,67 @@
+import os
+import re
+from typing import List, Optional
+
+# Chạy file .sql (schema_and_seed.sql) từ Python, không cần mysql client:
+#   statements = split_statements(read_schema(db_name="vn_firm_panel_bench"))
+#   run_statements(conn, statements)
+# - Hiểu lệnh DELIMITER như mysql client (thân procedure/trigger chứa ';').
+# - read_schema(db_name=...) đổi tên database cố định trong file (CREATE DATABASE / USE) sang tên khác.
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+SCHEMA_PATH = os.path.join(BASE_DIR, "schema_and_seed.sql")
+SCHEMA_DB = "vn_firm_panel_test"
+
+def read_schema(path: str = SCHEMA_PATH, db_name: Optional[str] = None) -> str:
+    with open(path, encoding="utf-8") as f:
+        sql = f.read()
+    return sql if db_name is None else sql.replace(f"`{SCHEMA_DB}`", f"`{db_name}`")
+
+def split_statements(sql: str) -> List[str]:
+    """Statements of a MySQL script, without their delimiter; comment-only lines between statements dropped."""
+    statements, buf, delimiter = [], [], ";"
+    for line in sql.splitlines():
+        stripped = line.strip()
+        if not buf and (not stripped or stripped.startswith("--")):
+            continue
+        m = re.match(r"DELIMITER\s+(\S+)", stripped, re.IGNORECASE)
+        if m and not buf:
+            delimiter = m.group(1)
+            continue
+        if stripped.startswith("--") or not stripped.endswith(delimiter):
+            buf.append(line)
+            continue
+        buf.append(line.rstrip()[:-len(delimiter)])
+        statement = "\n".join(buf).strip()
+        if statement:
+            statements.append(statement)
+        buf = []
+    if "\n".join(buf).strip():
+        statements.append("\n".join(buf).strip())
+    return statements
+
+def statement_kind(statement: str) -> str:
+    """'CREATE TABLE', 'CREATE VIEW', 'CREATE PROCEDURE', 'CREATE TRIGGER', 'DROP ...', or the first word."""
+    head = re.sub(r"\s+", " ", statement.lstrip()[:60]).upper()
+    for kind in ("CREATE TABLE", "CREATE TRIGGER", "CREATE PROCEDURE", "DROP TABLE", "DROP VIEW", "DROP PROCEDURE"):
+        if head.startswith(kind):
+            return kind
+    if head.startswith("CREATE OR REPLACE VIEW") or head.startswith("CREATE VIEW"):
+        return "CREATE VIEW"
+    return head.split(" ", 1)[0]
+
+def object_name(statement: str) -> Optional[str]:
+    """Name of the table/view/procedure/trigger a CREATE or DROP statement is about."""
+    m = re.search(r"(?:TABLE|VIEW|PROCEDURE|TRIGGER)\s+(?:IF\s+(?:NOT\s+)?EXISTS\s+)?`?(\w+)`?", statement,
+                  re.IGNORECASE)
+    return m.group(1) if m else None
+
+def run_statements(conn, statements: List[str]) -> int:
+    """Execute each statement on a DB-API connection (no commit: DDL commits implicitly)."""
+    cur = conn.cursor()
+    try:
+        for statement in statements:
+            cur.execute(statement)
+    finally:
+        cur.close()
+    return len(statements)
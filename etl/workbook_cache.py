@@ -0,0 +1,232 @@
+import hashlib
+import json
+import os
+import re
+from datetime import date, datetime, time as dtime
+from typing import Any, Dict, List, Optional, Union
+import pandas as pd
+
+# Cache sheet Excel đã parse dưới dạng Parquet, dùng chung cho mọi script ETL:
+#   df = read_excel(path, sheet_name="master_39")     # thay cho pd.read_excel(path, sheet_name=...)
+# - Khóa cache: đường dẫn tuyệt đối + mtime/size + SHA-256 nội dung file.
+#   mtime/size khớp -> dùng ngay; lệch -> băm lại file, nội dung đổi thì bỏ toàn bộ sheet cũ.
+# - Engine đọc: openpyxl; ETL_EXCEL_ENGINE=calamine (cần python-calamine) nhanh hơn nhiều lần nhưng có thể trả
+#   giá trị Python khác (số nguyên thành float, ngày tháng), nên chỉ dùng khi đã kiểm tra bằng bench_workbook_cache.py.
+#   Sheet trong cache ghi kèm engine đã parse; đổi engine thì parse lại.
+# - Biến môi trường: ETL_CACHE_DIR (thư mục cache), ETL_WORKBOOK_CACHE=0 (tắt cache), ETL_EXCEL_ENGINE.
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+CACHE_DIR = os.environ.get("ETL_CACHE_DIR", os.path.join(BASE_DIR, ".cache", "workbooks"))
+CACHE_FORMAT = 1  # bump when the on-disk layout changes
+DEFAULT_ENGINE = "openpyxl"
+
+def cache_enabled() -> bool:
+    return os.environ.get("ETL_WORKBOOK_CACHE", "1").strip().lower() not in ("0", "false", "no", "off")
+
+def excel_engine() -> str:
+    """openpyxl unless ETL_EXCEL_ENGINE opts into another pandas reader (e.g. calamine, pandas >= 2.2)."""
+    return os.environ.get("ETL_EXCEL_ENGINE", "").strip() or DEFAULT_ENGINE
+
+def file_sha256(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+def index_path(path: str) -> str:
+    return os.path.join(CACHE_DIR, hashlib.sha1(path.encode("utf-8")).hexdigest()[:16] + ".json")
+
+def load_index(path: str) -> Optional[Dict[str, Any]]:
+    try:
+        with open(index_path(path), encoding="utf-8") as f:
+            idx = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return idx if idx.get("format") == CACHE_FORMAT and idx.get("path") == path else None
+
+def save_index(idx: Dict[str, Any]) -> None:
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    target = index_path(idx["path"])
+    tmp = f"{target}.{os.getpid()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(idx, f, ensure_ascii=False, indent=1)
+    os.replace(tmp, target)
+
+def drop_sheet_files(idx: Dict[str, Any]) -> None:
+    for meta in idx.get("sheets", {}).values():
+        try:
+            os.remove(os.path.join(CACHE_DIR, meta["file"]))
+        except OSError:
+            pass
+
+def current_index(path: str) -> Dict[str, Any]:
+    """Index for the workbook as it is on disk now; a changed file drops every cached sheet."""
+    st = os.stat(path)
+    idx = load_index(path)
+    if idx and idx["mtime_ns"] == st.st_mtime_ns and idx["size"] == st.st_size:
+        return idx
+
+    sha = file_sha256(path)
+    if idx and idx["sha256"] == sha:
+        idx.update(mtime_ns=st.st_mtime_ns, size=st.st_size)  # touched, content unchanged
+    else:
+        if idx:
+            print(f">>> workbook changed, dropping cached sheets: {os.path.basename(path)}")
+            drop_sheet_files(idx)
+        idx = {"format": CACHE_FORMAT, "path": path, "mtime_ns": st.st_mtime_ns, "size": st.st_size,
+               "sha256": sha, "sheet_names": None, "sheets": {}}
+    save_index(idx)
+    return idx
+
+# Parquet needs one type per column: mixed object columns (e.g. innovation = 0 / "1 (note)")
+# are stored as tagged text and decoded back to the exact Python values.
+def tag_value(v: Any) -> Optional[str]:
+    if v is None:
+        return None
+    if isinstance(v, bool):
+        return "b:" + ("1" if v else "0")
+    if isinstance(v, int):
+        return "i:" + str(v)
+    if isinstance(v, float):
+        return "f:" + repr(v)
+    if isinstance(v, str):
+        return "s:" + v
+    if isinstance(v, datetime):  # includes pd.Timestamp
+        return "t:" + pd.Timestamp(v).isoformat()
+    if isinstance(v, date):
+        return "d:" + v.isoformat()
+    if isinstance(v, dtime):
+        return "h:" + v.isoformat()
+    raise TypeError(f"cannot cache value of type {type(v).__name__}")
+
+def untag_value(v: Optional[str]) -> Any:
+    if v is None:
+        return None
+    kind, text = v[0], v[2:]
+    if kind == "s":
+        return text
+    if kind == "i":
+        return int(text)
+    if kind == "f":
+        return float(text)
+    if kind == "b":
+        return text == "1"
+    if kind == "t":
+        return pd.Timestamp(text)
+    if kind == "d":
+        return date.fromisoformat(text)
+    return dtime.fromisoformat(text)
+
+def to_parquet_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """Positional string column names + tagged object columns; original names/dtypes go in the sheet meta."""
+    out = {}
+    for i in range(df.shape[1]):
+        s = df.iloc[:, i]
+        if s.dtype == object and not all(v is None or isinstance(v, str) for v in s):
+            s = pd.Series([tag_value(v) for v in s], index=s.index, dtype=object)
+            out[f"t{i}"] = s
+        else:
+            out[f"c{i}"] = s
+    return pd.DataFrame(out, index=df.index)
+
+def from_parquet_frame(pq: pd.DataFrame, columns: List[Any]) -> pd.DataFrame:
+    cols = []
+    for name in pq.columns:
+        s = pq[name]
+        if name.startswith("t"):
+            s = pd.Series([untag_value(v) for v in s], index=s.index, dtype=object)
+        cols.append(s)
+    df = pd.concat(cols, axis=1) if cols else pd.DataFrame(index=pq.index)
+    df.columns = columns
+    return df
+
+def sheet_file(idx: Dict[str, Any], sheet: str) -> str:
+    slug = re.sub(r"[^0-9A-Za-z_-]+", "_", sheet)[:40]
+    return f"{idx['sha256'][:16]}_{hashlib.sha1(sheet.encode('utf-8')).hexdigest()[:8]}_{slug}.parquet"
+
+def cache_sheet(idx: Dict[str, Any], sheet: str, df: pd.DataFrame, engine: str) -> None:
+    try:
+        pq = to_parquet_frame(df)
+        fname = sheet_file(idx, sheet)
+        tmp = os.path.join(CACHE_DIR, f"{fname}.{os.getpid()}.tmp")
+        pq.to_parquet(tmp, index=False)
+        os.replace(tmp, os.path.join(CACHE_DIR, fname))
+    except Exception as e:  # unsupported cell types or no parquet engine: the sheet is just not cached
+        print(f">>> not caching sheet '{sheet}': {e}")
+        return
+    # Column labels are kept tagged in the index, so ints/NaN headers survive the round trip
+    idx["sheets"][sheet] = {"file": fname, "columns": [tag_value(c) for c in df.columns], "rows": len(df),
+                            "engine": engine}
+    save_index(idx)
+
+def cached_sheet(idx: Dict[str, Any], sheet: str, engine: str) -> Optional[pd.DataFrame]:
+    meta = idx["sheets"].get(sheet)
+    if not meta or meta.get("engine", DEFAULT_ENGINE) != engine:  # parsed by another engine: values may differ
+        return None
+    try:
+        pq = pd.read_parquet(os.path.join(CACHE_DIR, meta["file"]))
+    except Exception:
+        return None
+    return from_parquet_frame(pq, [untag_value(c) for c in meta["columns"]])
+
+def resolve_sheet_names(path: str, idx: Dict[str, Any], engine: str) -> List[str]:
+    if idx["sheet_names"] is None:
+        with pd.ExcelFile(path, engine=engine) as xl:
+            idx["sheet_names"] = [str(s) for s in xl.sheet_names]
+        save_index(idx)
+    return idx["sheet_names"]
+
+def read_excel(path: str, sheet_name: Union[str, int, None] = 0,
+               **kwargs) -> Union[pd.DataFrame, Dict[str, pd.DataFrame]]:
+    """
+    Drop-in for pd.read_excel(path, sheet_name=...): str / int position / None (= every sheet, as a dict).
+    Extra pandas kwargs bypass the cache.
+    """
+    engine = excel_engine()
+    if kwargs or not cache_enabled():
+        kwargs.setdefault("engine", engine)
+        return pd.read_excel(path, sheet_name=sheet_name, **kwargs)
+
+    path = os.path.abspath(path)
+    idx = current_index(path)
+    if sheet_name is None or isinstance(sheet_name, int):
+        names = resolve_sheet_names(path, idx, engine)
+        wanted = names if sheet_name is None else [names[sheet_name]]
+    else:
+        wanted = [sheet_name]
+
+    frames: Dict[str, pd.DataFrame] = {}
+    missing = []
+    for s in wanted:
+        df = cached_sheet(idx, s, engine)
+        if df is None:
+            missing.append(s)
+        else:
+            frames[s] = df
+
+    if missing:
+        # One workbook open for every sheet that is not cached yet
+        parsed = pd.read_excel(path, sheet_name=missing, engine=engine)
+        for s in missing:
+            cache_sheet(idx, s, parsed[s], engine)
+            frames[s] = parsed[s]
+
+    if sheet_name is None:
+        return {s: frames[s] for s in wanted}
+    return frames[wanted[0]]
+
+def clear_cache(path: Optional[str] = None) -> None:
+    """Drop the cache of one workbook, or of every workbook when path is None."""
+    if path is not None:
+        idx = load_index(os.path.abspath(path))
+        if idx:
+            drop_sheet_files(idx)
+        try:
+            os.remove(index_path(os.path.abspath(path)))
+        except OSError:
+            pass
+        return
+    if os.path.isdir(CACHE_DIR):
+        for name in os.listdir(CACHE_DIR):
+            os.remove(os.path.join(CACHE_DIR, name))
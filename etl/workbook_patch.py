@@ -0,0 +1,89 @@
+import os
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from openpyxl import load_workbook
+
+# Ghi ngược giá trị đã sửa vào workbook theo TỪNG Ô (thay cho đọc cả sheet rồi to_excel cả file):
+#   with WorkbookPatcher(EXCEL_PATH, "master_39") as wb:
+#       wb.set("VNM", 2022, "total_assets", 123.0)     # False nếu không có dòng (ticker, năm)
+#   # lưu một lần khi thoát khối with (chỉ khi có ô thay đổi)
+# - Mở file một lần bằng openpyxl, dựng chỉ mục (ticker, fiscal_year) -> số dòng và header -> số cột;
+#   chỉ các ô thay đổi được ghi, mọi sheet khác, định dạng và độ rộng cột giữ nguyên.
+# - Cột chưa có trong header được thêm vào cuối dòng header.
+# - Lưu qua file tạm rồi os.replace: file gốc không bao giờ bị ghi dở.
+# - Không có sheet -> KeyError, không có cột khóa -> ValueError (người gọi tự báo lỗi).
+
+class WorkbookPatcher:
+    def __init__(self, path: str, sheet_name: str, key_columns: Tuple[str, str] = ("ticker", "fiscal_year")):
+        self.path = path
+        self.wb = load_workbook(path, keep_vba=path.lower().endswith(".xlsm"))
+        if sheet_name not in self.wb.sheetnames:
+            raise KeyError(f"Sheet '{sheet_name}' not found in {os.path.basename(path)}: {self.wb.sheetnames}")
+        self.ws = self.wb[sheet_name]
+        self.columns: Dict[str, int] = {}
+        for cell in self.ws[1]:
+            if cell.value is not None:
+                self.columns.setdefault(str(cell.value).strip(), cell.column)
+        missing = [c for c in key_columns if c not in self.columns]
+        if missing:
+            raise ValueError(f"Sheet '{sheet_name}' has no {', '.join(missing)} column")
+        self.rows: Dict[Tuple[str, int], List[int]] = {}
+        t_col, y_col = self.columns[key_columns[0]], self.columns[key_columns[1]]
+        lo, hi = min(t_col, y_col), max(t_col, y_col)
+        for r, values in enumerate(self.ws.iter_rows(min_row=2, min_col=lo, max_col=hi, values_only=True), start=2):
+            key = self.row_key(values[t_col - lo], values[y_col - lo])
+            if key is not None:
+                self.rows.setdefault(key, []).append(r)
+        self.changed = 0
+
+    @staticmethod
+    def row_key(ticker: Any, fiscal_year: Any) -> Optional[Tuple[str, int]]:
+        if ticker is None or fiscal_year is None:
+            return None
+        try:
+            return str(ticker).strip().upper(), int(float(fiscal_year))
+        except (TypeError, ValueError):
+            return None
+
+    def column(self, name: str) -> int:
+        if name not in self.columns:
+            print(f"➕ Cột '{name}' chưa tồn tại trong Excel. Đang tự động tạo mới...")
+            col = self.ws.max_column + 1
+            self.ws.cell(row=1, column=col, value=name)
+            self.columns[name] = col
+        return self.columns[name]
+
+    def set(self, ticker: Any, fiscal_year: Any, column_name: str, value: Any) -> bool:
+        """Write value into every row of (ticker, fiscal_year); False when the workbook has no such row."""
+        rows = self.rows.get(self.row_key(ticker, fiscal_year))
+        if not rows:
+            return False
+        col = self.column(column_name)
+        for r in rows:
+            self.ws.cell(row=r, column=col, value=value)
+        self.changed += 1
+        return True
+
+    def save(self) -> None:
+        if not self.changed:
+            return
+        tmp = f"{self.path}.{os.getpid()}.tmp"
+        self.wb.save(tmp)
+        os.replace(tmp, self.path)
+
+    def __enter__(self) -> "WorkbookPatcher":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        if exc_type is None:
+            self.save()
+        self.wb.close()
+
+def patch_workbook(path: str, sheet_name: str, updates: Iterable[Tuple[Any, Any, str, Any]]) -> Tuple[int, list]:
+    """Apply (ticker, fiscal_year, column_name, value) updates with one open and one save; returns (written, not found)."""
+    missing = []
+    with WorkbookPatcher(path, sheet_name) as wb:
+        for ticker, fiscal_year, column_name, value in updates:
+            if not wb.set(ticker, fiscal_year, column_name, value):
+                missing.append((ticker, fiscal_year))
+        written = wb.changed
+    return written, missing